@@ -0,0 +1,186 @@
+"""
+End-to-end latency of the attendance flow against the local mock site.
+
+Compares the original waits (networkidle, a fixed 2 s "for modals", slow_mo and
+a 3 s pause before closing) with the event-driven flow in hrone.py, headed
+and headless, over the same mock with injected delays, and the fast flow in a
+small window with images, fonts, media and the analytics host blocked (bytes
+transferred and time per step are reported too). Then times cold runs
+(full login) against warm ones (saved, encrypted session), and a run whose
+saved session the server has already expired:
+
+    python bench_hrone.py --runs 5 --dashboard-ms 800 --modal-ms 1200 --api-ms 150
+"""
+
+import asyncio
+import statistics
+import tempfile
+import time
+
+from playwright.async_api import async_playwright
+
+import hrone
+from mock_hrone import MockHROne
+from page_profile import DEFAULT_BLOCKED_DOMAINS, DESKTOP_VIEWPORT, LITE_VIEWPORT, RequestFilter, RunStats
+from session_store import Fernet, SessionStore
+
+
+async def legacy_mark_attendance(page, username, password, base_url, log=None, mark=None):
+    """The waits hrone.py used before: networkidle, sleep(2) for the modal, sleep(3) at the end."""
+    await page.goto(f'{base_url}/login', wait_until='networkidle')
+    await page.fill(hrone.USERNAME_INPUT, username)
+    await page.click(hrone.NEXT_BUTTON)
+    password_field = await page.wait_for_selector(hrone.PASSWORD_INPUT, state='visible', timeout=10000)
+    await password_field.fill(password)
+    login_button = await page.wait_for_selector(hrone.LOGIN_BUTTON, state='visible', timeout=10000)
+    await login_button.click()
+    await page.wait_for_selector(hrone.DASHBOARD_HEADER, state='visible', timeout=15000)
+    await asyncio.sleep(2)
+    modal = await page.query_selector(hrone.MODAL)
+    if modal and await modal.is_visible():
+        close_button = await page.wait_for_selector(hrone.MODAL_CLOSE_BUTTON, state='visible', timeout=5000)
+        await close_button.click()
+    button = await page.wait_for_selector(hrone.MARK_ATTENDANCE_BUTTON, state='visible', timeout=10000)
+    await button.click()
+    await page.wait_for_selector(hrone.ATTENDANCE_DIALOG, state='visible', timeout=10000)
+    final_button = await page.wait_for_selector(hrone.FINAL_MARK_BUTTON, state='visible', timeout=10000)
+    await final_button.click()
+    await asyncio.sleep(3)
+
+
+# the mock's analytics script comes from "localhost"; block it like a real tracker domain
+LITE_FILTER = RequestFilter(block_domains=DEFAULT_BLOCKED_DOMAINS + ('localhost',))
+
+FLOWS = {
+    # name: (flow, slow_mo, request filter, viewport)
+    'legacy': (legacy_mark_attendance, 100, None, DESKTOP_VIEWPORT),
+    'event-driven, headed pace': (hrone.mark_attendance, 100, None, DESKTOP_VIEWPORT),
+    'event-driven, fast': (hrone.mark_attendance, 0, None, DESKTOP_VIEWPORT),
+    'fast, lite + blocking': (hrone.mark_attendance, 0, LITE_FILTER, LITE_VIEWPORT),
+}
+
+
+async def run_flow(p, flow, slow_mo, request_filter, viewport, base_url, runs, headless):
+    """Wall time and RunStats of every successful run."""
+    browser = await p.chromium.launch(headless=headless, slow_mo=slow_mo)
+    times, stats = [], []
+    try:
+        for i in range(runs):
+            context = await browser.new_context(viewport=viewport)
+            run_stats = RunStats()
+            if request_filter:
+                await request_filter.install(context, run_stats)
+            else:
+                run_stats.attach(context)
+            page = await context.new_page()
+            start = time.perf_counter()
+            try:
+                await flow(page, f"bench{i}", 'secret', base_url, log=lambda msg: None, mark=run_stats.mark)
+                times.append(time.perf_counter() - start)
+                await run_stats.settle()
+                stats.append(run_stats)
+            except Exception as e:
+                print(f"  run {i}: {str(e).splitlines()[0]}")
+            finally:
+                await context.close()
+    finally:
+        await browser.close()
+    return times, stats
+
+
+async def run_sessions(p, server, runs, headless):
+    """Run times of one account by kind: 'cold login', 'saved session' and 'expired session'."""
+    times = {'cold login': [], 'saved session': [], 'expired session': []}
+    username = 'bench-session'
+
+    async def run_once(browser, sessions):
+        context, resume = await hrone.open_account_context(browser, username, sessions)
+        page = await context.new_page()
+        start = time.perf_counter()
+        try:
+            resumed = await hrone.mark_attendance(page, username, 'secret', server.base_url,
+                                                  log=lambda msg: None, resume=resume)
+            seconds = time.perf_counter() - start
+            await hrone.finish_session(context, username, sessions, True, resume)
+            times['saved session' if resumed else 'expired session' if resume else 'cold login'].append(seconds)
+        except Exception as e:
+            print(f"  {username}: {str(e).splitlines()[0]}")
+        finally:
+            await context.close()
+
+    browser = await p.chromium.launch(headless=headless)
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            sessions = SessionStore(folder, key=Fernet.generate_key())
+            for _ in range(runs):
+                sessions.discard(username)
+                await run_once(browser, sessions)  # logs in and saves the session
+                await run_once(browser, sessions)  # reuses it
+            server.expire_sessions()
+            await run_once(browser, sessions)  # finds the login form, logs in again
+    finally:
+        await browser.close()
+    return times
+
+
+async def run_bench(server, runs, headless):
+    base_url = server.start()
+    results = {}
+    async with async_playwright() as p:
+        for name, (flow, slow_mo, request_filter, viewport) in FLOWS.items():
+            recorded = len(server.attendance)
+            times, stats = await run_flow(p, flow, slow_mo, request_filter, viewport, base_url, runs, headless)
+            results[name] = (times, runs, len(server.attendance) - recorded, stats)
+        if Fernet is not None:
+            for name, times in (await run_sessions(p, server, runs, headless)).items():
+                results[f"fast, {name}"] = (times, 1 if name == 'expired session' else runs, len(times), [])
+    server.shutdown()
+    return results
+
+
+def print_results(results):
+    print(f"\n{'flow':<28}{'mean s':>8}{'p50 s':>8}{'max s':>8}{'marked':>9}{'KB':>8}{'blocked':>9}")
+    for name, (times, runs, marked, stats) in results.items():
+        if not times:
+            print(f"{name:<28}{'-':>8}{'-':>8}{'-':>8}{marked:>6}/{runs}")
+            continue
+        traffic = ''
+        if stats:
+            traffic = (f"{statistics.mean(s.bytes for s in stats) / 1024:>8.0f}"
+                       f"{statistics.mean(s.blocked for s in stats):>9.1f}")
+        print(f"{name:<28}{statistics.mean(times):>8.2f}{statistics.median(times):>8.2f}"
+              f"{max(times):>8.2f}{marked:>6}/{runs}{traffic}")
+
+    print("\nmean seconds per step")
+    for name, (_, _, _, stats) in results.items():
+        steps = {}
+        for s in stats:
+            for step, seconds in s.steps.items():
+                steps.setdefault(step, []).append(seconds)
+        if steps:
+            print(f"  {name:<26}" + '  '.join(f"{step} {statistics.mean(v):.2f}" for step, v in steps.items()))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the HR One flow against mock_hrone.py")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--headed', action='store_true')
+    parser.add_argument('--modal-rate', type=float, default=0.5)
+    parser.add_argument('--password-step-ms', type=int, default=300)
+    parser.add_argument('--dashboard-ms', type=int, default=800)
+    parser.add_argument('--modal-ms', type=int, default=1200)
+    parser.add_argument('--api-ms', type=int, default=150)
+    parser.add_argument('--asset-kb', type=int, default=300, help="size of the mock's heavy images and video")
+    args = parser.parse_args()
+
+    server = MockHROne(modal_rate=args.modal_rate, password_step_ms=args.password_step_ms,
+                       dashboard_ms=args.dashboard_ms, modal_ms=args.modal_ms, api_ms=args.api_ms,
+                       asset_kb=args.asset_kb, seed=0)
+    results = asyncio.run(run_bench(server, args.runs, headless=not args.headed))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
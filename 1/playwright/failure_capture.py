@@ -0,0 +1,151 @@
+"""
+Compact, rotating failure artifacts for the attendance flow.
+
+When a run fails, FailureCapture.capture() writes one timestamped folder:
+
+- screenshot.webp (or .jpg without Pillow): the viewport, lossy
+- dom.html.gz: the page's HTML at the moment of failure
+- network.har: the last requests of the page (HAR 1.2 excerpt, credentials
+  redacted, no request bodies)
+- error.txt: step, error and URL
+
+Old folders are deleted so the directory stays under `max_runs` folders and
+`max_bytes` in total.
+
+    network = NetworkLog(page)
+    try:
+        await mark_attendance(page, ...)
+    except AttendanceError as e:
+        folder = await FailureCapture().capture(page, e.step, e.error, network, label=username)
+"""
+
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:  # WebP needs Pillow; Playwright writes JPEG itself
+    Image = None
+
+ARTIFACT_DIR = os.getenv('HRONE_ARTIFACT_DIR', '.hrone_artifacts')
+REDACTED_HEADERS = {'authorization', 'cookie', 'set-cookie', 'x-access-token'}
+
+
+def _headers(headers):
+    return [{'name': name, 'value': '[redacted]' if name.lower() in REDACTED_HEADERS else value}
+            for name, value in headers.items()]
+
+
+def _iso(ms):
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).isoformat()
+
+
+class NetworkLog:
+    """Ring buffer of the page's last `limit` finished or failed requests, as HAR entries."""
+
+    def __init__(self, page, limit=50):
+        self.entries = deque(maxlen=limit)
+        self._responses = {}
+        page.on('response', self._on_response)
+        page.on('requestfinished', self._on_done)
+        page.on('requestfailed', self._on_done)
+
+    def _on_response(self, response):
+        self._responses[response.request] = response
+
+    def _on_done(self, request):
+        response = self._responses.pop(request, None)
+        timing = request.timing
+        start, end = timing.get('startTime', 0), timing.get('responseEnd', -1)
+        wait = max(0, timing.get('responseStart', 0) - max(0, timing.get('requestStart', 0)))
+        entry = {
+            'startedDateTime': _iso(start),
+            'time': max(0, end),
+            'request': {
+                'method': request.method, 'url': request.url, 'httpVersion': 'HTTP/1.1',
+                'headers': _headers(request.headers), 'queryString': [], 'cookies': [],
+                'headersSize': -1, 'bodySize': -1,
+            },
+            'response': {
+                'status': response.status if response else 0,
+                'statusText': response.status_text if response else '',
+                'httpVersion': 'HTTP/1.1',
+                'headers': _headers(response.headers) if response else [],
+                'cookies': [],
+                'content': {'size': -1, 'mimeType': response.headers.get('content-type', '') if response else ''},
+                'redirectURL': '', 'headersSize': -1, 'bodySize': -1,
+            },
+            'cache': {},
+            'timings': {'send': 0, 'wait': wait, 'receive': max(0, end - timing.get('responseStart', 0))},
+            '_resourceType': request.resource_type,
+        }
+        if request.failure:
+            entry['_failure'] = request.failure
+        self.entries.append(entry)
+
+    def har(self):
+        return {'log': {'version': '1.2', 'creator': {'name': 'hrone failure_capture', 'version': '1'},
+                        'entries': list(self.entries)}}
+
+
+class FailureCapture:
+    """
+    Args:
+        folder: where the timestamped artifact folders go.
+        max_runs / max_bytes: the oldest folders are removed beyond either limit.
+        quality: JPEG/WebP quality of the screenshot.
+    """
+
+    def __init__(self, folder=ARTIFACT_DIR, max_runs=30, max_bytes=20 * 1024 * 1024, quality=50):
+        self.folder = Path(folder)
+        self.max_runs = max_runs
+        self.max_bytes = max_bytes
+        self.quality = quality
+
+    async def capture(self, page, step, error, network=None, label=''):
+        """Write the artifacts of a failed run; returns the folder. Never raises."""
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        label = re.sub(r'[^A-Za-z0-9_.-]+', '_', label)[:40]
+        run_dir = self.folder / '_'.join(part for part in (stamp, label, step) if part)
+        run_dir.mkdir(parents=True, exist_ok=True)
+
+        (run_dir / 'error.txt').write_text(f"step: {step}\nerror: {error}\nurl: {page.url}\ntime: {stamp}\n")
+        for name, write in (('screenshot', self._screenshot), ('dom', self._dom)):
+            try:
+                await write(page, run_dir)
+            except Exception as e:  # a crashed or closed page still leaves the rest
+                with open(run_dir / 'error.txt', 'a') as f:
+                    f.write(f"{name} not captured: {str(e).splitlines()[0]}\n")
+        if network is not None:
+            (run_dir / 'network.har').write_text(json.dumps(network.har(), indent=1))
+
+        self.rotate()
+        return run_dir
+
+    async def _screenshot(self, page, run_dir):
+        if Image is not None:
+            png = await page.screenshot(type='png')
+            Image.open(io.BytesIO(png)).save(run_dir / 'screenshot.webp', 'WEBP', quality=self.quality)
+        else:
+            await page.screenshot(path=run_dir / 'screenshot.jpg', type='jpeg', quality=self.quality)
+
+    async def _dom(self, page, run_dir):
+        with gzip.open(run_dir / 'dom.html.gz', 'wt', encoding='utf-8') as f:
+            f.write(await page.content())
+
+    def rotate(self):
+        """Drop the oldest folders until both limits hold (the newest one is always kept)."""
+        runs = sorted(p for p in self.folder.iterdir() if p.is_dir())
+        sizes = {run: sum(f.stat().st_size for f in run.rglob('*') if f.is_file()) for run in runs}
+        total = sum(sizes.values())
+        while len(runs) > 1 and (len(runs) > self.max_runs or total > self.max_bytes):
+            oldest = runs.pop(0)
+            total -= sizes[oldest]
+            shutil.rmtree(oldest, ignore_errors=True)
@@ -1,175 +1,274 @@
 import os
+import sys
 import asyncio
 from playwright.async_api import async_playwright
 from dotenv import load_dotenv
 
+from failure_capture import FailureCapture, NetworkLog
+from page_profile import DESKTOP_VIEWPORT, LITE_VIEWPORT, RequestFilter, RunStats
+from session_store import SessionStore
+
 # Load environment variables from .env file
 load_dotenv()
 
-async def login_to_hrone(username, password):
+# Point this at a local mock (see mock_hrone.py) to try the flow without an account
+BASE_URL = os.getenv('HRONE_BASE_URL', 'https://app.hrone.cloud')
+
+# Selectors used by the flow
+USERNAME_INPUT = '#hrone-username'
+NEXT_BUTTON = '//*[@id="login-register"]/div/div[1]/div[2]/button'
+PASSWORD_INPUT = '#hrone-password'
+LOGIN_BUTTON = '//*[@id="login-register"]/div/div[3]/div[3]/button[2]'
+DASHBOARD_HEADER = 'xpath=/html/body/app-root/app-main-dashboard/app-main/div/app-header/header/nav'
+MODAL = 'xpath=/html/body/div[2]/div'
+MODAL_CLOSE_BUTTON = 'xpath=/html/body/div[2]/div/div[3]/div/button'
+MARK_ATTENDANCE_BUTTON = 'xpath=//*[@id="headerTopContent"]/div[2]/div[1]/div[2]/div/button'
+ATTENDANCE_DIALOG = 'xpath=/html/body/div[2]/div/div[3]/div'
+FINAL_MARK_BUTTON = 'xpath=/html/body/div[2]/div/div[3]/div/div[2]/div/div/div[2]/button[2]'
+
+# Request sent by the final button, and what it answers when the punch is recorded
+ATTENDANCE_API = 'timeoffice/mobile/checkin/Attendance/Request'
+SUCCESS_MESSAGE = 'Record saved successfully.'
+
+
+class AttendanceError(Exception):
+    """A failed step of the flow: 'login', 'dashboard' or 'attendance'."""
+
+    def __init__(self, step, error):
+        super().__init__(f"{step}: {error}")
+        self.step = step
+        self.error = error
+
+
+async def login(page, username, password, base_url=BASE_URL, log=print):
+    """The two-step username -> password login. Raises AttendanceError('login', ...)."""
+    try:
+        # Navigate to login page; the form is usable long before the network goes quiet
+        log("Navigating to HR One login page...")
+        await page.goto(f'{base_url}/login', wait_until='domcontentloaded')
+
+        # Enter username and click continue (fill and click wait for the element themselves)
+        log("Entering username...")
+        await page.fill(USERNAME_INPUT, username)
+        log("Clicking Next...")
+        await page.click(NEXT_BUTTON)
+
+        # Enter password once the field is visible
+        log("Entering password...")
+        await page.fill(PASSWORD_INPUT, password, timeout=10000)
+
+        # Click the login button on password page
+        log("Clicking login button...")
+        await page.click(LOGIN_BUTTON, timeout=10000)
+    except Exception as e:
+        raise AttendanceError('login', e) from e
+
+
+async def resume_session(page, base_url=BASE_URL, log=print):
+    """
+    Open the app with the context's saved cookies and localStorage.
+
+    Returns True if it lands on the dashboard, False if the app sends it to the
+    login form (the session has expired server-side).
+    """
+    log("Opening HR One with the saved session...")
+    dashboard = page.locator(DASHBOARD_HEADER).or_(page.locator(MODAL_CLOSE_BUTTON))
+    login_form = page.locator(USERNAME_INPUT)
+    try:
+        await page.goto(base_url, wait_until='domcontentloaded')
+        await dashboard.or_(login_form).first.wait_for(state='visible', timeout=15000)
+        resumed = not await login_form.is_visible()
+    except Exception as e:
+        log(f"Saved session did not load: {str(e).splitlines()[0]}")
+        return False
+    log("✅ Saved session is valid" if resumed else "Saved session has expired, logging in")
+    return resumed
+
+
+async def mark_attendance(page, username, password, base_url=BASE_URL, log=print, resume=False, mark=None):
+    """
+    Log in and mark attendance on an open page.
+
+    Every step waits on an explicit signal (an element state or the attendance
+    API response) instead of fixed sleeps or networkidle, so a run takes as
+    long as the site does. With resume=True the page's context is expected to
+    carry a saved session (see session_store.py); the login is skipped while it
+    is still valid. Returns True if the saved session was used.
+
+    mark, if given, is called with the name of each step as it starts ('session',
+    'login', 'dashboard', 'attendance') and with None when the run ends; see
+    page_profile.RunStats.mark.
+
+    Raises AttendanceError with the step that failed. Does not take screenshots
+    or close anything, so callers decide what to do with the page.
+    """
+    mark = mark or (lambda step: None)
+    try:
+        return await _mark_attendance(page, username, password, base_url, log, resume, mark)
+    finally:
+        mark(None)
+
+
+async def _mark_attendance(page, username, password, base_url, log, resume, mark):
+    mark('session')
+    resumed = resume and await resume_session(page, base_url, log)
+    if not resumed:
+        mark('login')
+        await login(page, username, password, base_url, log)
+
+    # Whichever shows up first after login: the dashboard header or the promo modal on top of it
+    mark('dashboard')
+    log("Waiting for dashboard to load...")
+    header, modal_close = page.locator(DASHBOARD_HEADER), page.locator(MODAL_CLOSE_BUTTON)
+    try:
+        await header.or_(modal_close).first.wait_for(state='visible', timeout=15000)
+        log("✅ Dashboard loaded successfully!")
+    except Exception as e:
+        raise AttendanceError('dashboard', e) from e
+
+    mark('attendance')
+    try:
+        # Close the modal whenever it is in the way of a click, now or a moment later
+        async def close_modal(*_):
+            log("Modal detected. Attempting to close...")
+            await modal_close.click()
+            log("✅ Modal closed successfully")
+
+        await page.add_locator_handler(modal_close, close_modal)
+
+        # Click the Mark Attendance button
+        log("Clicking Mark Attendance button...")
+        await page.click(MARK_ATTENDANCE_BUTTON, timeout=10000)
+        log("✅ Mark Attendance button clicked successfully!")
+
+        # Wait for attendance dialog to appear
+        log("Waiting for attendance dialog...")
+        await page.wait_for_selector(ATTENDANCE_DIALOG, state='visible', timeout=10000)
+        log("✅ Attendance dialog appeared")
+
+        # Click the final Mark Attendance button and wait for the API to answer
+        log("Clicking final Mark Attendance button in dialog...")
+        async with page.expect_response(lambda response: ATTENDANCE_API in response.url,
+                                        timeout=15000) as response_info:
+            await page.click(FINAL_MARK_BUTTON, timeout=10000)
+        response = await response_info.value
+        message = (await response.json()).get('message')
+    except Exception as e:
+        raise AttendanceError('attendance', e) from e
+
+    if message != SUCCESS_MESSAGE:
+        raise AttendanceError('attendance', f"HTTP {response.status}: {message or 'Unknown error occurred'}")
+    log(f"✅ Success: {message}")
+    return resumed
+
+
+async def open_account_context(browser, username, sessions=None, **options):
+    """A new browser context, carrying the account's saved session if there is a valid one."""
+    state = sessions.load(username) if sessions else None
+    context = await browser.new_context(storage_state=state, **options)
+    return context, state is not None
+
+
+async def finish_session(context, username, sessions, ok, resumed):
+    """Keep the session of a successful run; drop a saved one that failed."""
+    if not sessions:
+        return
+    if ok:
+        sessions.save(username, await context.storage_state())
+    elif resumed:
+        sessions.discard(username)
+
+
+async def login_to_hrone(username, password, headless=False, sessions=None, request_filter=None, lite=False,
+                         artifacts=None, pause=False):
+    """
+    lite runs headless in a small window; request_filter (page_profile.RequestFilter)
+    aborts the requests the flow doesn't need. On failure the page is saved to
+    artifacts (failure_capture.FailureCapture), and with pause=True a visible
+    browser stays open in the inspector. Returns True if attendance was marked.
+    """
+    headless = headless or lite
     async with async_playwright() as p:
-        # Launch browser (visible mode)
-        browser = await p.chromium.launch(headless=False, slow_mo=100)
-        context = await browser.new_context(viewport={'width': 1920, 'height': 1080})
-        page = await context.new_page()
-        
+        # Visible mode slows every action down so it can be followed; headless runs at full speed
+        browser = await p.chromium.launch(headless=headless, slow_mo=0 if headless else 100)
         try:
-            # Navigate to login page
-            print("Navigating to HR One login page...")
-            await page.goto('https://app.hrone.cloud/login', wait_until='networkidle')
-            
-            # Enter username and click continue
-            print("Entering username...")
-            await page.fill('#hrone-username', username)
-            print("Clicking Next...")
-            await page.click('//*[@id="login-register"]/div/div[1]/div[2]/button')
-            
-            # Wait for password field to be visible
-            print("Waiting for password field...")
-            password_field = await page.wait_for_selector('#hrone-password', state='visible', timeout=10000)
-            
-            # Enter password
-            print("Entering password...")
-            await password_field.fill(password)
-            
-            # Click the login button on password page
-            print("Clicking login button...")
-            login_button = await page.wait_for_selector('//*[@id="login-register"]/div/div[3]/div[3]/button[2]', state='visible', timeout=10000)
-            await login_button.click()
-            
-            # Wait for navigation to complete and dashboard to load
-            print("Waiting for dashboard to load...")
+            viewport = LITE_VIEWPORT if lite else DESKTOP_VIEWPORT
+            context, resume = await open_account_context(browser, username, sessions, viewport=viewport)
+            stats = RunStats()
+            if request_filter:
+                await request_filter.install(context, stats)
+            else:
+                stats.attach(context)
+            page = await context.new_page()
+            network = NetworkLog(page)
+
             try:
-                # Wait for the dashboard header to be visible
-                dashboard_header = await page.wait_for_selector(
-                    'xpath=/html/body/app-root/app-main-dashboard/app-main/div/app-header/header/nav',
-                    state='visible',
-                    timeout=15000  # 15 seconds timeout
-                )
-                print("✅ Dashboard loaded successfully!")
-                
-                # Add a small delay to ensure any modals have time to appear
-                await asyncio.sleep(2)
-                
-                # Check for modal and close it if visible
-                try:
-                    print("Checking for modal...")
-                    modal = await page.query_selector('xpath=/html/body/div[2]/div')
-                    if modal and await modal.is_visible():
-                        print("Modal detected. Attempting to close...")
-                        close_button = await page.wait_for_selector(
-                            'xpath=/html/body/div[2]/div/div[3]/div/button', 
-                            state='visible', 
-                            timeout=5000
-                        )
-                        await close_button.click()
-                        print("✅ Modal closed successfully")
-                    else:
-                        print("No modal found")
-                    
-                    # Click the Mark Attendance button
-                    print("Clicking Mark Attendance button...")
-                    mark_attendance_btn = await page.wait_for_selector(
-                        'xpath=//*[@id="headerTopContent"]/div[2]/div[1]/div[2]/div/button',
-                        state='visible',
-                        timeout=10000
-                    )
-                    await mark_attendance_btn.click()
-                    print("✅ Mark Attendance button clicked successfully!")
-
-                    # Wait for attendance dialog to appear
-                    print("Waiting for attendance dialog...")
-                    attendance_dialog = await page.wait_for_selector(
-                        'xpath=/html/body/div[2]/div/div[3]/div',
-                        state='visible',
-                        timeout=10000
-                    )
-                    print("✅ Attendance dialog appeared")
-
-                    # Click the final Mark Attendance button in the dialog
-                    print("Clicking final Mark Attendance button in dialog...")
-                    final_mark_btn = await page.wait_for_selector(
-                        'xpath=/html/body/div[2]/div/div[3]/div/div[2]/div/div/div[2]/button[2]',
-                        state='visible',
-                        timeout=10000
-                    )
-                    await final_mark_btn.click()
-                    print("✅ Final Mark Attendance button clicked successfully!")
-                    
-                    # # Wait for the network request to complete and check response
-                    # print("Waiting for attendance request to complete...")
-                    
-                    # try:
-                    #     # Wait for the API response with a timeout
-                    #     response = await page.wait_for_response(
-                    #         lambda response: "timeoffice/mobile/checkin/Attendance/Request" in response.url,
-                    #         timeout=15000  # 15 seconds timeout
-                    #     )
-                        
-                    #     try:
-                    #         response_data = await response.json()
-                    #         if response_data.get("message") == "Record saved successfully.":
-                    #             print("✅ Success: Record saved successfully!")
-                    #             print(f"Response: {response_data}")
-                    #         else:
-                    #             error_msg = response_data.get("message", "Unknown error occurred")
-                    #             print(f"❌ Error: {error_msg}")
-                    #             await page.screenshot(path='attendance_error.png')
-                    #             print("Screenshot saved as attendance_error.png")
-                    #     except Exception as e:
-                    #         print(f"❌ Error parsing response: {str(e)}")
-                    #         await page.screenshot(path='attendance_error.png')
-                    #         print("Screenshot saved as attendance_error.png")
-                            
-                    # except Exception as e:
-                    #     print(f"❌ Error waiting for attendance response: {str(e)}")
-                    #     await page.screenshot(path='attendance_timeout.png')
-                    #     print("Screenshot saved as attendance_timeout.png")
-                    
-                except Exception as modal_error:
-                    print(f"❌ Error during attendance process: {str(modal_error)}")
-                    await page.screenshot(path='attendance_error.png')
-                    print("Screenshot saved as attendance_error.png")
+                resumed = await mark_attendance(page, username, password, resume=resume, mark=stats.mark)
+                await finish_session(context, username, sessions, True, resume)
+
+                # After all operations are complete
+                await stats.settle()
+                run = "warm, saved session" if resumed else "cold, full login"
+                print(f"✅ All operations completed successfully in {stats.seconds:.1f}s ({run})")
+                print(f"   {stats.summary()}")
+                return True
+            except AttendanceError as e:
+                await finish_session(context, username, sessions, False, resume)
+                print(f"❌ Error during {e.step}: {str(e.error)}")
+                if artifacts:
+                    folder = await artifacts.capture(page, e.step, e.error, network, label=username)
+                    print(f"Failure artifacts saved in {folder}")
+                if pause and not headless:
                     # Keep browser open for inspection
                     await page.pause()
-                    raise
-                    
-            except Exception as e:
-                print(f"❌ Error waiting for dashboard: {str(e)}")
-                await page.screenshot(path='dashboard_error.png')
-                print("Screenshot saved as dashboard_error.png")
-                # Keep browser open for inspection
-                await page.pause()
-                raise
-            
-            # After all operations are complete
-            print("✅ All operations completed successfully!")
-            print("Waiting for 3 seconds before closing...")
-            await asyncio.sleep(3)
-            await browser.close()
-            print("✅ Browser closed.")
-            
-        except Exception as e:
-            print(f"An error occurred: {str(e)}")
-            # Take screenshot on error
-            await page.screenshot(path='login_error.png')
-            print("Screenshot saved as login_error.png")
-        
+                return False
         finally:
-            # Close browser
+            # Close browser (once, whatever happened above)
             await browser.close()
+            print("✅ Browser closed.")
 
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mark HR One attendance")
+    parser.add_argument('--headless', action='store_true', help="fast mode: no window, no slow_mo")
+    parser.add_argument('--no-session', action='store_true', help="always log in, don't reuse a saved session")
+    parser.add_argument('--lite', action='store_true', help="headless in a small window")
+    parser.add_argument('--no-block', action='store_true', help="load every resource the site asks for")
+    parser.add_argument('--block-types', help="comma-separated resource types to abort (default: image,media,font)")
+    parser.add_argument('--block-domains', help="comma-separated extra domains to abort")
+    parser.add_argument('--pause', action='store_true', help="on failure, keep the browser open in the inspector")
+    parser.add_argument('--no-artifacts', action='store_true', help="don't save screenshots and logs of failures")
+    args = parser.parse_args()
+
     # Set credentials
     username = os.getenv('HRONE_USERNAME')
     password = os.getenv('HRONE_PASSWORD')
-    
+
     if not username or not password:
         print("Error: Both username and password are required")
-        return
-    
+        sys.exit(2)
+
+    sessions = None if args.no_session else SessionStore()
+    if sessions and not sessions.enabled:
+        print("Sessions are not saved: set HRONE_SESSION_KEY (python session_store.py keygen) "
+              "and install cryptography")
+        sessions = None
+
+    request_filter = None
+    if not args.no_block:
+        request_filter = RequestFilter()
+        if args.block_types:
+            request_filter.block_types = frozenset(args.block_types.split(','))
+        if args.block_domains:
+            request_filter.block_domains += tuple(args.block_domains.split(','))
+
     print("Starting HR One login automation with Playwright...")
-    asyncio.run(login_to_hrone(username, password))
+    ok = asyncio.run(login_to_hrone(username, password, headless=args.headless, sessions=sessions,
+                                    request_filter=request_filter, lite=args.lite,
+                                    artifacts=None if args.no_artifacts else FailureCapture(), pause=args.pause))
+    # a non-zero status lets cron or CI notice that attendance was not marked
+    sys.exit(0 if ok else 1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,358 @@
+"""
+Mark attendance through the HR One API, using the browser only to sign in.
+
+The UI flow exists to send one request, the POST to
+timeoffice/mobile/checkin/Attendance/Request. This mode sends it directly
+with a pooled httpx client:
+
+1. Request template: the first time, one account is marked through the UI
+   while its attendance request (URL, method, headers and body) is recorded to
+   attendance_template.json, without credentials. Body fields that hold that
+   account's identity (its employee id from localStorage, or its username)
+   are noted, and filled in for each account when the body is sent. A body
+   with no such field is refused rather than saved, since replaying it would
+   mark the recording account every time. Later runs reuse the file.
+2. Token: taken from the account's saved session (session_store.py) without
+   opening a browser at all. Otherwise the browser logs in, and the token is
+   read from the app's own API calls or its localStorage, the account's
+   identity from its localStorage.
+3. Attendance: POST with the template, the account's identity and the token. Anything but
+   "Record saved successfully." is a failure. A 401 on a saved token triggers
+   one browser login and another try.
+
+    python hrone_api.py accounts.csv --concurrency 8
+    python hrone_api.py --mock 20
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import httpx
+from playwright.async_api import async_playwright
+
+from hrone import (ATTENDANCE_API, BASE_URL, DASHBOARD_HEADER, MODAL_CLOSE_BUTTON, SUCCESS_MESSAGE, AttendanceError,
+                   finish_session, login, mark_attendance, open_account_context, resume_session)
+from hrone_batch import Account, read_accounts
+from page_profile import LITE_VIEWPORT, RequestFilter
+from session_store import SessionStore
+
+TEMPLATE_PATH = os.getenv('HRONE_TEMPLATE', 'attendance_template.json')
+# localStorage keys the app may keep its bearer token under
+TOKEN_STORAGE_KEYS = ('access_token', 'token', 'authToken')
+# localStorage keys that identify the signed-in employee (employee_id, EmployeeCode, userId, ...)
+IDENTITY_KEY = re.compile(r'^(employee|emp|user)_?(id|code|no)$', re.I)
+# request headers not worth replaying (credentials, or set by the HTTP client itself)
+DROPPED_HEADERS = {'authorization', 'cookie', 'content-length', 'host', 'connection', 'accept-encoding'}
+ISO_TIME = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}')
+
+
+@dataclass
+class AttendanceTemplate:
+    url: str
+    method: str = 'POST'
+    headers: dict = field(default_factory=dict)
+    body: dict = field(default_factory=dict)
+    identity: dict = field(default_factory=dict)  # body field -> identity key its value comes from
+
+    @classmethod
+    def from_request(cls, request, identity):
+        """The recorded request; body fields holding a value from `identity` are filled in per account."""
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in DROPPED_HEADERS}
+        body = request.post_data_json or {}
+        sources = {value: key for key, value in identity.items() if value}
+        fields = {k: sources[str(v)] for k, v in body.items()
+                  if isinstance(v, (str, int)) and not isinstance(v, bool) and str(v) in sources}
+        return cls(request.url, request.method, headers, body, fields)
+
+    @classmethod
+    def load(cls, path=TEMPLATE_PATH):
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def save(self, path=TEMPLATE_PATH):
+        with open(path, 'w') as f:
+            json.dump(self.__dict__, f, indent=2)
+
+    def request_body(self, identity):
+        """The recorded body with timestamps moved to now and the identity fields set for this account."""
+        if not self.identity:
+            # the body would carry the recording account's id, whoever's token it is sent with
+            raise AttendanceError('template', "no field in the recorded body identifies the account")
+        now = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        body = {k: now if isinstance(v, str) and ISO_TIME.match(v) else v for k, v in self.body.items()}
+        for name, key in self.identity.items():
+            value = identity.get(key)
+            if not value:
+                # sending the recorded value would mark the recording account instead
+                raise AttendanceError('identity', f"no {key} for this account (needed for {name!r})")
+            body[name] = int(value) if isinstance(body[name], int) else value
+        return body
+
+
+def token_from_state(state):
+    """The bearer token in a Playwright storage state's localStorage, if any."""
+    for origin in (state or {}).get('origins', []):
+        for item in origin.get('localStorage', []):
+            if item['name'] in TOKEN_STORAGE_KEYS and item['value']:
+                return item['value']
+    return None
+
+
+def identity_from_state(state, username):
+    """The account's identity values: its username and any employee/user id in localStorage."""
+    identity = {'username': username}
+    for origin in (state or {}).get('origins', []):
+        for item in origin.get('localStorage', []):
+            if IDENTITY_KEY.match(item['name']) and item['value']:
+                identity.setdefault(item['name'], item['value'].strip('"'))
+    return identity
+
+
+@dataclass
+class ApiResult:
+    username: str
+    status: str = 'pending'  # ok, failed
+    token: str = '-'  # saved, browser
+    attempts: int = 0
+    auth_seconds: float = 0.0
+    api_seconds: float = 0.0
+    error: str = None
+
+
+class BrowserAuth:
+    """Signs accounts in with one lazily started browser, a context per account."""
+
+    def __init__(self, base_url=BASE_URL, sessions=None, headless=True, log=lambda msg: None):
+        self.base_url = base_url
+        self.sessions = sessions
+        self.headless = headless
+        self.log = log
+        self._stack = contextlib.AsyncExitStack()
+        self._browser = None
+        self._lock = asyncio.Lock()
+
+    async def _get_browser(self):
+        async with self._lock:
+            if self._browser is None:
+                p = await self._stack.enter_async_context(async_playwright())
+                self._browser = await p.chromium.launch(headless=self.headless)
+        return self._browser
+
+    async def close(self):
+        await self._stack.aclose()
+
+    async def sign_in(self, account, record=False):
+        """
+        Log in and return (token, identity, template). With record=True attendance is marked
+        through the UI and its request recorded as the template; otherwise template is None.
+        """
+        browser = await self._get_browser()
+        context, resume = await open_account_context(browser, account.username, self.sessions,
+                                                     viewport=LITE_VIEWPORT)
+        seen = {}
+        try:
+            await RequestFilter().install(context)
+            page = await context.new_page()
+
+            def on_request(request):
+                auth = request.headers.get('authorization', '')
+                if auth.lower().startswith('bearer ') and len(auth) > 7:
+                    seen.setdefault('token', auth[7:])
+                if ATTENDANCE_API in request.url:
+                    seen['request'] = request
+
+            page.on('request', on_request)
+            if record:
+                await mark_attendance(page, account.username, account.password, self.base_url, self.log, resume)
+            else:
+                if not (resume and await resume_session(page, self.base_url, self.log)):
+                    await login(page, account.username, account.password, self.base_url, self.log)
+                dashboard = page.locator(DASHBOARD_HEADER).or_(page.locator(MODAL_CLOSE_BUTTON))
+                try:
+                    await dashboard.first.wait_for(state='visible', timeout=15000)
+                except Exception as e:
+                    raise AttendanceError('dashboard', e) from e
+            state = await context.storage_state()
+            token = seen.get('token') or token_from_state(state)
+            if not token:
+                raise AttendanceError('auth', "signed in, but no bearer token was found")
+            identity = identity_from_state(state, account.username)
+            template = AttendanceTemplate.from_request(seen['request'], identity) if 'request' in seen else None
+            await finish_session(context, account.username, self.sessions, True, resume)
+            return token, identity, template
+        except Exception:
+            await finish_session(context, account.username, self.sessions, False, resume)
+            raise
+        finally:
+            await context.close()
+
+
+async def post_attendance(client, template, token, identity):
+    """Send the attendance request for `identity`; raises AttendanceError unless the record was saved."""
+    body = template.request_body(identity)
+    try:
+        response = await client.request(template.method, template.url, json=body,
+                                        headers={**template.headers, 'Authorization': f'Bearer {token}'})
+    except httpx.HTTPError as e:
+        raise AttendanceError('api', e) from e
+    if response.status_code == 401:
+        raise AttendanceError('auth', "token rejected (HTTP 401)")
+    try:
+        message = response.json().get('message')
+    except ValueError:
+        message = None
+    if message != SUCCESS_MESSAGE:
+        raise AttendanceError('api', f"HTTP {response.status_code}: {message or 'Unknown error occurred'}")
+
+
+async def run_api_account(client, auth, account, template, semaphore, sessions=None, retries=2, backoff=0.5):
+    result = ApiResult(account.username)
+    state = sessions.load(account.username) if sessions else None
+    token, identity = token_from_state(state), identity_from_state(state, account.username)
+    result.token = 'saved' if token else 'browser'
+
+    async with semaphore:
+        for attempt in range(retries + 1):
+            result.attempts = attempt + 1
+            if token is None:
+                start = time.perf_counter()
+                try:
+                    token, identity, _ = await auth.sign_in(account)
+                except Exception as e:
+                    result.status, result.error = 'failed', str(getattr(e, 'error', e)).splitlines()[0][:120]
+                    return result
+                finally:
+                    result.auth_seconds += time.perf_counter() - start
+                result.token = 'browser'
+            start = time.perf_counter()
+            try:
+                await post_attendance(client, template, token, identity)
+                result.status, result.error = 'ok', None
+                return result
+            except AttendanceError as e:
+                result.status, result.error = 'failed', str(e.error)[:120]
+                if e.step == 'template':
+                    return result
+                if e.step in ('auth', 'identity'):
+                    token = None  # sign in again on the next attempt
+                    if sessions:
+                        sessions.discard(account.username)
+                    continue
+            finally:
+                result.api_seconds += time.perf_counter() - start
+            if attempt < retries:
+                await asyncio.sleep(backoff * 2 ** attempt + random.uniform(0, backoff))
+    return result
+
+
+async def run_api_batch(accounts, base_url=BASE_URL, concurrency=8, retries=2, sessions=None,
+                        template_path=TEMPLATE_PATH, headless=True):
+    auth = BrowserAuth(base_url, sessions, headless)
+    results = []
+    try:
+        template = AttendanceTemplate.load(template_path)
+        if template is None and accounts:
+            # mark the first account through the UI and record its request
+            first, accounts = accounts[0], accounts[1:]
+            start = time.perf_counter()
+            for attempt in range(retries + 1):
+                try:
+                    _, _, template = await auth.sign_in(first, record=True)
+                    break
+                except Exception as e:
+                    if attempt == retries:
+                        raise SystemExit(f"Could not record the attendance request: {getattr(e, 'error', e)}")
+            if template is None:
+                raise SystemExit("Marked attendance through the UI, but its request was not seen")
+            if not template.identity:
+                raise SystemExit(f"No field of the recorded attendance request holds {first.username}'s "
+                                 "employee id or username, so it cannot be sent for other accounts; "
+                                 "use hrone_batch.py instead")
+            template.save(template_path)
+            results.append(ApiResult(first.username, 'ok', 'browser', attempt + 1, time.perf_counter() - start))
+            print(f"Recorded the attendance request to {template_path}")
+
+        elif template is not None and not template.identity:
+            raise SystemExit(f"{template_path} has no identity fields and would mark its recording account "
+                             "for everyone; delete it to record again, or use hrone_batch.py")
+
+        semaphore = asyncio.Semaphore(concurrency)
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=15.0) as client:
+            results += await asyncio.gather(*(
+                run_api_account(client, auth, account, template, semaphore, sessions, retries)
+                for account in accounts
+            ))
+    finally:
+        await auth.close()
+    return results
+
+
+def print_results(results, seconds):
+    print(f"\n{'account':<28}{'status':<8}{'token':<9}{'attempts':>9}{'auth s':>8}{'api s':>8}  error")
+    for r in results:
+        print(f"{r.username[:27]:<28}{r.status:<8}{r.token:<9}{r.attempts:>9}{r.auth_seconds:>8.2f}"
+              f"{r.api_seconds:>8.3f}  {r.error or ''}")
+    ok = [r for r in results if r.status == 'ok']
+    print(f"\n{len(ok)}/{len(results)} accounts marked in {seconds:.1f}s")
+    if ok:
+        print(f"  mean per account: {sum(r.auth_seconds for r in ok) / len(ok):.2f}s signing in, "
+              f"{sum(r.api_seconds for r in ok) / len(ok) * 1000:.0f}ms on the attendance call")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mark HR One attendance through the API")
+    parser.add_argument('accounts', nargs='?', help="CSV file with username,password columns")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--template', default=TEMPLATE_PATH, help="recorded attendance request")
+    parser.add_argument('--headed', action='store_true', help="show the browser while signing in")
+    parser.add_argument('--no-session', action='store_true', help="always sign in through the browser")
+    parser.add_argument('--mock', type=int, metavar='N', help="run N fake accounts against mock_hrone.py")
+    parser.add_argument('--fail-rate', type=float, default=0.2, help="mock only: failing attendance requests")
+    args = parser.parse_args()
+
+    base_url = BASE_URL
+    if args.mock:
+        from mock_hrone import MockHROne
+
+        server = MockHROne(fail_rate=args.fail_rate)
+        base_url = server.start()
+        accounts = [Account(f"employee{i:03d}", 'secret') for i in range(args.mock)]
+        if args.template == TEMPLATE_PATH:
+            # the mock's port changes every run, so record a fresh template each time
+            args.template = os.path.join(tempfile.mkdtemp(), 'attendance_template.json')
+    elif args.accounts:
+        accounts = read_accounts(args.accounts)
+    else:
+        parser.error("give a CSV of accounts or --mock N")
+
+    sessions = None if args.no_session else SessionStore()
+    if sessions and not sessions.enabled:
+        print("Sessions are not saved: set HRONE_SESSION_KEY (python session_store.py keygen) "
+              "and install cryptography")
+        sessions = None
+
+    start = time.perf_counter()
+    results = asyncio.run(run_api_batch(accounts, base_url, args.concurrency, args.retries, sessions,
+                                        args.template, headless=not args.headed))
+    print_results(results, time.perf_counter() - start)
+    if any(r.status != 'ok' for r in results):
+        sys.exit(1)  # for cron / CI: at least one account was not marked
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Mark attendance for a whole team with one browser.
+
+Reads credentials from a CSV file (columns: username,password), launches a
+single Chromium and runs the accounts concurrently, each in its own browser
+context (cookies and storage are isolated per account). At most
+`--concurrency` contexts are open at once. A failed account is retried with
+exponential backoff, then a per-account results table is printed.
+Accounts with a valid saved session (see session_store.py) skip the login.
+
+    python hrone_batch.py accounts.csv --concurrency 4 --retries 2
+
+Try it against the local mock site instead of the real one:
+
+    python hrone_batch.py --mock 20 --concurrency 5
+"""
+
+import asyncio
+import csv
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+
+from playwright.async_api import async_playwright
+
+from hrone import BASE_URL, finish_session, mark_attendance, open_account_context
+from failure_capture import FailureCapture, NetworkLog
+from page_profile import LITE_VIEWPORT, RequestFilter, RunStats
+from session_store import SessionStore
+
+
+@dataclass
+class Account:
+    username: str
+    password: str
+
+
+@dataclass
+class AccountResult:
+    username: str
+    status: str = 'pending'  # ok, failed
+    attempts: int = 0
+    seconds: float = 0.0
+    failed_step: str = None
+    error: str = None
+    session: str = '-'  # saved, login
+    bytes: int = 0  # over all attempts
+    steps: dict = field(default_factory=dict)  # step -> seconds, over all attempts
+
+
+def read_accounts(path):
+    with open(path, newline='') as f:
+        return [Account(row['username'].strip(), row['password']) for row in csv.DictReader(f)]
+
+
+async def run_account(browser, account, semaphore, base_url=BASE_URL, retries=2, backoff=1.0,
+                      viewport=LITE_VIEWPORT, verbose=False, sessions=None, request_filter=None, artifacts=None):
+    result = AccountResult(account.username)
+    start = time.perf_counter()
+    log = (lambda msg: print(f"[{account.username}] {msg}")) if verbose else (lambda msg: None)
+
+    for attempt in range(retries + 1):
+        result.attempts = attempt + 1
+        async with semaphore:
+            # a fresh context per attempt: nothing leaks between accounts or from a failed try
+            context = page = network = None
+            resume = False
+            stats = RunStats()
+            try:
+                # opened inside the try: a saved session the browser rejects, or a browser error,
+                # fails this attempt of this account instead of the whole batch
+                context, resume = await open_account_context(browser, account.username, sessions, viewport=viewport)
+                if request_filter:
+                    await request_filter.install(context, stats)
+                else:
+                    stats.attach(context)
+                page = await context.new_page()
+                network = NetworkLog(page)
+                resumed = await mark_attendance(page, account.username, account.password, base_url, log, resume,
+                                                mark=stats.mark)
+                await finish_session(context, account.username, sessions, True, resume)
+                result.status, result.failed_step, result.error = 'ok', None, None
+                result.session = 'saved' if resumed else 'login'
+                break
+            except Exception as e:
+                if context is None:
+                    if sessions:
+                        sessions.discard(account.username)  # retry with a plain login
+                else:
+                    await finish_session(context, account.username, sessions, False, resume)
+                result.status = 'failed'
+                result.failed_step = getattr(e, 'step', 'setup')
+                result.error = str(getattr(e, 'error', e)).splitlines()[0][:120]
+                if artifacts and page is not None:
+                    await artifacts.capture(page, result.failed_step, result.error, network,
+                                            label=f"{account.username}-{attempt + 1}")
+            finally:
+                await stats.settle()
+                result.bytes += stats.bytes
+                for step, seconds in stats.steps.items():
+                    result.steps[step] = result.steps.get(step, 0.0) + seconds
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:  # the browser went away; the attempt is already recorded
+                        pass
+        if attempt < retries:
+            # exponential backoff with jitter, outside the semaphore so others can use the slot
+            delay = backoff * 2 ** attempt + random.uniform(0, backoff)
+            log(f"attempt {attempt + 1} failed ({result.error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+async def run_batch(accounts, base_url=BASE_URL, concurrency=4, retries=2, backoff=1.0, headless=True,
+                    verbose=False, sessions=None, request_filter=None, artifacts=None):
+    semaphore = asyncio.Semaphore(concurrency)
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        try:
+            return await asyncio.gather(*(
+                run_account(browser, account, semaphore, base_url, retries, backoff, verbose=verbose,
+                            sessions=sessions, request_filter=request_filter, artifacts=artifacts)
+                for account in accounts
+            ))
+        finally:
+            await browser.close()
+
+
+def print_results(results, seconds):
+    print(f"\n{'account':<28}{'status':<8}{'session':<9}{'attempts':>9}{'seconds':>9}{'KB':>8}  error")
+    for r in results:
+        error = f"{r.failed_step}: {r.error}" if r.error else ''
+        print(f"{r.username[:27]:<28}{r.status:<8}{r.session:<9}{r.attempts:>9}{r.seconds:>9.1f}"
+              f"{r.bytes / 1024:>8.0f}  {error}")
+    ok = sum(r.status == 'ok' for r in results)
+    print(f"\n{ok}/{len(results)} accounts marked in {seconds:.1f}s, "
+          f"{sum(r.bytes for r in results) / 1024 / 1024:.1f} MB transferred")
+    for session in ('login', 'saved'):
+        times = [r.seconds for r in results if r.status == 'ok' and r.session == session]
+        if times:
+            label = 'cold (full login)' if session == 'login' else 'warm (saved session)'
+            print(f"  {label:<22}{len(times):>4} accounts, {sum(times) / len(times):.1f}s on average")
+    steps = {}
+    for r in results:
+        for step, seconds in r.steps.items():
+            steps.setdefault(step, []).append(seconds)
+    if steps:
+        means = ', '.join(f"{step} {sum(times) / len(times):.1f}s" for step, times in steps.items())
+        print(f"  mean per account and step: {means}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mark HR One attendance for many accounts")
+    parser.add_argument('accounts', nargs='?', help="CSV file with username,password columns")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--backoff', type=float, default=1.0, help="seconds before the first retry")
+    parser.add_argument('--headed', action='store_true', help="show the browser")
+    parser.add_argument('--verbose', action='store_true', help="print every step of every account")
+    parser.add_argument('--no-session', action='store_true', help="always log in, don't reuse saved sessions")
+    parser.add_argument('--no-block', action='store_true', help="load every resource the site asks for")
+    parser.add_argument('--no-artifacts', action='store_true', help="don't save screenshots and logs of failures")
+    parser.add_argument('--mock', type=int, metavar='N', help="run N fake accounts against mock_hrone.py")
+    parser.add_argument('--fail-rate', type=float, default=0.2, help="mock only: failing attendance requests")
+    args = parser.parse_args()
+
+    base_url = BASE_URL
+    if args.mock:
+        from mock_hrone import MockHROne
+
+        server = MockHROne(fail_rate=args.fail_rate)
+        base_url = server.start()
+        accounts = [Account(f"employee{i:03d}", 'secret') for i in range(args.mock)]
+    elif args.accounts:
+        accounts = read_accounts(args.accounts)
+    else:
+        parser.error("give a CSV of accounts or --mock N")
+
+    sessions = None if args.no_session else SessionStore()
+    if sessions and not sessions.enabled:
+        print("Sessions are not saved: set HRONE_SESSION_KEY (python session_store.py keygen) "
+              "and install cryptography")
+        sessions = None
+
+    start = time.perf_counter()
+    results = asyncio.run(run_batch(accounts, base_url, args.concurrency, args.retries, args.backoff,
+                                    headless=not args.headed, verbose=args.verbose, sessions=sessions,
+                                    request_filter=None if args.no_block else RequestFilter(),
+                                    artifacts=None if args.no_artifacts else FailureCapture()))
+    print_results(results, time.perf_counter() - start)
+    if any(r.status != 'ok' for r in results):
+        sys.exit(1)  # for cron / CI: at least one account was not marked
+
+
+if __name__ == "__main__":
+    main()
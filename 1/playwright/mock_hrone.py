@@ -0,0 +1,344 @@
+"""
+Local stand-in for the HR One web app, for trying the automation without a real account.
+
+It serves a login page, a dashboard and the attendance API with the same
+element ids and XPath structure that hrone.py relies on:
+
+- /login: username step, then password step, then POST /api/login
+  (sets a session cookie and stores an access token and the account's
+  employee id in localStorage)
+- /assets/...: a stylesheet plus heavy images, fonts and a video, and an
+  analytics script from a second host name (localhost), for request blocking
+- /dashboard: header nav, an optional promo modal, the Mark Attendance button
+  and dialog, which POSTs to /api/timeoffice/mobile/checkin/Attendance/Request,
+  plus a few background widget requests like the real dashboard makes. The
+  request names the employee, and is refused unless that is the token's owner
+
+Every account is accepted with the password "secret" (or anything, if
+password checking is off). Marked attendance is recorded on the server object.
+
+Run it standalone:
+
+    python mock_hrone.py --port 8000
+    HRONE_BASE_URL=http://127.0.0.1:8000 python hrone.py
+"""
+
+import json
+import random
+import secrets
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+ATTENDANCE_PATH = '/api/timeoffice/mobile/checkin/Attendance/Request'
+
+LOGIN_PAGE = """<!doctype html>
+<html><head><title>HR One - Login</title></head>
+<body>
+__ASSETS__
+<div id="login-register"><div>
+  <div>
+    <div><input id="hrone-username" placeholder="Username"></div>
+    <div><button type="button" onclick="nextStep()">Next</button></div>
+  </div>
+  <div></div>
+  <div id="password-step" style="display:none">
+    <div><span id="shown-user"></span></div>
+    <div><input id="hrone-password" type="password" placeholder="Password"></div>
+    <div><button type="button" onclick="location.reload()">Back</button><button type="button" onclick="login()">Login</button></div>
+  </div>
+  <div id="login-error" style="color:red"></div>
+</div></div>
+<script>
+function nextStep() {
+  document.getElementById('shown-user').textContent = document.getElementById('hrone-username').value;
+  setTimeout(function () { document.getElementById('password-step').style.display = 'block'; }, __PASSWORD_STEP_MS__);
+}
+function login() {
+  fetch('/api/login', {method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({
+    username: document.getElementById('hrone-username').value,
+    password: document.getElementById('hrone-password').value})})
+  .then(function (r) { return r.json().then(function (body) { return [r.status, body]; }); })
+  .then(function (result) {
+    if (result[0] !== 200) { document.getElementById('login-error').textContent = result[1].message; return; }
+    localStorage.setItem('access_token', result[1].access_token);
+    localStorage.setItem('employee_id', result[1].employee_id);
+    location.href = '/dashboard';
+  });
+}
+</script>
+</body></html>
+"""
+
+DASHBOARD_PAGE = """<!doctype html>
+<html><head><title>HR One - Dashboard</title></head>
+<body>
+__ASSETS__
+<div id="toast"></div>
+<app-root><app-main-dashboard><app-main><div>
+  <app-header><header>
+    <nav style="display:none" id="main-nav"><a href="/dashboard">Home</a></nav>
+    <div id="headerTopContent">
+      <div>Welcome</div>
+      <div><div>
+        <div>Today</div>
+        <div><div><button type="button" onclick="openDialog()">Mark Attendance</button></div></div>
+      </div></div>
+    </div>
+  </header></app-header>
+</div></app-main></app-main-dashboard></app-root>
+<div class="cdk-overlay-container"></div>
+<script>
+var overlay = document.querySelector('.cdk-overlay-container');
+function pane(inner) { return '<div class="pane"><div></div><div></div><div>' + inner + '</div></div>'; }
+function closeOverlay() { overlay.innerHTML = ''; }
+function openDialog() {
+  overlay.innerHTML = pane(
+    '<div class="dialog"><div>Mark attendance</div><div><div><div>' +
+    '<div>' + new Date().toLocaleTimeString() + '</div>' +
+    '<div><button type="button" onclick="closeOverlay()">Cancel</button>' +
+    '<button type="button" onclick="submitAttendance()">Mark Attendance</button></div>' +
+    '</div></div></div></div>');
+}
+function submitAttendance() {
+  fetch('__ATTENDANCE_PATH__', {method: 'POST', headers: {'Content-Type': 'application/json',
+    'Authorization': 'Bearer ' + localStorage.getItem('access_token')},
+    body: JSON.stringify({employeeId: Number(localStorage.getItem('employee_id')), requestType: 'A',
+                          remarks: '', punchTime: new Date().toISOString()})})
+  .then(function (r) { return r.json(); })
+  .then(function (body) { closeOverlay(); document.getElementById('toast').textContent = body.message; });
+}
+// dashboard widgets load in the background, as they do on the real site
+for (var i = 0; i < __WIDGETS__; i++) {
+  fetch('/api/widget/' + i, {headers: {'Authorization': 'Bearer ' + localStorage.getItem('access_token')}});
+}
+setTimeout(function () { document.getElementById('main-nav').style.display = 'block'; }, __DASHBOARD_MS__);
+if (__SHOW_MODAL__) {
+  setTimeout(function () {
+    if (overlay.innerHTML) { return; }  // the real overlay would stack; don't clobber an open dialog
+    overlay.innerHTML = pane('<div class="promo"><p>What is new in HR One</p>' +
+                             '<button type="button" onclick="closeOverlay()">Close</button></div>');
+  }, __MODAL_MS__);
+}
+</script>
+</body></html>
+"""
+
+
+class MockHROne(ThreadingHTTPServer):
+    """
+    Args:
+        check_password: reject logins whose password isn't "secret".
+        fail_rate: fraction of attendance requests answered with a 500 (to exercise retries).
+        modal_rate: fraction of dashboard loads that show the promo modal.
+        password_step_ms / dashboard_ms / modal_ms: client-side delays before
+            the password field, the dashboard header and the modal appear.
+        api_ms: server-side latency of every /api request.
+        session_ttl: seconds a login (cookie and access token) stays valid on the server.
+        widgets: background requests the dashboard makes on load.
+        asset_kb: size of the banner image and video on every page (fonts are half); 0 for none.
+        tracker_host: host name the analytics script is loaded from (same server, other name).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), check_password=True, fail_rate=0.0, modal_rate=0.5,
+                 password_step_ms=100, dashboard_ms=200, modal_ms=300, api_ms=50, widgets=3,
+                 session_ttl=3600, asset_kb=300, tracker_host="localhost", seed=None):
+        super().__init__(address, MockHandler)
+        self.check_password = check_password
+        self.fail_rate = fail_rate
+        self.modal_rate = modal_rate
+        self.password_step_ms = password_step_ms
+        self.dashboard_ms = dashboard_ms
+        self.modal_ms = modal_ms
+        self.api_ms = api_ms
+        self.widgets = widgets
+        self.asset_kb = asset_kb
+        self.tracker_host = tracker_host
+        self.blobs = {}  # size -> incompressible bytes
+        self.random = random.Random(seed)
+        self.session_ttl = session_ttl
+        self.sessions = {}  # session cookie -> (username, expiry)
+        self.tokens = {}  # access token -> (username, expiry)
+        self.employee_ids = {}  # username -> employee id, assigned at first login
+        self.logins = 0
+        self.attendance = []  # (username, time, request body)
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def asset_tags(self):
+        if not self.asset_kb:
+            return ""
+        port = self.server_address[1]
+        return ('<link rel="stylesheet" href="/assets/app.css">'
+                f'<script async src="http://{self.tracker_host}:{port}/assets/collect.js"></script>'
+                '<img src="/assets/banner.jpg" width="1" height="1" alt="">'
+                '<video src="/assets/intro.mp4" preload="auto" width="1" height="1" muted></video>')
+
+    def blob(self, size):
+        if size not in self.blobs:
+            self.blobs[size] = random.Random(size).randbytes(size)
+        return self.blobs[size]
+
+    def valid(self, table, key):
+        """The username behind a session cookie or token, if it hasn't expired."""
+        username, expiry = table.get(key, (None, 0))
+        return username if expiry > time.time() else None
+
+    def employee_id(self, username):
+        with self.lock:
+            return self.employee_ids.setdefault(username, 1001 + len(self.employee_ids))
+
+    def expire_sessions(self):
+        """End every login server-side, as if they had all timed out."""
+        with self.lock:
+            self.sessions.clear()
+            self.tokens.clear()
+
+    def start(self):
+        """Serve on a background thread; returns the base URL."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.base_url
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server: MockHROne
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload), "application/json", headers)
+
+    def _session_user(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        session = cookie.get("session")
+        return self.server.valid(self.server.sessions, session.value) if session else None
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        server = self.server
+        if path == "/":
+            # the app root sends logged-in users to the dashboard
+            self._send(302, "", headers={"Location": "/dashboard" if self._session_user() else "/login"})
+        elif path == "/login":
+            page = (LOGIN_PAGE.replace("__PASSWORD_STEP_MS__", str(server.password_step_ms))
+                    .replace("__ASSETS__", server.asset_tags()))
+            self._send(200, page)
+        elif path == "/dashboard":
+            if not self._session_user():
+                self._send(302, "", headers={"Location": "/login"})
+                return
+            show_modal = server.random.random() < server.modal_rate
+            page = (DASHBOARD_PAGE.replace("__DASHBOARD_MS__", str(server.dashboard_ms))
+                    .replace("__MODAL_MS__", str(server.modal_ms))
+                    .replace("__SHOW_MODAL__", "true" if show_modal else "false")
+                    .replace("__WIDGETS__", str(server.widgets))
+                    .replace("__ASSETS__", server.asset_tags())
+                    .replace("__ATTENDANCE_PATH__", ATTENDANCE_PATH))
+            self._send(200, page)
+        elif path.startswith("/assets/"):
+            self._asset(path.rsplit("/", 1)[1])
+        elif path.startswith("/api/widget/"):
+            time.sleep(server.api_ms / 1000)
+            self._json(200, {"items": []})
+        else:
+            self._send(404, "not found", "text/plain")
+
+    def _asset(self, name):
+        kb = self.server.asset_kb * 1024
+        no_store = {"Cache-Control": "no-store"}
+        if name == "app.css":
+            css = ("@font-face { font-family: Brand; src: url(/assets/brand.woff2) format('woff2'); }\n"
+                   "body { font-family: Brand, sans-serif; margin: 0; }\n")
+            self._send(200, css, "text/css", no_store)
+        elif name == "collect.js":
+            self._send(200, "window.tracked = (window.tracked || 0) + 1;", "text/javascript", no_store)
+        elif name == "banner.jpg":
+            self._send(200, self.server.blob(kb), "image/jpeg", no_store)
+        elif name == "brand.woff2":
+            self._send(200, self.server.blob(kb // 2), "font/woff2", no_store)
+        elif name == "intro.mp4":
+            self._send(200, self.server.blob(kb), "video/mp4", no_store)
+        else:
+            self._send(404, "not found", "text/plain")
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        server = self.server
+        time.sleep(server.api_ms / 1000)
+        if path == "/api/login":
+            body = self._body()
+            username = body.get("username", "")
+            if not username or (server.check_password and body.get("password") != "secret"):
+                self._json(401, {"message": "Invalid username or password"})
+                return
+            session, token = secrets.token_hex(16), secrets.token_hex(16)
+            expiry = time.time() + server.session_ttl
+            employee_id = server.employee_id(username)
+            with server.lock:
+                server.sessions[session] = (username, expiry)
+                server.tokens[token] = (username, expiry)
+                server.logins += 1
+            self._json(200, {"access_token": token, "employee_id": employee_id}, headers={
+                "Set-Cookie": f"session={session}; Path=/; HttpOnly; Max-Age={server.session_ttl}"})
+        elif path == ATTENDANCE_PATH:
+            auth = self.headers.get("Authorization", "")
+            username = server.valid(server.tokens, auth.removeprefix("Bearer "))
+            if not username:
+                self._json(401, {"message": "Unauthorized"})
+                return
+            if server.random.random() < server.fail_rate:
+                self._json(500, {"message": "Something went wrong, please try again."})
+                return
+            body = self._body()
+            if body.get("employeeId") != server.employee_id(username):
+                self._json(403, {"message": "You are not authorized to apply on behalf of this employee."})
+                return
+            with server.lock:
+                server.attendance.append((username, time.time(), body))
+            self._json(200, {"message": "Record saved successfully."})
+        else:
+            self._json(404, {"message": "not found"})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local mock of the HR One login and attendance pages")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--modal-rate", type=float, default=0.5)
+    parser.add_argument("--password-step-ms", type=int, default=100)
+    parser.add_argument("--dashboard-ms", type=int, default=200)
+    parser.add_argument("--modal-ms", type=int, default=300)
+    parser.add_argument("--api-ms", type=int, default=50)
+    parser.add_argument("--asset-kb", type=int, default=300)
+    args = parser.parse_args()
+
+    server = MockHROne(("127.0.0.1", args.port), fail_rate=args.fail_rate, modal_rate=args.modal_rate,
+                       password_step_ms=args.password_step_ms, dashboard_ms=args.dashboard_ms,
+                       modal_ms=args.modal_ms, api_ms=args.api_ms, asset_kb=args.asset_kb)
+    print(f"Mock HR One on {server.base_url} (password: secret)")
+    server.serve_forever()
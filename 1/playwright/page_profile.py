@@ -0,0 +1,115 @@
+"""
+A lighter page for the attendance flow: request blocking and per-run accounting.
+
+RequestFilter aborts requests the flow never needs (images, media, fonts,
+analytics and ad domains) through a context-wide route. RunStats records
+what a run cost: requests made and blocked, bytes transferred and the time
+spent in each step of hrone.mark_attendance.
+
+    stats = RunStats()
+    context = await browser.new_context(viewport=LITE_VIEWPORT)
+    await RequestFilter().install(context, stats)
+    await mark_attendance(page, username, password, mark=stats.mark)
+    await stats.settle()
+    print(stats.summary())
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+DESKTOP_VIEWPORT = {'width': 1920, 'height': 1080}
+# the smallest window that still gets the desktop layout the XPaths in hrone.py are written against
+LITE_VIEWPORT = {'width': 1280, 'height': 720}
+
+DEFAULT_BLOCKED_TYPES = frozenset({'image', 'media', 'font'})
+DEFAULT_BLOCKED_DOMAINS = (
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googlesyndication.com',
+    'facebook.net', 'hotjar.com', 'clarity.ms', 'mixpanel.com', 'segment.io', 'newrelic.com',
+    'nr-data.net', 'intercom.io', 'intercomcdn.com', 'fullstory.com',
+)
+
+
+@dataclass
+class RequestFilter:
+    """
+    Args:
+        block_types: Playwright resource types to abort (image, media, font, stylesheet, ...).
+            Stylesheets are not blocked by default: visibility checks depend on them.
+        block_domains: hosts to abort, matched with their subdomains.
+        allow_domains: hosts never blocked, whatever their resource type.
+    """
+
+    block_types: frozenset = DEFAULT_BLOCKED_TYPES
+    block_domains: tuple = DEFAULT_BLOCKED_DOMAINS
+    allow_domains: tuple = ()
+
+    @staticmethod
+    def _matches(host, domains):
+        return any(host == d or host.endswith('.' + d) for d in domains)
+
+    def blocks(self, url, resource_type):
+        host = urlparse(url).hostname or ''
+        if self._matches(host, self.allow_domains):
+            return False
+        return resource_type in self.block_types or self._matches(host, self.block_domains)
+
+    async def install(self, context, stats=None):
+        """Route every request of the context through the filter."""
+
+        async def handle(route):
+            request = route.request
+            if self.blocks(request.url, request.resource_type):
+                if stats:
+                    stats.blocked += 1
+                await route.abort('blockedbyclient')
+            else:
+                await route.continue_()
+
+        await context.route('**/*', handle)
+        if stats:
+            stats.attach(context)
+
+
+@dataclass
+class RunStats:
+    requests: int = 0
+    blocked: int = 0
+    bytes: int = 0
+    steps: dict = field(default_factory=dict)  # step -> seconds
+    _pending: list = field(default_factory=list, repr=False)
+    _step: str = field(default=None, repr=False)
+    _started: float = field(default=0.0, repr=False)
+
+    def attach(self, context):
+        context.on('requestfinished', self._finished)
+
+    def _finished(self, request):
+        self.requests += 1
+        self._pending.append(asyncio.ensure_future(self._add_size(request)))
+
+    async def _add_size(self, request):
+        sizes = await request.sizes()
+        self.bytes += sum(max(0, size) for size in sizes.values())
+
+    async def settle(self):
+        """Wait for the sizes of finished requests; call before closing the context."""
+        pending, self._pending = self._pending, []
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def mark(self, step):
+        """Start timing `step`, ending the current one. mark(None) just ends it."""
+        now = time.perf_counter()
+        if self._step is not None:
+            self.steps[self._step] = self.steps.get(self._step, 0.0) + now - self._started
+        self._step, self._started = step, now
+
+    @property
+    def seconds(self):
+        return sum(self.steps.values())
+
+    def summary(self):
+        steps = ', '.join(f"{step} {seconds:.2f}s" for step, seconds in self.steps.items())
+        return (f"{self.requests} requests ({self.blocked} blocked), {self.bytes / 1024:.0f} KB "
+                f"transferred; {steps}")
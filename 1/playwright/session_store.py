@@ -0,0 +1,100 @@
+"""
+Encrypted Playwright storage state (cookies + localStorage) per account.
+
+A saved session lets hrone.py open the dashboard directly instead of going
+through the username -> password -> dashboard login. States are encrypted
+with Fernet using the key in HRONE_SESSION_KEY; without the key, with a key
+that isn't a valid Fernet key (a warning says so), or without the
+`cryptography` package, nothing is saved and every run logs in.
+
+    python session_store.py keygen    # prints a key for HRONE_SESSION_KEY
+"""
+
+import hashlib
+import json
+import os
+import time
+import warnings
+from pathlib import Path
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # sessions are optional; without cryptography every run logs in
+    Fernet = None
+
+SESSION_DIR = os.getenv('HRONE_SESSION_DIR', '.hrone_sessions')
+
+
+class SessionStore:
+    """
+    Args:
+        folder: where the encrypted states are kept, one file per account.
+        key: Fernet key; defaults to the HRONE_SESSION_KEY environment variable.
+        max_age: seconds after which a saved state is not even tried.
+    """
+
+    def __init__(self, folder=SESSION_DIR, key=None, max_age=12 * 3600):
+        self.folder = Path(folder)
+        self.max_age = max_age
+        key = key or os.getenv('HRONE_SESSION_KEY')
+        self.fernet = None
+        if key and Fernet is not None:
+            try:
+                self.fernet = Fernet(key)
+            except ValueError:  # a truncated or mistyped key shouldn't stop attendance from being marked
+                warnings.warn("HRONE_SESSION_KEY is not a valid Fernet key (make one with "
+                              "`python session_store.py keygen`); sessions are disabled")
+
+    @property
+    def enabled(self):
+        return self.fernet is not None
+
+    def _path(self, username):
+        # the file name doesn't reveal the account
+        return self.folder / f"{hashlib.sha256(username.encode('utf-8')).hexdigest()[:24]}.session"
+
+    def load(self, username):
+        """The saved storage state, or None if missing, unreadable, too old or with expired cookies."""
+        path = self._path(username)
+        if not self.enabled or not path.exists():
+            return None
+        try:
+            state = json.loads(self.fernet.decrypt(path.read_bytes(), ttl=self.max_age))
+        except (InvalidToken, ValueError):
+            self.discard(username)
+            return None
+        if self.expired(state):
+            self.discard(username)
+            return None
+        return state
+
+    def save(self, username, state):
+        if not self.enabled:
+            return
+        self.folder.mkdir(parents=True, exist_ok=True)
+        path = self._path(username)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_bytes(self.fernet.encrypt(json.dumps(state).encode('utf-8')))
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+
+    def discard(self, username):
+        self._path(username).unlink(missing_ok=True)
+
+    @staticmethod
+    def expired(state, now=None):
+        """True if every persistent cookie has expired (session cookies, expires == -1, don't count)."""
+        now = time.time() if now is None else now
+        expiries = [c['expires'] for c in state.get('cookies', []) if c.get('expires', -1) > 0]
+        return bool(expiries) and max(expiries) <= now
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ['keygen']:
+        if Fernet is None:
+            sys.exit("pip install cryptography first")
+        print(Fernet.generate_key().decode())
+    else:
+        sys.exit("usage: python session_store.py keygen")
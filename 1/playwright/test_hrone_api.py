@@ -0,0 +1,154 @@
+"""
+API mode against mock_hrone.py: the recorded template, identity fields and retries.
+
+    python -m pytest test_hrone_api.py
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from hrone import AttendanceError
+from hrone_api import (AttendanceTemplate, identity_from_state, post_attendance, run_api_account, run_api_batch,
+                       token_from_state)
+from hrone_batch import Account
+from mock_hrone import ATTENDANCE_PATH, MockHROne
+
+
+@pytest.fixture
+def server():
+    server = MockHROne(api_ms=0, asset_kb=0, modal_rate=0, seed=1)
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def storage_state(server, username):
+    """Log in over HTTP and return the storage state the browser would have saved."""
+    response = httpx.post(f"{server.base_url}/api/login", json={'username': username, 'password': 'secret'})
+    response.raise_for_status()
+    login = response.json()
+    return {'origins': [{'origin': server.base_url, 'localStorage': [
+        {'name': 'access_token', 'value': login['access_token']},
+        {'name': 'employee_id', 'value': str(login['employee_id'])},
+    ]}]}
+
+
+def recorded_request(server, state):
+    """What the dashboard's attendance POST looks like for the account in `state`."""
+    identity = identity_from_state(state, 'unused')
+    return SimpleNamespace(
+        url=server.base_url + ATTENDANCE_PATH, method='POST',
+        headers={'content-type': 'application/json', 'authorization': f"Bearer {token_from_state(state)}"},
+        post_data_json={'employeeId': int(identity['employee_id']), 'requestType': 'A', 'remarks': '',
+                        'punchTime': '2024-01-01T09:00:00.000Z'})
+
+
+class FakeSessions:
+    def __init__(self, states):
+        self.states = states
+        self.discarded = []
+
+    def load(self, username):
+        return self.states.get(username)
+
+    def discard(self, username):
+        self.discarded.append(username)
+        self.states.pop(username, None)
+
+
+class HttpAuth:
+    """Signs in over the mock's login API instead of a browser."""
+
+    def __init__(self, server):
+        self.server = server
+        self.sign_ins = 0
+
+    async def sign_in(self, account, record=False):
+        self.sign_ins += 1
+        state = storage_state(self.server, account.username)
+        return token_from_state(state), identity_from_state(state, account.username), None
+
+
+def test_template_drops_credentials_and_notes_identity_fields(server):
+    state = storage_state(server, 'alice')
+    template = AttendanceTemplate.from_request(recorded_request(server, state), identity_from_state(state, 'alice'))
+    assert 'authorization' not in template.headers
+    assert template.identity == {'employeeId': 'employee_id'}
+
+
+def test_request_body_uses_each_accounts_identity():
+    template = AttendanceTemplate('http://x', body={'employeeId': 1001, 'punchTime': '2024-01-01T09:00:00Z'},
+                                  identity={'employeeId': 'employee_id'})
+    body = template.request_body({'employee_id': '1002'})
+    assert body['employeeId'] == 1002
+    assert body['punchTime'] != '2024-01-01T09:00:00Z'
+    with pytest.raises(AttendanceError) as info:
+        template.request_body({'username': 'bob'})
+    assert info.value.step == 'identity'
+
+
+def test_replayed_template_marks_the_right_employee(server):
+    alice, bob = storage_state(server, 'alice'), storage_state(server, 'bob')
+    template = AttendanceTemplate.from_request(recorded_request(server, alice), identity_from_state(alice, 'alice'))
+
+    async def mark():
+        async with httpx.AsyncClient() as client:
+            await post_attendance(client, template, token_from_state(bob), identity_from_state(bob, 'bob'))
+
+    asyncio.run(mark())
+    [(username, _, body)] = server.attendance
+    assert username == 'bob'
+    assert body['employeeId'] == server.employee_ids['bob']
+
+
+def test_template_without_identity_fields_is_not_sent(server):
+    # without identity fields the body carries the recording account's id for everyone
+    alice, bob = storage_state(server, 'alice'), storage_state(server, 'bob')
+    template = AttendanceTemplate.from_request(recorded_request(server, alice), {'username': 'alice'})
+    assert template.identity == {}
+    sent = []
+
+    async def mark():
+        transport = httpx.MockTransport(lambda request: sent.append(request) or httpx.Response(200))
+        async with httpx.AsyncClient(transport=transport) as client:
+            semaphore = asyncio.Semaphore(1)
+            return await run_api_account(client, HttpAuth(server), Account('bob', 'secret'), template, semaphore,
+                                         FakeSessions({'bob': bob}), retries=3, backoff=0)
+
+    result = asyncio.run(mark())
+    assert (result.status, result.attempts) == ('failed', 1)
+    assert sent == []
+
+
+def test_run_api_batch_refuses_a_template_without_identity_fields(server, tmp_path):
+    path = tmp_path / 'attendance_template.json'
+    AttendanceTemplate(server.base_url + ATTENDANCE_PATH, body={'employeeId': 1001}).save(path)
+    with pytest.raises(SystemExit):
+        asyncio.run(run_api_batch([Account('bob', 'secret')], server.base_url, template_path=path))
+    assert server.attendance == []
+
+
+def test_run_api_account_retries_failures_and_expired_tokens(server):
+    alice = storage_state(server, 'alice')
+    template = AttendanceTemplate.from_request(recorded_request(server, alice), identity_from_state(alice, 'alice'))
+    accounts = [Account(f"employee{i}", 'secret') for i in range(6)]
+    sessions = FakeSessions({a.username: storage_state(server, a.username) for a in accounts})
+    server.expire_sessions()  # every saved token is rejected, so each account signs in again
+    server.fail_rate = 0.3
+    auth = HttpAuth(server)
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            semaphore = asyncio.Semaphore(3)
+            return await asyncio.gather(*(run_api_account(client, auth, account, template, semaphore, sessions,
+                                                          retries=8, backoff=0) for account in accounts))
+
+    results = asyncio.run(run())
+    assert [r.status for r in results] == ['ok'] * len(accounts)
+    assert sorted(sessions.discarded) == sorted(a.username for a in accounts)
+    assert auth.sign_ins == len(accounts)
+    assert sorted(username for username, _, _ in server.attendance) == sorted(a.username for a in accounts)
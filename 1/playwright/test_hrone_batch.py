@@ -0,0 +1,107 @@
+"""
+The batch runner against mock_hrone.py: retries, backoff and one context per attempt.
+
+    python -m pytest test_hrone_batch.py
+
+The browser runs need Playwright's Chromium (playwright install chromium); they
+are skipped where the browser can't be launched.
+"""
+
+import asyncio
+
+import pytest
+
+import hrone_batch
+from hrone_batch import Account, run_account
+from mock_hrone import MockHROne
+
+
+@pytest.fixture
+def server():
+    server = MockHROne(api_ms=0, password_step_ms=0, dashboard_ms=0, modal_rate=0.5, asset_kb=0, seed=1)
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class BrokenBrowser:
+    """A browser whose contexts can't be opened, as when it has crashed."""
+
+    def __init__(self):
+        self.states = []
+
+    async def new_context(self, storage_state=None, **options):
+        self.states.append(storage_state)
+        raise RuntimeError("Target page, context or browser has been closed")
+
+
+class FakeSessions:
+    def __init__(self, states):
+        self.states = states
+        self.discarded = []
+
+    def load(self, username):
+        return self.states.get(username)
+
+    def discard(self, username):
+        self.discarded.append(username)
+        self.states.pop(username, None)
+
+
+def test_failed_context_setup_is_reported_as_setup(monkeypatch):
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    monkeypatch.setattr(hrone_batch.asyncio, 'sleep', sleep)
+    browser = BrokenBrowser()
+    saved = {'cookies': [], 'origins': []}
+    sessions = FakeSessions({'alice': saved})
+    result = asyncio.run(run_account(browser, Account('alice', 'secret'), asyncio.Semaphore(1),
+                                     retries=2, backoff=1.0, sessions=sessions))
+    assert (result.status, result.failed_step, result.attempts) == ('failed', 'setup', 3)
+    assert 'has been closed' in result.error
+    # the saved session is dropped, so the retries log in instead
+    assert browser.states == [saved, None, None]
+    assert 'alice' in sessions.discarded
+    # exponential backoff with up to `backoff` seconds of jitter, none after the last attempt
+    assert len(delays) == 2
+    assert 1.0 <= delays[0] <= 2.0 and 2.0 <= delays[1] <= 3.0
+
+
+async def _run(server, accounts, retries, concurrency=3):
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
+        try:
+            browser = await p.chromium.launch()
+        except Exception as e:
+            pytest.skip(f"Chromium is not available: {str(e).splitlines()[0]}")
+        try:
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(run_account(browser, account, semaphore, server.base_url, retries,
+                                                      backoff=0) for account in accounts))
+        finally:
+            await browser.close()
+
+
+def test_failing_attendance_is_retried_until_it_gives_up(server):
+    server.fail_rate = 1.0
+    results = asyncio.run(_run(server, [Account('alice', 'secret'), Account('bob', 'secret')], retries=1))
+    assert [(r.status, r.failed_step, r.attempts) for r in results] == [('failed', 'attendance', 2)] * 2
+    assert server.attendance == []
+
+
+def test_batch_retries_and_keeps_accounts_apart(server):
+    server.fail_rate = 0.3
+    accounts = [Account(f"employee{i}", 'secret') for i in range(6)]
+    results = asyncio.run(_run(server, accounts, retries=8))
+    assert [r.status for r in results] == ['ok'] * len(accounts)
+    # each account marked once, as itself: no cookies or storage shared between contexts
+    assert sorted(username for username, _, _ in server.attendance) == sorted(a.username for a in accounts)
+    assert all(body['employeeId'] == server.employee_ids[username] for username, _, body in server.attendance)
+    # and a fresh context per attempt: every retry logs in again
+    assert server.logins == sum(r.attempts for r in results)
+    assert all({'login', 'dashboard', 'attendance'} <= set(r.steps) for r in results)
@@ -0,0 +1,106 @@
+"""
+Request blocking and run accounting (user-044) against mock_hrone.py's heavy assets.
+
+    python -m pytest test_page_profile.py
+
+The browser flow needs Playwright's Chromium (playwright install chromium); it is
+skipped where the browser can't be launched.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from hrone import mark_attendance
+from mock_hrone import MockHROne
+from page_profile import DEFAULT_BLOCKED_DOMAINS, LITE_VIEWPORT, RequestFilter, RunStats
+
+# the mock's analytics script comes from "localhost", like a tracker on another host
+MOCK_FILTER = RequestFilter(block_domains=DEFAULT_BLOCKED_DOMAINS + ('localhost',))
+
+
+@pytest.fixture
+def server():
+    server = MockHROne(api_ms=0, password_step_ms=0, dashboard_ms=0, modal_rate=0, asset_kb=200, seed=1)
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('path, resource_type, blocked', [
+    ('/assets/banner.jpg', 'image', True),
+    ('/assets/intro.mp4', 'media', True),
+    ('/assets/brand.woff2', 'font', True),
+    ('/assets/app.css', 'stylesheet', False),  # visibility checks need the styles
+    ('/dashboard', 'document', False),
+    ('/api/timeoffice/mobile/checkin/Attendance/Request', 'fetch', False),
+])
+def test_filter_keeps_only_what_the_flow_needs(server, path, resource_type, blocked):
+    assert MOCK_FILTER.blocks(server.base_url + path, resource_type) is blocked
+
+
+def test_filter_blocks_tracker_domains_and_their_subdomains():
+    f = RequestFilter()
+    assert f.blocks('https://www.google-analytics.com/collect', 'script')
+    assert f.blocks('https://static.hotjar.com/c/hotjar.js', 'script')
+    assert not f.blocks('https://notgoogle-analytics.com/app.js', 'script')
+    assert not f.blocks('http://localhost:8000/assets/collect.js', 'script')
+    assert MOCK_FILTER.blocks('http://localhost:8000/assets/collect.js', 'script')
+
+
+def test_allow_domains_win_over_blocking():
+    f = RequestFilter(allow_domains=('cdn.hrone.cloud',))
+    assert not f.blocks('https://cdn.hrone.cloud/logo.png', 'image')
+    assert f.blocks('https://other.example/logo.png', 'image')
+
+
+def test_mock_serves_the_heavy_assets(server):
+    sizes = {name: len(httpx.get(f"{server.base_url}/assets/{name}").content)
+             for name in ('banner.jpg', 'intro.mp4', 'brand.woff2')}
+    assert sizes == {'banner.jpg': 200 * 1024, 'intro.mp4': 200 * 1024, 'brand.woff2': 100 * 1024}
+
+
+def test_run_stats_time_each_step(monkeypatch):
+    clock = iter([0.0, 1.5, 2.0, 2.25])
+    monkeypatch.setattr('page_profile.time.perf_counter', lambda: next(clock))
+    stats = RunStats()
+    stats.mark('login')
+    stats.mark('dashboard')
+    stats.mark('attendance')
+    stats.mark(None)
+    assert stats.steps == {'login': 1.5, 'dashboard': 0.5, 'attendance': 0.25}
+    assert stats.seconds == 2.25
+
+
+async def _run(base_url, request_filter):
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
+        try:
+            browser = await p.chromium.launch()
+        except Exception as e:
+            pytest.skip(f"Chromium is not available: {str(e).splitlines()[0]}")
+        try:
+            context = await browser.new_context(viewport=LITE_VIEWPORT)
+            stats = RunStats()
+            if request_filter:
+                await request_filter.install(context, stats)
+            else:
+                stats.attach(context)
+            page = await context.new_page()
+            await mark_attendance(page, 'alice', 'secret', base_url, log=lambda msg: None, mark=stats.mark)
+            await stats.settle()
+            return stats
+        finally:
+            await browser.close()
+
+
+def test_blocking_cuts_bytes_on_the_mock_site(server):
+    full = asyncio.run(_run(server.base_url, None))
+    lite = asyncio.run(_run(server.base_url, MOCK_FILTER))
+    assert [username for username, _, _ in server.attendance] == ['alice', 'alice']
+    assert lite.blocked > 0 and full.blocked == 0
+    assert lite.bytes < full.bytes / 2
+    assert set(lite.steps) >= {'login', 'attendance'}
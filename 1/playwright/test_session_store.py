@@ -0,0 +1,69 @@
+"""
+Encrypted session states (user-043): the key, max_age and expired cookies.
+
+    python -m pytest test_session_store.py
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip('cryptography')
+from cryptography.fernet import Fernet  # noqa: E402
+
+import session_store  # noqa: E402
+from session_store import SessionStore  # noqa: E402
+
+STATE = {'cookies': [{'name': 'session', 'value': 'abc', 'expires': -1}],
+         'origins': [{'origin': 'https://app.hrone.cloud', 'localStorage': [{'name': 'token', 'value': 't'}]}]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(tmp_path, key=Fernet.generate_key())
+
+
+def test_saved_state_round_trips_encrypted(store, tmp_path):
+    store.save('alice', STATE)
+    assert store.load('alice') == STATE
+    [path] = tmp_path.iterdir()
+    assert b'abc' not in path.read_bytes() and 'alice' not in path.name
+
+
+def test_malformed_key_disables_sessions(tmp_path, monkeypatch):
+    monkeypatch.setenv('HRONE_SESSION_KEY', 'not-a-fernet-key')
+    with pytest.warns(UserWarning, match='HRONE_SESSION_KEY'):
+        store = SessionStore(tmp_path)
+    assert not store.enabled
+    store.save('alice', STATE)
+    assert store.load('alice') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_state_older_than_max_age_is_discarded(store, tmp_path, monkeypatch):
+    store.save('alice', STATE)
+    store.max_age = 60
+    later = time.time() + 120
+    monkeypatch.setattr(session_store.time, 'time', lambda: later)  # Fernet's ttl check reads the clock too
+    assert store.load('alice') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_state_with_expired_cookies_is_discarded(store, tmp_path):
+    past = time.time() - 60
+    store.save('alice', {**STATE, 'cookies': [{'name': 'session', 'value': 'abc', 'expires': past}]})
+    assert store.load('alice') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize('expires, expired', [([], False), ([-1], False), ([100, 300], False), ([100, 150], True)])
+def test_expired_needs_every_persistent_cookie_past(expires, expired):
+    state = {'cookies': [{'name': f"c{i}", 'expires': e} for i, e in enumerate(expires)]}
+    assert SessionStore.expired(state, now=200) is expired
+
+
+def test_unreadable_file_is_discarded(store, tmp_path):
+    store.save('alice', STATE)
+    other = SessionStore(tmp_path, key=Fernet.generate_key())  # a rotated key can't read the old files
+    assert other.load('alice') is None
+    assert list(tmp_path.iterdir()) == []
@@ -1,5 +1,7 @@
 import streamlit as st
 
+from app_startup import inject_css
+
 # Set page config
 st.set_page_config(
     page_title="Greeting App",
@@ -8,42 +10,7 @@ st.set_page_config(
 )
 
 # Custom CSS for styling
-st.markdown("""
-    <style>
-    .main {
-        max-width: 500px;
-        padding: 2rem;
-        border-radius: 15px;
-        background: linear-gradient(145deg, #f0f2f6, #ffffff);
-        box-shadow: 0 4px 15px rgba(0, 0, 0, 0.1);
-        margin: 2rem auto;
-    }
-    .stTextInput>div>div>input {
-        border-radius: 10px;
-        padding: 10px;
-    }
-    .stSlider>div>div>div>div {
-        background: #4CAF50 !important;
-    }
-    .greeting-box {
-        background: linear-gradient(135deg, #4CAF50, #45a049);
-        color: white;
-        padding: 2rem;
-        border-radius: 15px;
-        text-align: center;
-        margin-top: 2rem;
-        animation: fadeIn 1s;
-    }
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(20px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    .emoji {
-        font-size: 2rem;
-        margin-bottom: 1rem;
-    }
-    </style>
-""", unsafe_allow_html=True)
+inject_css(__file__)
 
 # Main container
 with st.container():
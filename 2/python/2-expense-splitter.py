@@ -1,8 +1,10 @@
 import streamlit as st
-import pandas as pd
 from collections import namedtuple
+from datetime import datetime
 import math
 
+from storage import get_storage
+
 # --- Named Tuple for clarity ---
 Transaction = namedtuple('Transaction', ['payer', 'receiver', 'amount'])
 Friend = namedtuple('Friend', ['name', 'balance'])
@@ -63,6 +65,68 @@ def calculate_settlements(balances):
 
     return transactions
 
+# --- History (data/apps.db, see storage.py) ---
+def save_split(total_amount, equal_share, friend_data, balances, transactions):
+    """
+    Stores a calculated split, its members and its settlement plan in one write.
+
+    Returns:
+        int: The id of the stored split.
+    """
+    def insert(conn):
+        split_id = conn.execute(
+            "INSERT INTO splits (created_at, total, equal_share) VALUES (?, ?, ?)",
+            (datetime.now().strftime('%Y-%m-%d %H:%M'), total_amount, equal_share)
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO split_members (split_id, name, paid, balance) VALUES (?, ?, ?, ?)",
+            [(split_id, d['name'], d['contribution'], f.balance) for d, f in zip(friend_data, balances)]
+        )
+        conn.executemany(
+            "INSERT INTO settlements (split_id, payer, receiver, amount) VALUES (?, ?, ?, ?)",
+            [(split_id, *t) for t in transactions]
+        )
+        return split_id
+
+    return get_storage().run(insert)
+
+def recent_splits(limit=5):
+    """
+    The latest stored splits, newest first.
+
+    Returns:
+        list[tuple[sqlite3.Row, list[Transaction]]]: Each split with its settlement plan.
+    """
+    storage = get_storage()
+    splits = storage.query(
+        "SELECT s.id, s.created_at, s.total, "
+        "(SELECT COUNT(*) FROM split_members m WHERE m.split_id = s.id) AS people "
+        "FROM splits s ORDER BY s.id DESC LIMIT ?",
+        (limit,)
+    )
+    plans = {s['id']: [] for s in splits}
+    if plans:
+        placeholders = ", ".join("?" * len(plans))
+        for row in storage.query(
+            f"SELECT split_id, payer, receiver, amount FROM settlements WHERE split_id IN ({placeholders})",
+            list(plans)
+        ):
+            plans[row['split_id']].append(Transaction(row['payer'], row['receiver'], row['amount']))
+    return [(s, plans[s['id']]) for s in splits]
+
+def show_history():
+    splits = recent_splits()
+    if not splits:
+        return
+    st.markdown("---")
+    st.subheader("Recent Splits")
+    for split, plan in splits:
+        with st.expander(f"{split['created_at']} — ${split['total']:,.2f} among {split['people']} friends"):
+            if not plan:
+                st.write("Everyone paid exactly their share.")
+            for payer, receiver, amount in plan:
+                st.markdown(f"**{payer}** pays **${amount:,.2f}** to **{receiver}**")
+
 # --- Streamlit UI Setup ---
 def app():
     st.set_page_config(
@@ -191,6 +255,7 @@ def app():
         st.subheader("Optimal Settlement Plan")
         
         transactions = calculate_settlements(balances)
+        save_split(total_amount, equal_share, st.session_state.friend_data, balances, transactions)
         
         if not transactions:
             st.balloons()
@@ -214,4 +279,5 @@ def app():
 
 
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    app()
+    show_history()
\ No newline at end of file
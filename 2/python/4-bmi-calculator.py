@@ -1,5 +1,7 @@
 import streamlit as st
 
+from app_startup import inject_css
+
 st.set_page_config(page_title="BMI Calculator", page_icon="⚕️", layout="centered")
 
 # ---------- Utility Functions ----------
@@ -23,29 +25,7 @@ def get_category(bmi):
         
 
 # ---------- UI Styling ----------
-st.markdown("""
-    <style>
-        .big-input input {
-            font-size: 22px !important;
-            height: 55px !important;
-        }
-        .big-label {
-            font-size: 24px !important;
-            font-weight: 600 !important;
-        }
-        .big-button button {
-            font-size: 24px !important;
-            padding: 15px 30px !important;
-        }
-        .result-box {
-            padding: 25px;
-            border-radius: 12px;
-            font-size: 26px;
-            text-align: center;
-            margin-top: 20px;
-        }
-    </style>
-""", unsafe_allow_html=True)
+inject_css(__file__)
 
 
 st.title("⚕️ BMI Calculator")
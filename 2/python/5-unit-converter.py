@@ -1,147 +1,10 @@
 import streamlit as st
 
+from app_startup import inject_css
+
 st.set_page_config(page_title="Kids Unit Converter", page_icon="🔄", layout="centered")
 
-st.markdown(
-    """
-    <style>
-      @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@500;700&display=swap');
-      html, body, [class*="css"], .stMarkdown, .stButton>button, .stTextInput>div>div>input, .stNumberInput input {
-        font-family: 'Poppins', sans-serif !important;
-      }
-      .stApp {
-        background: linear-gradient(135deg, #FFDEE9 0%, #B5FFFC 100%);
-      }
-      .block-container {
-        max-width: 800px;
-        min-height: 100vh; /* take full viewport height */
-        display: flex;
-        flex-direction: column;
-        justify-content: center; /* center vertically */
-        padding: 2rem 1rem; /* balanced padding */
-        position: absolute;
-        top: 5rem;
-      }
-      .title-card {
-        background: linear-gradient(135deg, #fff, #f5f5ff);
-        padding: 18px 22px;
-        border-radius: 18px;
-        border: 4px solid #7C4DFF33;
-        box-shadow: 0 12px 24px rgba(0,0,0,0.08);
-        margin-bottom: 16px; /* space below title */
-      }
-      .big-label {
-        font-size: 1.2rem;
-        font-weight: 700;
-        color: #512DA8;
-      }
-      .stTabs [data-baseweb="tab-list"] {
-        gap: 12px;
-      }
-      .stTabs [data-baseweb="tab"] {
-        height: 60px;
-        padding: 14px 18px;
-        border-radius: 16px;
-        background: #ffffffd9;
-        border: 3px solid #90CAF925;
-        box-shadow: 0 8px 16px rgba(0,0,0,0.05);
-        font-size: 1.05rem;
-        color: #FF7043; /* default orange/red text */
-      }
-      .stTabs [data-baseweb="tab"]:hover {
-        color: #FF7043; /* keep same color on hover */
-      }
-      .stTabs [aria-selected="true"] {
-        background: linear-gradient(135deg, #A5D6A7, #81D4FA);
-        color: #000000; /* black when focused/selected */
-        border-color: #1E88E5;
-      }
-      .stNumberInput input, .stTextInput input {
-        font-size: 1.4rem;
-        padding: 18px 16px !important;
-        border-radius: 16px !important;
-        border: 3px solid #E1BEE7 !important;
-        color: #1A237E; /* readable dark text */
-      }
-      .stNumberInput > div > div {
-        border-radius: 16px !important;
-      }
-      .stSelectbox div[data-baseweb="select"] > div {
-        padding: 14px 16px;
-        border-radius: 16px;
-        border: 3px solid #FFCC80;
-        color: #FF7043; /* readable orange/red text */
-      }
-      .stRadio > div {
-        gap: 16px;
-      }
-      .stRadio { color: #BF360C; }
-      .stRadio label {
-        padding: 10px 14px;
-        background: #ffffff;
-        border: 3px solid #FFAB91;
-        border-radius: 14px;
-        box-shadow: 0 6px 12px rgba(0,0,0,0.05);
-        font-weight: 600;
-        color: #BF360C; /* readable orange/red text */
-      }
-      .stRadio label span,
-      .stRadio label div,
-      .stRadio label p {
-        color: #BF360C !important; /* force inner label elements to same color */
-      }
-      .stRadio label:hover { color: #BF360C; }
-      .stNumberInput label {
-        color: #BF360C;
-        font-weight: 700;
-      }
-      .stButton>button {
-        font-size: 1.2rem;
-        padding: 14px 22px;
-        border-radius: 16px;
-        border: 0;
-        background: linear-gradient(135deg, #FFD54F, #FF8A65);
-        color: #1A237E;
-        box-shadow: 0 10px 18px rgba(0,0,0,0.15);
-      }
-      .stButton>button:hover, .stButton>button:focus { color: #1A237E; }
-      .stNumberInput input::placeholder { color: #FF7043; opacity: 0.85; }
-      .stNumberInput input:focus { border-color: #FF7043 !important; outline: none; }
-      /* Base Web input (used by text-like inputs) */
-      div[data-baseweb="base-input"] input {
-        color: #FFFFFF !important;
-      }
-      div[data-baseweb="base-input"] input::placeholder {
-        color: #FFFFFF !important;
-        opacity: 0.95;
-      }
-      .result-card {
-        margin-top: 10px;
-        background: linear-gradient(135deg, #E1F5FE, #E8F5E9);
-        border-radius: 18px;
-        border: 4px solid #81D4FA;
-        padding: 18px;
-        box-shadow: 0 12px 24px rgba(0,0,0,0.08);
-      }
-      .result-value {
-        font-size: 2rem;
-        font-weight: 800;
-        color: #0D47A1;
-      }
-      .unit-badge {
-        display: inline-block;
-        padding: 6px 12px;
-        margin-left: 8px;
-        border-radius: 999px;
-        background: #F8BBD0;
-        border: 3px solid #F06292;
-        font-weight: 700;
-        color: #880E4F;
-      }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+inject_css(__file__)
 
 def round_display(x: float, places: int = 6) -> str:
     try:
@@ -6,12 +6,15 @@ Run: streamlit run app.py
 What it does:
 - Log water intake (ml) with timestamp (defaults to now)
 - Quick-add buttons for common amounts
-- Persist entries to data/water_log.csv (created automatically)
+- Persist entries to data/apps.db (SQLite, via storage.py; an old data/water_log.csv is imported once)
 - Show today's summary, progress to 3L (3000 ml), and friendly messages
 - Weekly hydration chart (last 7 days) using Altair
 - Download last-7-days CSV and download a PNG of the weekly chart
 - Delete entries (choose an entry to delete or delete the last entry)
 - Minimal dependencies: streamlit, pandas, altair, matplotlib
+  (imported on first use: today's progress is a single SQL sum and renders
+  before the charts; matplotlib only once a PNG is asked for; the log and the
+  PNG chart are cached between reruns)
 
 Short README (usage)
 1. Install dependencies: pip install -r requirements.txt
@@ -21,20 +24,23 @@ Short README (usage)
 5. Delete entries from history section if needed
 """
 
+from __future__ import annotations  # keeps the pd.DataFrame hints from importing pandas
+
 import streamlit as st
-import pandas as pd
-import altair as alt
-import matplotlib.pyplot as plt
 from io import BytesIO
 from datetime import datetime, timedelta
-from pathlib import Path
 import os
 
+from app_startup import lazy_import, lazy_pyplot
+from storage import get_storage
+
+pd = lazy_import("pandas")
+alt = lazy_import("altair")
+plt = lazy_pyplot()
+
 # ---------------------------
 # Configuration / Constants
 # ---------------------------
-DATA_DIR = Path("data")
-DATA_FILE = DATA_DIR / "water_log.csv"
 GOAL_ML = 3000
 QUICK_AMOUNTS = [250, 500, 750]  # ml quick-add buttons
 CAP_SOFT_WARNING_ML = 2000  # suggest confirmation over this
@@ -48,65 +54,41 @@ st.set_page_config(page_title="Water Intake Tracker 💧", layout="centered")
 # ---------------------------
 
 
-def ensure_data_file():
-    """Ensure data directory and CSV exist (with header)."""
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    if not DATA_FILE.exists():
-        df = pd.DataFrame(columns=["timestamp", "ml"])
-        df.to_csv(DATA_FILE, index=False)
-
-
 def load_data() -> pd.DataFrame:
-    """Load CSV into DataFrame. Ensure timestamp column is parsed."""
-    ensure_data_file()
-    try:
-        df = pd.read_csv(DATA_FILE)
-        if df.empty:
-            return df
-        # parse timestamps; keep as strings for display but create parsed dt column when needed
-        return df
-    except Exception:
-        # Corrupt or missing -> return empty df with columns
-        return pd.DataFrame(columns=["timestamp", "ml"])
+    """Load the log into a DataFrame (oldest first). Re-read only when it changed since the last rerun."""
+    revision = tuple(get_storage().query("SELECT COALESCE(MAX(id), 0), COUNT(*) FROM water_log")[0])
+    return _read_data(revision)
 
 
-def save_data(df: pd.DataFrame):
-    """Save DataFrame to CSV (overwrite)."""
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    df.to_csv(DATA_FILE, index=False)
+@st.cache_data(show_spinner=False, max_entries=4)
+def _read_data(revision: tuple) -> pd.DataFrame:
+    """The log as a DataFrame; `revision` only keys the cache (every caller gets its own copy)."""
+    rows = get_storage().query("SELECT id, timestamp, ml FROM water_log ORDER BY id")
+    return pd.DataFrame([tuple(row) for row in rows], columns=["id", "timestamp", "ml"])
 
 
 def add_entry(ml: int, ts: datetime = None):
-    """Append a new entry to CSV."""
+    """Store a new entry."""
     if ts is None:
         ts = datetime.now()
-    df = load_data()
-    new = {"timestamp": ts.strftime(DATE_FORMAT), "ml": int(ml)}
-    df = pd.concat([df, pd.DataFrame([new])], ignore_index=True)
-    save_data(df)
+    get_storage().write("INSERT INTO water_log (timestamp, ml) VALUES (?, ?)", (ts.strftime(DATE_FORMAT), int(ml)))
 
 
-def delete_entry_by_index(idx: int):
-    """Delete entry by integer index (0-based)."""
-    df = load_data()
-    if idx < 0 or idx >= len(df):
-        return False
-    df = df.drop(df.index[idx]).reset_index(drop=True)
-    save_data(df)
-    return True
+def delete_entry(entry_id: int) -> bool:
+    """Delete an entry by its id; False if there is no such entry."""
+    def delete(conn):
+        return conn.execute("DELETE FROM water_log WHERE id = ?", (entry_id,)).rowcount
 
+    return get_storage().run(delete) > 0
 
-def get_today_total(df: pd.DataFrame, today: datetime = None) -> int:
-    """Sum ml for today's date (local system date)."""
-    if df.empty:
-        return 0
+
+def get_today_total(today: datetime = None) -> int:
+    """Sum ml for today's date (local system date): an indexed range query, no pandas needed."""
     if today is None:
         today = datetime.now()
-    df2 = df.copy()
-    df2["dt"] = pd.to_datetime(df2["timestamp"], format=DATE_FORMAT, errors="coerce")
-    df2["date"] = df2["dt"].dt.date
-    total = int(df2[df2["date"] == today.date()]["ml"].sum())
-    return total
+    day = today.strftime("%Y-%m-%d")
+    return get_storage().scalar("SELECT COALESCE(SUM(ml), 0) FROM water_log WHERE timestamp BETWEEN ? AND ?",
+                                (f"{day}T00:00:00", f"{day}T23:59:59"))
 
 
 def last_7_days_aggregation(df: pd.DataFrame, today: datetime = None) -> pd.DataFrame:
@@ -187,6 +169,12 @@ def create_matplotlib_chart_bytes(agg_df: pd.DataFrame, highlight_date=None) ->
     return buf
 
 
+@st.cache_data(show_spinner=False, max_entries=8)
+def weekly_chart_png(agg_df: pd.DataFrame, highlight_date=None) -> bytes:
+    """PNG of the weekly chart, drawn again only when the week's totals change."""
+    return create_matplotlib_chart_bytes(agg_df, highlight_date).getvalue()
+
+
 # ---------------------------
 # App UI
 # ---------------------------
@@ -227,36 +215,9 @@ with st.sidebar:
             st.success(f"Added {custom_ml} ml at {custom_ts.strftime('%Y-%m-%d %H:%M:%S')}")
             st.rerun()
 
-    st.markdown("---")
-    st.header("Export & Share")
-    # Export last 7 days CSV
-    df_all = load_data()
-    last7_agg = last_7_days_aggregation(df_all)
-    # Build last 7 days raw entries for export
-    if not df_all.empty:
-        df_all["dt"] = pd.to_datetime(df_all["timestamp"], format=DATE_FORMAT, errors="coerce")
-        seven_days_ago = datetime.now().date() - timedelta(days=6)
-        last7_raw = df_all[df_all["dt"].dt.date >= seven_days_ago].sort_values("dt")
-    else:
-        last7_raw = pd.DataFrame(columns=["timestamp", "ml"])
-
-    csv_bytes = last7_raw.to_csv(index=False).encode("utf-8")
-    st.download_button("Download last 7 days CSV", data=csv_bytes, file_name="water_last7.csv", mime="text/csv")
-
-    # Chart PNG download: create matplotlib version for reliable PNG generation
-    chart_png = create_matplotlib_chart_bytes(last7_agg, highlight_date=datetime.now().date())
-    st.download_button("Download weekly chart (PNG)", data=chart_png, file_name="weekly_chart.png", mime="image/png")
-
-    st.markdown("---")
-    st.caption("Tip: You can also take a screenshot from your device. To share the chart quickly, download the PNG above.")
-    st.markdown("---")
-    st.write("Made with ❤️ — Share the screenshots, Happy Healthy living 🤍")
-
 # Main area
-df = load_data()
-
-# Today's summary and progress
-today_total_ml = get_today_total(df)
+# Today's summary and progress: no pandas needed, so it shows before the heavy imports below
+today_total_ml = get_today_total()
 today_total_l = ml_to_l(today_total_ml)
 percent = min(100, int((today_total_ml / GOAL_ML) * 100)) if GOAL_ML > 0 else 0
 remaining_ml = max(0, GOAL_ML - today_total_ml)
@@ -282,6 +243,7 @@ st.markdown("---")
 
 # Weekly chart
 st.subheader("Weekly hydration")
+df = load_data()
 agg = last_7_days_aggregation(df)
 # ensure date column is datetime.date -> convert to pandas.Timestamp for Altair compatibility
 agg["date"] = pd.to_datetime(agg["date"])
@@ -305,39 +267,67 @@ else:
 
     st.markdown("**Delete an entry**")
     st.write("Pick an entry below to delete (this is irreversible). As a quick option, you can delete the last entry added.")
-    # Make a selection mapping to original index in the stored CSV
+    # Make a selection mapping to the entry's id in the database
     df_orig = load_data()
     if not df_orig.empty:
         df_orig["dt"] = pd.to_datetime(df_orig["timestamp"], format=DATE_FORMAT, errors="coerce")
-        df_orig = df_orig.reset_index().rename(columns={"index":"orig_index"})
         # prepare choices
         choices = df_orig.sort_values("dt", ascending=False).apply(
-            lambda row: f"{row['orig_index']}: {row['dt'].strftime('%Y-%m-%d %H:%M:%S')} — {row['ml']} ml", axis=1
+            lambda row: f"{row['id']}: {row['dt'].strftime('%Y-%m-%d %H:%M:%S')} — {row['ml']} ml", axis=1
         ).tolist()
         to_delete = st.selectbox("Select entry to delete", options=["(none)"] + choices, index=0)
         if to_delete != "(none)":
             if st.button("Delete selected entry"):
-                # parse orig_index from selected label
-                orig_index = int(to_delete.split(":")[0])
-                ok = delete_entry_by_index(orig_index)
+                # parse the id from selected label
+                entry_id = int(to_delete.split(":")[0])
+                ok = delete_entry(entry_id)
                 if ok:
                     st.success("Deleted entry.")
                     st.rerun()
                 else:
-                    st.error("Failed to delete (index not found).")
+                    st.error("Failed to delete (entry not found).")
         # Quick delete last entry (most recent by time)
         if st.button("Delete last entry"):
-            # find last entry index (latest dt)
+            # find last entry id (latest dt)
             latest_row = df_orig.sort_values("dt", ascending=False).head(1)
             if latest_row.empty:
                 st.warning("No entry to delete.")
             else:
-                idx = int(latest_row.iloc[0]["orig_index"])
-                delete_entry_by_index(idx)
+                delete_entry(int(latest_row.iloc[0]["id"]))
                 st.success("Deleted last entry.")
                 st.rerun()
 
+# Sidebar: exports (after the main area, so they don't hold up today's progress; the sidebar order is unchanged)
+with st.sidebar:
+    st.markdown("---")
+    st.header("Export & Share")
+    # Export last 7 days CSV
+    df_all = load_data()
+    last7_agg = last_7_days_aggregation(df_all)
+    # Build last 7 days raw entries for export
+    if not df_all.empty:
+        df_all["dt"] = pd.to_datetime(df_all["timestamp"], format=DATE_FORMAT, errors="coerce")
+        seven_days_ago = datetime.now().date() - timedelta(days=6)
+        last7_raw = df_all[df_all["dt"].dt.date >= seven_days_ago].sort_values("dt")[["timestamp", "ml"]]
+    else:
+        last7_raw = pd.DataFrame(columns=["timestamp", "ml"])
+
+    csv_bytes = last7_raw.to_csv(index=False).encode("utf-8")
+    st.download_button("Download last 7 days CSV", data=csv_bytes, file_name="water_last7.csv", mime="text/csv")
+
+    # Chart PNG download: create matplotlib version for reliable PNG generation.
+    # Drawn only once asked for, so matplotlib isn't imported on runs that never export.
+    if st.button("Prepare weekly chart (PNG)") or st.session_state.get("chart_png_requested"):
+        st.session_state["chart_png_requested"] = True
+        chart_png = weekly_chart_png(last7_agg, highlight_date=datetime.now().date())
+        st.download_button("Download weekly chart (PNG)", data=chart_png, file_name="weekly_chart.png", mime="image/png")
+
+    st.markdown("---")
+    st.caption("Tip: You can also take a screenshot from your device. To share the chart quickly, download the PNG above.")
+    st.markdown("---")
+    st.write("Made with ❤️ — Share the screenshots, Happy Healthy living 🤍")
+
 st.write("---")
-st.caption("Small accessible UI, clear labels (ml / L), and CSV persistence in `data/water_log.csv`.")
+st.caption("Small accessible UI, clear labels (ml / L), and SQLite persistence in `data/apps.db`.")
 st.markdown("### Footer")
 st.write("Share the screenshots — Happy Learning guys 🤍")
@@ -1,7 +1,11 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime, timedelta
 
+from app_startup import inject_css, lazy_import
+from storage import get_storage
+
+pd = lazy_import("pandas")  # only needed once something is logged
+
 # --- Configuration and Setup ---
 
 # Set page configuration for high contrast (using the built-in dark theme preference)
@@ -12,54 +16,35 @@ st.set_page_config(
 )
 
 # Custom CSS for high readability (optional, for explicit contrast/styling)
-st.markdown("""
-<style>
-    /* Ensure good contrast, mainly relies on Streamlit's theme settings */
-    .stApp {
-        background-color: #0d1117; /* Dark background */
-        color: #f0f6fc; /* Light text color */
-    }
-    .stTextInput>div>div>input, .stNumberInput>div>div>input {
-        background-color: #161b22; /* Slightly lighter dark input field */
-        color: #f0f6fc;
-        border: 1px solid #30363d;
-    }
-    .stButton>button {
-        background-color: #238636; /* GitHub green for primary button */
-        color: white;
-        font-weight: bold;
-        border-radius: 6px;
-    }
-    /* Main title and header styling */
-    h1 {
-        color: #238636;
-        text-align: center;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-
-# --- Session State Initialization ---
-
-if 'workout_log' not in st.session_state:
-    # Initialize the log as an empty list to store dictionaries
-    st.session_state.workout_log = []
+inject_css(__file__)
+
 
 # --- Helper Functions ---
+# The log is kept in data/apps.db (storage.py), so it survives restarts and page reloads
+
+def load_workouts():
+    """Every logged set as a dictionary, oldest first."""
+    rows = get_storage().query("SELECT logged_at, exercise, sets, reps, weight FROM workouts ORDER BY id")
+    return [
+        {
+            'Date': row['logged_at'][:10],
+            'Time': row['logged_at'][11:],
+            'Exercise': row['exercise'],
+            'Sets': row['sets'],
+            'Reps': row['reps'],
+            'Weight': row['weight'],
+            'Volume': row['sets'] * row['reps'] * row['weight'] # Calculated metric
+        }
+        for row in rows
+    ]
 
 def log_workout(exercise, sets, reps, weight):
-    """Adds a new workout entry to the session state log."""
+    """Stores a new workout entry."""
     if exercise and sets > 0 and reps > 0 and weight >= 0:
-        new_entry = {
-            'Date': datetime.now().strftime('%Y-%m-%d'),
-            'Time': datetime.now().strftime('%H:%M:%S'),
-            'Exercise': exercise.strip(),
-            'Sets': sets,
-            'Reps': reps,
-            'Weight': weight,
-            'Volume': sets * reps * weight # Calculated metric
-        }
-        st.session_state.workout_log.append(new_entry)
+        get_storage().write(
+            "INSERT INTO workouts (logged_at, exercise, sets, reps, weight) VALUES (?, ?, ?, ?, ?)",
+            (datetime.now().strftime('%Y-%m-%dT%H:%M:%S'), exercise.strip(), sets, reps, weight)
+        )
         # Force re-run to clear the input fields immediately
         st.rerun()
     else:
@@ -97,11 +82,12 @@ with st.container():
 
 
 # Check if the log is empty before proceeding
-if not st.session_state.workout_log:
+workout_log = load_workouts()
+if not workout_log:
     st.info("Start logging your workouts! Your history and progress graph will appear here.")
 else:
     # Convert log to DataFrame for easy processing/display
-    df_log = pd.DataFrame(st.session_state.workout_log)
+    df_log = pd.DataFrame(workout_log)
 
     # 2. Progress Graph (Weekly Volume)
     st.header("Weekly Progress: Total Volume", divider='green')
@@ -133,7 +119,7 @@ else:
     st.line_chart(weekly_volume_df, x='Date', y='Total Volume', use_container_width=True)
     
     # 3. Full Workout History Table
-    st.header("Current Session History", divider='green')
+    st.header("Workout History", divider='green')
 
     # Display the DataFrame, dropping the intermediate 'Volume' column from the view
     st.dataframe(
@@ -144,9 +130,11 @@ else:
         hide_index=True
     )
 
-    # Simple button to clear the log (uses session state)
+    # Simple button to clear the log
     st.markdown("---")
-    if st.button("❌ Clear All Logs (Current Session)"):
-        st.session_state.workout_log = []
-        st.success("All workout logs have been cleared.")
+    # the log lives in the shared apps.db, so clearing it needs an explicit confirmation
+    confirmed = st.checkbox("Yes, delete every logged workout for everyone using this app", key="confirm_clear")
+    if st.button("❌ Clear All Logs", disabled=not confirmed):
+        get_storage().run(lambda conn: conn.execute("DELETE FROM workouts").rowcount)
+        del st.session_state["confirm_clear"]  # ask again next time
         st.rerun()
\ No newline at end of file
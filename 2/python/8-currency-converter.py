@@ -1,20 +1,11 @@
 import streamlit as st
 
+from app_startup import inject_css
+
 st.set_page_config(page_title="Currency Converter 💱", page_icon="💱", layout="centered")
 
 # Simple POC styles
-st.markdown(
-    """
-    <style>
-      .stApp { background: #0d1117; color: #f0f6fc; }
-      .block-container { max-width: 720px; }
-      .card { background:#11161c; border:1px solid #30363d; border-radius:12px; padding:16px; }
-      .result { font-size: 1.8rem; font-weight: 700; color: #58a6ff; }
-      .muted { color:#8b949e; }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+inject_css(__file__)
 
 st.title("Currency Converter 💱")
 st.caption("Simple POC. Static example rates, not live forex.")
@@ -0,0 +1,202 @@
+# app_startup.py
+"""
+Shared startup helpers for the Streamlit apps ⚡
+Run: python app_startup.py --bench            (cold start and rerun time of every app)
+     python app_startup.py --bench 20 6-wanter-intake-monitor.py
+
+What it does:
+- lazy_import(): a stand-in module that imports the real one on first attribute
+  access, so pandas / altair / matplotlib are only loaded by the code paths that use them
+- inject_css(): the app's stylesheet from static/<app>.css, read and minified once
+  per process instead of rebuilding a large inline <style> block on every rerun
+- A benchmark that runs each app headless (streamlit.testing) in a fresh process
+  and reports the first run, the heavy modules it loaded and the rerun time
+
+Streamlit re-executes the app script on every interaction, but modules it imports
+(this one included) stay loaded, so the caches here live for the whole process.
+
+    from app_startup import inject_css, lazy_import
+    pd = lazy_import("pandas")
+    inject_css(__file__)
+
+Minimal dependencies: streamlit (the benchmark uses streamlit.testing)
+"""
+
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import types
+from functools import lru_cache
+from pathlib import Path
+
+# ---------------------------
+# Configuration / Constants
+# ---------------------------
+HERE = Path(__file__).parent
+STATIC_DIR = HERE / "static"
+HEAVY_MODULES = ("pandas", "altair", "matplotlib.pyplot", "numpy", "pyarrow")
+# ---------------------------
+
+
+# ---------------------------
+# Lazy imports
+# ---------------------------
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stands in for a module until one of its attributes is looked up.
+
+    The first lookup runs `before_import` (if any), imports the module and copies
+    its namespace onto the stand-in, so later lookups cost what a normal module's do.
+    """
+
+    def __init__(self, name: str, before_import=None):
+        super().__init__(name)
+        self._lazy_before_import = before_import
+        self._lazy_module = None
+        self._lazy_lock = threading.Lock()  # sessions run their scripts in separate threads
+
+    def _lazy_load(self) -> types.ModuleType:
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                if self._lazy_before_import is not None:
+                    self._lazy_before_import()
+                module = importlib.import_module(self.__name__)
+                self.__dict__.update(module.__dict__)
+                self._lazy_module = module
+        return self._lazy_module
+
+    def __getattr__(self, attr: str):
+        # only reached for names not yet copied onto the stand-in
+        return getattr(self._lazy_load(), attr)
+
+    def __dir__(self):
+        return dir(self._lazy_load())
+
+    def __repr__(self):
+        state = "loaded" if self._lazy_module is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str, before_import=None) -> types.ModuleType:
+    """The module if it is already imported, otherwise a LazyModule for it."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name, before_import)
+
+
+def _headless_matplotlib():
+    # the apps only render to PNG bytes; picking the Agg backend up front skips the GUI backend probe
+    importlib.import_module("matplotlib").use("Agg")
+
+
+def lazy_pyplot() -> types.ModuleType:
+    """matplotlib.pyplot, imported on first use with the non-interactive Agg backend."""
+    return lazy_import("matplotlib.pyplot", _headless_matplotlib)
+
+
+# ---------------------------
+# Static assets
+# ---------------------------
+
+
+def _minify_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};,>])\s*", r"\1", css).strip()
+
+
+@lru_cache(maxsize=None)
+def load_css(app: str) -> str:
+    """static/<app>.css as a minified <style> block; read once per process."""
+    path = STATIC_DIR / f"{Path(app).stem}.css"
+    return f"<style>{_minify_css(path.read_text(encoding='utf-8'))}</style>"
+
+
+def inject_css(app: str):
+    """Add the app's stylesheet to the page. `app` is the app's __file__ or its name."""
+    import streamlit as st
+
+    st.markdown(load_css(app), unsafe_allow_html=True)
+
+
+# ---------------------------
+# Benchmark
+# ---------------------------
+
+# runs in a fresh interpreter per app, so the first run pays every import the app makes
+_BENCH_SCRIPT = """
+import json, sys, time
+path, reruns, heavy = sys.argv[1], int(sys.argv[2]), sys.argv[3].split(",")
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+streamlit_s = time.perf_counter() - start
+at = AppTest.from_file(path, default_timeout=120)
+start = time.perf_counter()
+at.run()
+first_s = time.perf_counter() - start
+loaded = [m for m in heavy if m in sys.modules]
+times = []
+for _ in range(reruns):
+    start = time.perf_counter()
+    at.run()
+    times.append(time.perf_counter() - start)
+times.sort()
+error = str(at.exception[0].message).splitlines()[0] if at.exception else None
+print(json.dumps({"streamlit_s": streamlit_s, "first_s": first_s, "loaded": loaded,
+                  "rerun_s": times[len(times) // 2] if times else 0.0, "error": error}))
+"""
+
+
+def bench_app(path: Path, reruns: int) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", _BENCH_SCRIPT, str(path), str(reruns), ",".join(HEAVY_MODULES)],
+        cwd=path.parent, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": str(HERE)},
+    )
+    if completed.returncode != 0:
+        return {"error": (completed.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_bench(reruns: int, apps: list):
+    try:
+        import streamlit.testing.v1  # noqa: F401
+    except ImportError:
+        raise SystemExit("The benchmark needs streamlit (pip install streamlit)")
+    paths = [Path(app).resolve() for app in apps] or sorted(HERE.glob("[0-9]-*.py"))
+    print(f"{len(paths)} app(s), first run in a fresh process, then the median of {reruns} reruns\n")
+    print(f"{'app':<30}{'first run s':>12}{'rerun ms':>10}  heavy modules loaded")
+    streamlit_s = []
+    for path in paths:
+        result = bench_app(path, reruns)
+        if "first_s" not in result:
+            print(f"{path.name:<30}  failed: {result['error']}")
+            continue
+        streamlit_s.append(result["streamlit_s"])
+        print(f"{path.name:<30}{result['first_s']:>12.2f}{result['rerun_s'] * 1000:>10.1f}  "
+              f"{', '.join(result['loaded']) or '-'}" + (f"  (error: {result['error']})" if result["error"] else ""))
+    if streamlit_s:
+        print(f"\nimporting streamlit itself: {sum(streamlit_s) / len(streamlit_s):.2f}s per process (not included)")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the cold start and reruns of the Streamlit apps")
+    parser.add_argument("--bench", type=int, nargs="?", const=10, metavar="N", help="reruns per app (default 10)")
+    parser.add_argument("apps", nargs="*", help="app scripts (default: every numbered app here)")
+    args = parser.parse_args()
+    if args.bench is None:
+        parser.print_help()
+        return
+    run_bench(args.bench, args.apps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+# prompt_registry.py
+"""
+Prompt template registry 📚
+Run: python prompt_registry.py            (list every template and its variables)
+     python prompt_registry.py --bench 100000
+
+What it does:
+- Loads the app specs in prompts/*.txt, the chat templates in prompts/*.json
+  (the RAG notebooks fetch theirs from here) and the ones notebooks still build
+  inline (ChatPromptTemplate.from_messages / PromptTemplate), once, at startup
+- Parses and checks every template once at load (plain {variable} names, valid
+  conversions) into literal text and fields, so rendering only joins the
+  pieces instead of parsing the text again
+- A prompts/ file that isn't a valid template is skipped and listed as an
+  error instead of stopping the registry from loading
+- Checks variables on render: a missing variable raises PromptError naming it
+- Hot-reloads: a template whose file changed is reloaded the next time it is fetched
+- Converts to LangChain objects with .to_langchain() when langchain_core is installed
+
+Templates use the same {variable} / {{literal braces}} syntax as LangChain's
+f-string templates.
+
+Minimal dependencies: none (langchain_core only for .to_langchain() and the benchmark)
+"""
+
+import ast
+import json
+import os
+import string
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# ---------------------------
+# Configuration / Constants
+# ---------------------------
+HERE = Path(__file__).parent
+PROMPTS_DIR = HERE / "prompts"
+NOTEBOOKS_DIR = HERE.parent.parent / "colab"  # the notebooks that build chat templates inline
+RELOAD_CHECK_SECS = 1.0  # how often a fetched template's file is stat()ed for changes
+MESSAGE_CLASSES = {
+    "SystemMessagePromptTemplate": "system",
+    "HumanMessagePromptTemplate": "human",
+    "AIMessagePromptTemplate": "ai",
+}
+CONVERSIONS = {None: None, "r": repr, "s": str, "a": ascii}
+# ---------------------------
+
+
+class PromptError(ValueError):
+    """A template that can't be compiled, or a render with missing variables."""
+
+
+# ---------------------------
+# Compilation
+# ---------------------------
+
+
+def compile_template(text: str):
+    """
+    Parse and check an f-string style template once and return (formatter, variables).
+    formatter(values: dict) -> str; variables is the frozenset of names it needs.
+    """
+    try:
+        parsed = list(string.Formatter().parse(text))
+    except ValueError as e:
+        raise PromptError(f"bad template: {e}") from None
+
+    literals, fields, pending = [], [], ""
+    for literal, name, spec, conversion in parsed:
+        pending += literal  # "{{" comes back as a literal of its own
+        if name is None:
+            continue
+        if not name.isidentifier():
+            raise PromptError(f"variable {name!r} is not a plain name")
+        if conversion not in (None, "r", "s", "a"):
+            raise PromptError(f"unknown conversion !{conversion} in {{{name}!{conversion}}}")
+        if "{" in (spec or ""):
+            raise PromptError(f"nested fields in {{{name}:{spec}}} are not supported")
+        literals.append(pending)
+        fields.append((name, CONVERSIONS[conversion], spec))
+        pending = ""
+    last = pending
+
+    # the common shapes get their own closures: the notebooks' templates mostly have one field
+    if not fields:
+        def render(values: dict) -> str:
+            return last
+    elif len(fields) == 1:
+        [head], [(name, conversion, spec)] = literals, fields
+
+        def render(values: dict) -> str:
+            value = values[name]
+            return head + format(conversion(value) if conversion else value, spec) + last
+    else:
+        def render(values: dict) -> str:
+            # literal, field, literal, field, ..., literal; a missing variable raises KeyError like format_map
+            out = []
+            for literal, (name, conversion, spec) in zip(literals, fields):
+                value = values[name]
+                out += (literal, format(conversion(value) if conversion else value, spec))
+            out.append(last)
+            return "".join(out)
+
+    return render, frozenset(name for name, _, _ in fields)
+
+
+@dataclass
+class Message:
+    role: str  # system, human, ai
+    template: str
+    formatter: object = field(repr=False, default=None)
+    variables: frozenset = frozenset()
+
+    def __post_init__(self):
+        self.formatter, self.variables = compile_template(self.template)
+
+
+@dataclass
+class PromptTemplate:
+    name: str
+    messages: list  # [Message]
+    source: str = ""  # file it came from
+    variables: frozenset = frozenset()
+
+    def __post_init__(self):
+        self.variables = frozenset().union(*(m.variables for m in self.messages))
+
+    def _missing(self, values: dict) -> PromptError:
+        return PromptError(f"{self.name}: missing variables {sorted(self.variables - values.keys())}")
+
+    def format_messages(self, **values) -> list:
+        """[(role, text), ...]"""
+        try:
+            return [(m.role, m.formatter(values)) for m in self.messages]
+        except KeyError:  # only looked into when it fails, so the happy path pays nothing
+            raise self._missing(values) from None
+
+    def format(self, **values) -> str:
+        """All messages as one string (a single-message template gives just its text)."""
+        try:
+            if len(self.messages) == 1:
+                return self.messages[0].formatter(values)
+            return "\n\n".join(f"{m.role.capitalize()}: {m.formatter(values)}" for m in self.messages)
+        except KeyError:
+            raise self._missing(values) from None
+
+    def to_langchain(self):
+        from langchain_core.prompts import ChatPromptTemplate
+
+        return ChatPromptTemplate.from_messages([(m.role, m.template) for m in self.messages])
+
+
+# ---------------------------
+# Loading
+# ---------------------------
+
+
+def load_text_prompts(folder: Path = PROMPTS_DIR, errors: dict = None) -> list:
+    """
+    prompts/<name>.txt -> one single-message template named <name>.
+    prompts/<name>.json -> a chat template, {"messages": [[role, text], ...]}.
+    A file that isn't a valid template is skipped; its error goes in `errors` (path -> message).
+    """
+    templates = []
+    for path in sorted(Path(folder).glob("*.txt")) + sorted(Path(folder).glob("*.json")):
+        text = path.read_text(encoding="utf-8")
+        try:
+            if path.suffix == ".txt":
+                messages = [Message("human", text)]
+            else:
+                messages = [Message(role, template) for role, template in json.loads(text)["messages"]]
+            templates.append(PromptTemplate(path.stem, messages, str(path)))
+        except PromptError as e:
+            if errors is not None:
+                errors[str(path)] = str(e)
+        except (ValueError, KeyError, TypeError) as e:
+            if errors is not None:
+                errors[str(path)] = f"not a chat template: {e!r}"
+    return templates
+
+
+def _literal(node, strings: dict):
+    """The string a node stands for: a literal, implicit concatenation, or a name assigned one."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name):
+        return strings.get(node.id)
+    return None
+
+
+def _messages(call: ast.Call, strings: dict):
+    """Messages of a ChatPromptTemplate.from_messages([...]) or PromptTemplate(...) call, or None."""
+    func = call.func
+    if not isinstance(func, ast.Attribute) and not isinstance(func, ast.Name):
+        return None
+    owner = func.value.id if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) else None
+    method = func.attr if isinstance(func, ast.Attribute) else func.id
+
+    if owner == "ChatPromptTemplate" and method == "from_messages" and call.args:
+        if not isinstance(call.args[0], (ast.List, ast.Tuple)):
+            return None
+        messages = []
+        for item in call.args[0].elts:
+            if isinstance(item, ast.Tuple) and len(item.elts) == 2:  # ("system", "...")
+                role, text = _literal(item.elts[0], strings), _literal(item.elts[1], strings)
+            elif (isinstance(item, ast.Call) and isinstance(item.func, ast.Attribute)
+                  and isinstance(item.func.value, ast.Name) and item.args):
+                role = MESSAGE_CLASSES.get(item.func.value.id)
+                text = _literal(item.args[0], strings)
+            else:
+                return None
+            if role is None or text is None:
+                return None
+            messages.append(Message({"user": "human", "assistant": "ai"}.get(role, role), text))
+        return messages
+
+    if (owner, method) in (("PromptTemplate", "from_template"), (None, "PromptTemplate")):
+        text = _literal(call.args[0], strings) if call.args else None
+        for kw in call.keywords:
+            if kw.arg == "template":
+                text = _literal(kw.value, strings)
+        return [Message("human", text)] if text is not None else None
+    return None
+
+
+def load_notebook_prompts(folder: Path = NOTEBOOKS_DIR) -> list:
+    """Templates assigned in notebook code cells, named <notebook>.<variable>."""
+    templates = []
+    for path in sorted(Path(folder).rglob("*.ipynb")):
+        if ".ipynb_checkpoints" in path.parts:
+            continue
+        try:
+            cells = json.loads(path.read_text(encoding="utf-8"))["cells"]
+        except (OSError, ValueError, KeyError):
+            continue
+        seen = {}
+        for cell in cells:
+            if cell.get("cell_type") != "code":
+                continue
+            source = "".join(cell.get("source", []))
+            if "PromptTemplate" not in source:
+                continue
+            # shell and magic lines aren't Python
+            source = "\n".join("" if line.lstrip().startswith(("!", "%")) else line
+                               for line in source.splitlines())
+            try:
+                tree = ast.parse(source)
+            except SyntaxError:
+                continue
+            strings = {}
+            for node in tree.body:
+                if not (isinstance(node, ast.Assign) and len(node.targets) == 1
+                        and isinstance(node.targets[0], ast.Name)):
+                    continue
+                target = node.targets[0].id
+                if isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+                    strings[target] = node.value.value
+                elif isinstance(node.value, ast.Call):
+                    try:
+                        messages = _messages(node.value, strings)
+                    except PromptError:
+                        messages = None
+                    if messages:
+                        seen[target] = seen.get(target, 0) + 1
+                        name = f"{path.stem}.{target}" + (f"_{seen[target]}" if seen[target] > 1 else "")
+                        templates.append(PromptTemplate(name, messages, str(path)))
+    return templates
+
+
+# ---------------------------
+# Registry
+# ---------------------------
+
+
+class PromptRegistry:
+    """
+    Compiled templates by name. get() reloads a template's source file if it
+    changed (checked at most every `check_every` seconds per file).
+    """
+
+    def __init__(self, prompts_dir: Path = PROMPTS_DIR, notebooks_dir: Path = NOTEBOOKS_DIR,
+                 check_every: float = RELOAD_CHECK_SECS):
+        self.prompts_dir = Path(prompts_dir)
+        self.notebooks_dir = Path(notebooks_dir) if notebooks_dir else None
+        self.check_every = check_every
+        self.templates = {}
+        self.errors = {}  # source file -> why it was skipped
+        self._mtimes = {}  # source file -> mtime it was loaded at
+        self._checked = {}  # source file -> last time its mtime was looked at
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _add(self, templates):
+        for template in templates:
+            self.templates[template.name] = template
+            if template.source and template.source not in self._mtimes:
+                self._mtimes[template.source] = os.stat(template.source).st_mtime_ns
+
+    def reload(self):
+        """Load everything again."""
+        with self._lock:
+            self.templates, self.errors, self._mtimes = {}, {}, {}
+            if self.prompts_dir.is_dir():
+                self._add(load_text_prompts(self.prompts_dir, self.errors))
+            if self.notebooks_dir and self.notebooks_dir.is_dir():
+                self._add(load_notebook_prompts(self.notebooks_dir))
+
+    def _refresh(self, source: str):
+        now = time.monotonic()
+        if now - self._checked.get(source, 0.0) < self.check_every:
+            return
+        self._checked[source] = now
+        try:
+            mtime = os.stat(source).st_mtime_ns
+        except OSError:
+            return  # deleted: keep serving the last good version
+        if mtime == self._mtimes.get(source):
+            return
+        with self._lock:
+            path = Path(source)
+            if path.suffix in (".txt", ".json"):
+                errors = {}
+                fresh = [t for t in load_text_prompts(path.parent, errors) if t.source == source]
+                if source in errors:
+                    self.errors[source] = errors[source]
+                    return  # a half-edited file: keep the last good version
+                self.errors.pop(source, None)
+            else:
+                fresh = [t for t in load_notebook_prompts(path.parent) if t.source == source]
+            for name in [n for n, t in self.templates.items() if t.source == source]:
+                del self.templates[name]
+            self._mtimes[source] = mtime
+            for template in fresh:
+                self.templates[template.name] = template
+
+    def get(self, name: str) -> PromptTemplate:
+        template = self.templates.get(name)
+        if template is None:
+            raise KeyError(f"no prompt named {name!r}; known: {', '.join(sorted(self.templates))}")
+        if template.source and self.check_every is not None:
+            self._refresh(template.source)
+            template = self.templates.get(name, template)
+        return template
+
+    def format(self, prompt_name: str, /, **values) -> str:
+        return self.get(prompt_name).format(**values)
+
+    def names(self) -> list:
+        return sorted(self.templates)
+
+
+_registry = None
+
+
+def get_registry() -> PromptRegistry:
+    """The process-wide registry, loaded on first use."""
+    global _registry
+    if _registry is None:
+        _registry = PromptRegistry()
+    return _registry
+
+
+# ---------------------------
+# Benchmark
+# ---------------------------
+
+
+def run_bench(n: int):
+    registry = get_registry()
+    name = "self_rag_2.chat_template" if "self_rag_2.chat_template" in registry.templates else registry.names()[0]
+    template = registry.get(name)
+    values = {v: f"value of {v} " * 20 for v in template.variables}
+    print(f"{n} renders of {name!r} (variables: {sorted(template.variables)})\n")
+
+    def reparse():
+        # what building the template inline does: parse the text again on every call
+        return [(m.role, m.template.format(**values)) for m in template.messages]
+
+    def reparse_formatter():
+        formatter = string.Formatter()
+        return [(m.role, formatter.vformat(m.template, (), values)) for m in template.messages]
+
+    rows = [("str.format (re-parse)", reparse), ("string.Formatter (re-parse)", reparse_formatter),
+            ("registry (parsed once)", lambda: template.format_messages(**values))]
+    try:
+        from langchain_core.prompts import ChatPromptTemplate
+
+        lc = template.to_langchain()
+        rows.insert(0, ("ChatPromptTemplate per call",
+                        lambda: ChatPromptTemplate.from_messages(
+                            [(m.role, m.template) for m in template.messages]).format_messages(**values)))
+        rows.insert(1, ("ChatPromptTemplate reused", lambda: lc.format_messages(**values)))
+    except ImportError:
+        pass
+
+    assert reparse() == template.format_messages(**values)
+    print(f"{'formatter':<30}{'total s':>9}{'us/render':>11}")
+    for label, fn in rows:
+        runs = n if "ChatPromptTemplate" not in label else max(1, n // 20)  # LangChain is far slower
+        start = time.perf_counter()
+        for _ in range(runs):
+            fn()
+        seconds = time.perf_counter() - start
+        print(f"{label:<30}{seconds * n / runs:>9.3f}{seconds / runs * 1e6:>11.2f}"
+              + ("  (extrapolated)" if runs != n else ""))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="List or benchmark the registered prompt templates")
+    parser.add_argument("--show", metavar="NAME", help="print one template's messages")
+    parser.add_argument("--bench", type=int, metavar="N", help="time N renders against re-parsing")
+    args = parser.parse_args()
+
+    if args.bench:
+        run_bench(args.bench)
+        return
+    registry = get_registry()
+    if args.show:
+        for message in registry.get(args.show).messages:
+            print(f"[{message.role}]\n{message.template}\n")
+        return
+    for name in registry.names():
+        template = registry.templates[name]
+        print(f"{name:<40}{len(template.messages)} message(s)  variables: {sorted(template.variables) or '-'}")
+    for source, error in sorted(registry.errors.items()):
+        print(f"skipped {Path(source).name}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+# prompt_spec.py
+"""
+Video-prompt specs (labs/*.json) -> flat prompt strings 🎬
+Run: python prompt_spec.py labs/combined_prompt.json [--scene scene3]
+     python prompt_spec.py --bench 5000
+
+What it does:
+- Streams a spec file one top-level scene at a time (memory stays at the
+  size of the largest scene, not the whole file)
+- Validates every scene against SCENE_SCHEMA, compiled once into plain
+  Python checks
+- Interns repeated strings (identities, voice profiles, styles...) across scenes
+- Compiles each scene into one flat prompt: a "path: text" line per leaf
+- Caches compiled prompts by a hash of the scene's raw JSON, the schema and
+  COMPILER_VERSION, so a re-run only recompiles scenes that changed, and a
+  changed schema or compiler invalidates the cache (optionally persisted to disk)
+
+Minimal dependencies: none (standard library only)
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+
+# ---------------------------
+# Configuration / Constants
+# ---------------------------
+CHUNK_SIZE = 1 << 16  # bytes read per refill of the streaming buffer
+CACHE_FILE = Path("labs") / ".prompt_cache.json"
+MAX_CACHE_ENTRIES = 50_000
+COMPILER_VERSION = 1  # bump when compile_scene's output changes, so cached prompts are rebuilt
+# ---------------------------
+
+# Leaves of a spec are text (or the odd number / flag); everything else nests.
+TEXT_TREE = {
+    "type": ["object", "array", "string", "number", "boolean"],
+    "minProperties": 1,
+    "additionalProperties": {"$ref": "#/definitions/text_tree"},
+    "items": {"type": ["string", "number", "boolean"]},
+}
+
+SCENE_SCHEMA = {
+    "definitions": {"text_tree": TEXT_TREE},
+    "type": "object",
+    "required": ["version", "style", "video_description"],
+    "properties": {
+        "version": {"type": "string", "pattern": r"^\d+(\.\d+)*$"},
+        "style": {"type": "string", "minLength": 1},
+        "video_length_in_secs": {"type": "string", "pattern": r"^\d+(\.\d+)?$"},
+        "video_description": {"type": "object", "minProperties": 1,
+                              "additionalProperties": {"$ref": "#/definitions/text_tree"}},
+    },
+    "additionalProperties": {"$ref": "#/definitions/text_tree"},
+}
+
+
+class SpecError(ValueError):
+    """A spec file that isn't valid JSON or doesn't match the schema."""
+
+
+# ---------------------------
+# Schema compilation
+# ---------------------------
+
+_TYPES = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+}
+
+
+def compile_schema(schema: dict):
+    """
+    Turn a JSON-Schema subset into a validator function `check(value, path)`
+    that raises SpecError. Supported: type (or a list of types), properties,
+    required, additionalProperties, items, pattern, enum, minLength,
+    minProperties and local "$ref": "#/definitions/...".
+    Keywords only apply to values of their kind, as in JSON Schema.
+    """
+    definitions = {}
+
+    def build(node: dict):
+        if "$ref" in node:
+            name = node["$ref"].rsplit("/", 1)[-1]
+            return lambda value, path: definitions[name](value, path)  # late-bound: allows recursion
+
+        checks = []
+        types = node.get("type")
+        if types:
+            types = [types] if isinstance(types, str) else list(types)
+            type_checks = [_TYPES[t] for t in types]
+            expected = " or ".join(types)
+
+            def check_type(value, path):
+                if not any(t(value) for t in type_checks):
+                    raise SpecError(f"{path}: expected {expected}, got {type(value).__name__}")
+            checks.append(check_type)
+
+        if "enum" in node:
+            allowed = set(node["enum"])
+
+            def check_enum(value, path):
+                if value not in allowed:
+                    raise SpecError(f"{path}: {value!r} is not one of {sorted(allowed)}")
+            checks.append(check_enum)
+
+        if "pattern" in node or "minLength" in node:
+            pattern = re.compile(node["pattern"]) if "pattern" in node else None
+            min_length = node.get("minLength", 0)
+
+            def check_string(value, path):
+                if not isinstance(value, str):
+                    return
+                if len(value) < min_length:
+                    raise SpecError(f"{path}: shorter than {min_length} characters")
+                if pattern and not pattern.search(value):
+                    raise SpecError(f"{path}: {value!r} does not match {pattern.pattern}")
+            checks.append(check_string)
+
+        if {"properties", "required", "additionalProperties", "minProperties"} & node.keys():
+            properties = {k: build(v) for k, v in node.get("properties", {}).items()}
+            required = node.get("required", [])
+            min_properties = node.get("minProperties", 0)
+            extra = node.get("additionalProperties", True)
+            extra_check = build(extra) if isinstance(extra, dict) else None
+
+            def check_object(value, path):
+                if not isinstance(value, dict):
+                    return
+                for key in required:
+                    if key not in value:
+                        raise SpecError(f"{path}: missing {key!r}")
+                if len(value) < min_properties:
+                    raise SpecError(f"{path}: empty object")
+                for key, item in value.items():
+                    check = properties.get(key, extra_check)
+                    if check is not None:
+                        check(item, f"{path}.{key}")
+                    elif extra is False:
+                        raise SpecError(f"{path}: unexpected key {key!r}")
+            checks.append(check_object)
+
+        if "items" in node:
+            item_check = build(node["items"])
+
+            def check_array(value, path):
+                if isinstance(value, list):
+                    for i, item in enumerate(value):
+                        item_check(item, f"{path}[{i}]")
+            checks.append(check_array)
+
+        if len(checks) == 1:
+            return checks[0]
+
+        def check_all(value, path):
+            for check in checks:
+                check(value, path)
+        return check_all
+
+    for name, node in schema.get("definitions", {}).items():
+        definitions[name] = build(node)
+    return build(schema)
+
+
+# ---------------------------
+# Streaming load
+# ---------------------------
+
+
+class Interner:
+    """Shares one copy of every repeated string (keys and text) across scenes."""
+
+    def __init__(self):
+        self.table = {}
+
+    def __call__(self, s: str) -> str:
+        return self.table.setdefault(s, s)
+
+    def pairs_hook(self, pairs):
+        intern = self
+        out = {}
+        for key, value in pairs:
+            if isinstance(value, str):
+                value = intern(value)
+            elif isinstance(value, list):
+                value = [intern(v) if isinstance(v, str) else v for v in value]
+            out[intern(key)] = value
+        return out
+
+
+def iter_scenes(path, interner: Interner = None, chunk_size: int = CHUNK_SIZE):
+    """
+    Yield (name, scene, raw_json) for each top-level "name": {...} pair of a
+    spec file, reading it incrementally. Only the current scene and one read
+    chunk are held in memory.
+    """
+    hook = interner.pairs_hook if interner else None
+    decoder = json.JSONDecoder(object_pairs_hook=hook)
+    with open(path, encoding="utf-8") as f:
+        buf, pos, eof = "", 0, False
+
+        def fill(min_size=chunk_size):
+            nonlocal buf, pos, eof
+            chunk = f.read(max(chunk_size, min_size))
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+
+        def skip_ws():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                fill()
+
+        def decode():
+            # values never straddle the buffer end: on a truncated value, read more (doubling) and retry
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                    raw, pos = buf[pos:end], end
+                    return value, raw
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise SpecError(f"{path}: {e}") from None
+                    fill(len(buf) - pos)
+
+        def expect(char):
+            nonlocal pos
+            skip_ws()
+            if pos >= len(buf) or buf[pos] != char:
+                found = buf[pos:pos + 20] if pos < len(buf) else "end of file"
+                raise SpecError(f"{path}: expected {char!r}, found {found!r}")
+            pos += 1
+
+        fill()
+        expect("{")
+        skip_ws()
+        if pos < len(buf) and buf[pos] == "}":
+            return
+        while True:
+            skip_ws()
+            name, _ = decode()
+            if not isinstance(name, str):
+                raise SpecError(f"{path}: expected a scene name, got {name!r}")
+            expect(":")
+            skip_ws()
+            scene, raw = decode()
+            yield name, scene, raw
+            skip_ws()
+            if pos < len(buf) and buf[pos] == ",":
+                pos += 1
+                continue
+            expect("}")
+            return
+
+
+# ---------------------------
+# Compilation
+# ---------------------------
+
+
+def _label(key: str) -> str:
+    return key.replace("_", " ").strip().capitalize()
+
+
+def compile_scene(scene: dict) -> str:
+    """Flatten a scene into one prompt string, one 'Path / to / leaf: text' line per leaf."""
+    header = [f"Style: {scene.get('style', '')}"]
+    if scene.get("video_length_in_secs"):
+        header.append(f"Length: {scene['video_length_in_secs']} seconds")
+    lines = [". ".join(header) + "."]
+
+    def walk(node, trail):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                walk(value, trail + (_label(key),))
+        elif isinstance(node, list):
+            lines.append(f"{' / '.join(trail)}: {', '.join(str(v) for v in node)}")
+        else:
+            lines.append(f"{' / '.join(trail)}: {node}")
+
+    for key, value in scene.items():
+        if key in ("version", "style", "video_length_in_secs"):
+            continue
+        walk(value, () if key == "video_description" else (_label(key),))
+    return "\n".join(lines)
+
+
+class PromptCache:
+    """Compiled prompts keyed by a hash of the scene's raw JSON and the compiler's salt, optionally persisted."""
+
+    def __init__(self, path: Path = None, max_entries: int = MAX_CACHE_ENTRIES):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.entries = {}
+        if self.path and self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.entries = {}  # a corrupt cache just means recompiling
+
+    @staticmethod
+    def salt(schema: dict, version: int = COMPILER_VERSION) -> bytes:
+        """What else a cached prompt depends on: the schema it was checked against and the compiler."""
+        setup = json.dumps([schema, version], sort_keys=True)
+        return hashlib.blake2b(setup.encode("utf-8"), digest_size=16).digest()
+
+    @staticmethod
+    def key(raw: str, salt: bytes = b"") -> str:
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16, key=salt).hexdigest()
+
+    def get(self, key: str):
+        prompt = self.entries.pop(key, None)
+        if prompt is not None:
+            self.entries[key] = prompt  # most recently used last
+        return prompt
+
+    def put(self, key: str, prompt: str):
+        self.entries[key] = prompt
+
+    def save(self):
+        if not self.path:
+            return
+        keep = list(self.entries.items())[-self.max_entries:]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(dict(keep)), encoding="utf-8")
+        tmp.replace(self.path)
+
+
+class PromptCompiler:
+    """Validate and compile spec files, reusing cached prompts for unchanged scenes."""
+
+    def __init__(self, schema: dict = SCENE_SCHEMA, cache: PromptCache = None):
+        self.check = compile_schema(schema)
+        self.salt = PromptCache.salt(schema)
+        self.cache = cache if cache is not None else PromptCache()
+        self.interner = Interner()
+        self.hits = 0
+        self.misses = 0
+
+    def iter_file(self, path):
+        """Yield (scene name, prompt) for every scene of a spec file."""
+        for name, scene, raw in iter_scenes(path, self.interner):
+            key = PromptCache.key(raw, self.salt)
+            prompt = self.cache.get(key)
+            if prompt is None:
+                self.misses += 1
+                self.check(scene, name)
+                prompt = compile_scene(scene)
+                self.cache.put(key, prompt)
+            else:
+                self.hits += 1
+            yield name, prompt
+
+    def compile_file(self, path) -> dict:
+        return dict(self.iter_file(path))
+
+
+# ---------------------------
+# Benchmark
+# ---------------------------
+
+
+def make_synthetic(path, n_scenes: int, seed_files=("labs/combined_prompt.json", "labs/ignore_practise.json")):
+    """Write a spec file of n_scenes scenes built from the real ones, each made distinct."""
+    seeds = []
+    for seed_file in seed_files:
+        with open(Path(__file__).parent / seed_file, encoding="utf-8") as f:
+            seeds += list(json.load(f).values())
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{\n")
+        for i in range(n_scenes):
+            scene = json.loads(json.dumps(seeds[i % len(seeds)]))
+            scene["video_description"]["take"] = f"Take {i}"
+            f.write(f'    "scene{i + 1}": {json.dumps(scene, indent=4)}{"," if i < n_scenes - 1 else ""}\n')
+        f.write("}\n")
+
+
+def touch_scene(path, index: int):
+    """Change one scene's text in place (the same length, so the rest of the file is identical)."""
+    text = Path(path).read_text(encoding="utf-8")
+    old = f'"take": "Take {index}"'
+    Path(path).write_text(text.replace(old, old.replace("Take", "Tak3"), 1), encoding="utf-8")
+
+
+def run_bench(n_scenes: int):
+    import tempfile
+    import time
+    import tracemalloc
+
+    def measure(fn):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, seconds, peak
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / "synthetic.json"
+        make_synthetic(path, n_scenes)
+        size = path.stat().st_size
+        check = compile_schema(SCENE_SCHEMA)
+
+        def baseline():
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            out = {}
+            for name, scene in data.items():
+                check(scene, name)
+                out[name] = compile_scene(scene)
+            return out
+
+        cache = PromptCache(Path(folder) / "cache.json")
+        compiler = PromptCompiler(cache=cache)
+        rows = []
+        expected, seconds, peak = measure(baseline)
+        rows.append(("json.load + compile all", seconds, peak, "-"))
+
+        prompts, seconds, peak = measure(lambda: compiler.compile_file(path))
+        assert prompts == expected
+        rows.append(("streaming, cold cache", seconds, peak, f"{compiler.misses} compiled"))
+        cache.save()
+
+        compiler = PromptCompiler(cache=PromptCache(cache.path))
+        _, seconds, peak = measure(lambda: compiler.compile_file(path))
+        rows.append(("streaming, warm cache", seconds, peak, f"{compiler.misses} compiled"))
+
+        touch_scene(path, n_scenes // 2)
+        compiler = PromptCompiler(cache=PromptCache(cache.path))
+        _, seconds, peak = measure(lambda: compiler.compile_file(path))
+        rows.append(("one scene changed", seconds, peak, f"{compiler.misses} compiled"))
+
+        print(f"{n_scenes} scenes, {size / 1e6:.1f} MB; {len(compiler.interner.table)} distinct strings interned\n")
+        print(f"{'run':<26}{'seconds':>9}{'peak MB':>9}  work")
+        for name, seconds, peak, work in rows:
+            print(f"{name:<26}{seconds:>9.3f}{peak / 1e6:>9.1f}  {work}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validate and compile video-prompt spec files")
+    parser.add_argument("files", nargs="*", help="spec files, e.g. labs/combined_prompt.json")
+    parser.add_argument("--scene", help="only print this scene")
+    parser.add_argument("--no-cache", action="store_true", help=f"don't read or write {CACHE_FILE}")
+    parser.add_argument("--bench", type=int, metavar="N", help="benchmark on a synthetic file of N scenes")
+    args = parser.parse_args()
+
+    if args.bench:
+        run_bench(args.bench)
+        return
+    if not args.files:
+        parser.error("give spec files or --bench N")
+
+    cache = PromptCache(None if args.no_cache else Path(__file__).parent / CACHE_FILE)
+    compiler = PromptCompiler(cache=cache)
+    try:
+        for path in args.files:
+            for name, prompt in compiler.iter_file(path):
+                if args.scene in (None, name):
+                    print(f"=== {path} :: {name} ===\n{prompt}\n")
+    except SpecError as e:
+        raise SystemExit(f"Invalid spec: {e}")
+    finally:
+        cache.save()
+    print(f"{compiler.misses} scenes compiled, {compiler.hits} from cache")
+
+
+if __name__ == "__main__":
+    main()
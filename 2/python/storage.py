@@ -0,0 +1,455 @@
+# storage.py
+"""
+Shared SQLite storage for the Streamlit apps 🗄️
+Run: python storage.py                      (apply migrations, show what is stored)
+     python storage.py --bench --sessions 50 --writes 40
+
+What it does:
+- One database, data/apps.db, in WAL mode: readers never wait for the writer
+- A small per-process connection pool (get_storage() is an st.cache_resource,
+  so every session of every app shares it); sqlite3's statement cache keeps the
+  prepared statements of each pooled connection
+- Batched writes (group commit): writes queue up while a commit is running and
+  the next one commits all of them in a single transaction, each write in its
+  own savepoint. Whichever caller finds the writer free does the commit, so an
+  uncontended write costs no thread handoff
+- Schema migrations numbered by PRAGMA user_version, applied once on open
+  (the first one imports the water tracker's old data/water_log.csv)
+- A benchmark of many sessions writing at once: the old CSV rewrite, a connection
+  per write, the WAL pool, and the pool with batched writes
+
+    storage = get_storage()
+    storage.write("INSERT INTO water_log (timestamp, ml) VALUES (?, ?)", (ts, 250))
+    rows = storage.query("SELECT timestamp, ml FROM water_log ORDER BY timestamp")
+
+Minimal dependencies: none (streamlit only to share the storage between sessions)
+"""
+
+import csv
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    import streamlit as st
+
+    _cache_resource = st.cache_resource
+except ImportError:  # scripts and the benchmark still get one storage per process
+    _cache_resource = lru_cache(maxsize=None)
+
+# ---------------------------
+# Configuration / Constants
+# ---------------------------
+HERE = Path(__file__).parent
+DB_PATH = Path(os.getenv("APPS_DB", HERE / "data" / "apps.db"))
+LEGACY_WATER_CSV = HERE / "data" / "water_log.csv"
+POOL_SIZE = 4  # reader connections; writes go through the one writer connection
+BATCH_SIZE = 256  # most writes committed in one transaction
+BUSY_TIMEOUT_SECS = 5.0
+STATEMENT_CACHE = 128  # prepared statements kept per connection
+# ---------------------------
+
+
+class StorageError(Exception):
+    pass
+
+
+# ---------------------------
+# Schema migrations
+# ---------------------------
+
+
+def _import_water_csv(conn: sqlite3.Connection, storage: "Storage"):
+    """Copy the rows of the water tracker's old CSV log (the file itself is left alone)."""
+    path = storage.legacy_water_csv
+    if not path or not Path(path).exists():
+        return
+    rows = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                datetime.strptime(row["timestamp"], "%Y-%m-%dT%H:%M:%S")
+                rows.append((row["timestamp"], int(float(row["ml"]))))
+            except (KeyError, TypeError, ValueError):
+                continue  # unreadable rows never showed up in the app either
+    conn.executemany("INSERT INTO water_log (timestamp, ml) VALUES (?, ?)", rows)
+
+
+# applied in order; PRAGMA user_version is the number applied so far. Never edit a shipped
+# step: add a new one. Each is SQL (statements split on ";") or a function(conn, storage).
+MIGRATIONS = [
+    # 1-2: water tracker (was data/water_log.csv)
+    """
+    CREATE TABLE water_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,  -- ids are never reused, so (max id, count) is a revision
+        timestamp TEXT NOT NULL,  -- local time, %Y-%m-%dT%H:%M:%S
+        ml INTEGER NOT NULL CHECK (ml > 0)
+    );
+    CREATE INDEX water_log_timestamp ON water_log (timestamp)
+    """,
+    _import_water_csv,
+    # 3: gym workout logger (was st.session_state)
+    """
+    CREATE TABLE workouts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        logged_at TEXT NOT NULL,
+        exercise TEXT NOT NULL,
+        sets INTEGER NOT NULL,
+        reps INTEGER NOT NULL,
+        weight REAL NOT NULL
+    );
+    CREATE INDEX workouts_logged_at ON workouts (logged_at)
+    """,
+    # 4: expense splitter history
+    """
+    CREATE TABLE splits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT NOT NULL,
+        total REAL NOT NULL,
+        equal_share REAL NOT NULL
+    );
+    CREATE TABLE split_members (
+        split_id INTEGER NOT NULL REFERENCES splits (id) ON DELETE CASCADE,
+        name TEXT NOT NULL,
+        paid REAL NOT NULL,
+        balance REAL NOT NULL
+    );
+    CREATE TABLE settlements (
+        split_id INTEGER NOT NULL REFERENCES splits (id) ON DELETE CASCADE,
+        payer TEXT NOT NULL,
+        receiver TEXT NOT NULL,
+        amount REAL NOT NULL
+    );
+    CREATE INDEX split_members_split ON split_members (split_id);
+    CREATE INDEX settlements_split ON settlements (split_id)
+    """,
+]
+
+
+# ---------------------------
+# Storage
+# ---------------------------
+
+
+def connect(path, timeout: float = BUSY_TIMEOUT_SECS) -> sqlite3.Connection:
+    """A connection set up the way every pooled and writer connection is."""
+    # isolation_level=None: no implicit transactions, so BEGIN IMMEDIATE / COMMIT are explicit
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")  # durable at checkpoints; safe against corruption in WAL
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+class Storage:
+    """
+    Args:
+        path: the SQLite database file (created, with its folder, if missing).
+        pool_size: most reader connections kept open.
+        batch_size: most queued writes committed together.
+        legacy_water_csv: the CSV log the first migrations import, if it exists.
+    """
+
+    def __init__(self, path=DB_PATH, pool_size: int = POOL_SIZE, batch_size: int = BATCH_SIZE,
+                 legacy_water_csv=LEGACY_WATER_CSV):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.legacy_water_csv = legacy_water_csv
+        self._idle = queue.LifoQueue()  # the most recently used connection has the warmest cache
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._writes = queue.SimpleQueue()
+        self._writer_lock = threading.Lock()  # held by whichever caller is committing
+        self._writer_conn = connect(self.path)
+        self.migrate()
+
+    # --- schema ---
+
+    def migrate(self) -> int:
+        """Apply the migrations this database hasn't seen; returns its schema version."""
+        conn = self._writer_conn
+        for version, step in enumerate(MIGRATIONS, 1):
+            conn.execute("BEGIN IMMEDIATE")  # another process may be migrating the same file
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    conn.execute("COMMIT")
+                    continue
+                if callable(step):
+                    step(conn, self)
+                else:
+                    for statement in filter(None, (s.strip() for s in step.split(";"))):
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.execute("COMMIT")
+            except Exception as e:
+                conn.execute("ROLLBACK")
+                raise StorageError(f"migration {version} failed: {e}") from e
+        return len(MIGRATIONS)
+
+    # --- reads ---
+
+    @contextmanager
+    def connection(self):
+        """A pooled connection for reads (or an explicit transaction), returned to the pool after."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.pool_size
+                self._opened += can_open
+            conn = connect(self.path) if can_open else self._idle.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._idle.put(conn)
+
+    def query(self, sql: str, params=()) -> list:
+        """All rows (sqlite3.Row, so row["column"] works) of one SELECT."""
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def scalar(self, sql: str, params=()):
+        """The first column of the first row, or None."""
+        with self.connection() as conn:
+            row = conn.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    # --- writes ---
+
+    def run(self, fn):
+        """
+        Run fn(conn) in the next write batch and wait until it's committed; returns its result.
+        It gets its own savepoint: if it raises, only its own changes are rolled back.
+        """
+        future = Future()
+        self._writes.put((fn, future))
+        # whoever gets the writer commits everything queued so far, so a caller that waited for
+        # the lock usually finds its write already committed by the one before it
+        while not future.done():
+            with self._writer_lock:
+                if not future.done():
+                    self._commit(self._take_batch())
+        return future.result()
+
+    def write(self, sql: str, params=()) -> int:
+        """Run one INSERT/UPDATE/DELETE and wait until it's committed; returns lastrowid."""
+        return self.run(lambda conn: conn.execute(sql, params).lastrowid)
+
+    def write_many(self, sql: str, rows) -> int:
+        """executemany() as one write; returns the number of rows changed."""
+        rows = list(rows)
+        return self.run(lambda conn: conn.executemany(sql, rows).rowcount)
+
+    def _take_batch(self) -> list:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._writes.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch: list):
+        conn = self._writer_conn
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    outcomes.append((future, fn(conn), None))
+                    conn.execute("RELEASE write")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    outcomes.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:  # BEGIN or COMMIT failed: nothing in the batch was written
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in batch:
+                future.set_exception(StorageError(f"write not committed: {e}"))
+            return
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def close(self):
+        """Close every connection (writes in progress finish first)."""
+        with self._writer_lock:
+            self._writer_conn.close()
+        with self._lock:
+            while self._opened:
+                self._idle.get().close()
+                self._opened -= 1
+
+
+@_cache_resource
+def get_storage() -> Storage:
+    """The process-wide storage, shared by every session (one pool, one writer connection)."""
+    return Storage()
+
+
+# ---------------------------
+# Benchmark
+# ---------------------------
+
+
+TODAY_SQL = "SELECT COALESCE(SUM(ml), 0) FROM water_log WHERE timestamp BETWEEN ? AND ?"
+
+
+def _bench_csv(folder: Path):
+    # what the water tracker did: read the whole file, append a row, write the whole file back
+    path = folder / "water_log.csv"
+    path.write_text("timestamp,ml\n")
+
+    def read():
+        with open(path, newline="") as f:
+            return list(csv.DictReader(f))
+
+    def write(timestamp, ml):
+        rows = read()
+        rows.append({"timestamp": timestamp, "ml": ml})
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, ["timestamp", "ml"])
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def today(day):
+        return sum(int(r["ml"]) for r in read() if r["timestamp"].startswith(day))
+
+    return write, today, lambda: len(read()), lambda: None
+
+
+def _bench_connect_per_write(folder: Path):
+    # the usual first SQLite version: open a connection per call, default (rollback) journal
+    path = folder / "apps.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE water_log (id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, ml INTEGER)")
+        conn.execute("CREATE INDEX water_log_timestamp ON water_log (timestamp)")
+
+    def write(timestamp, ml):
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECS)
+        try:
+            with conn:
+                conn.execute("INSERT INTO water_log (timestamp, ml) VALUES (?, ?)", (timestamp, ml))
+        finally:
+            conn.close()
+
+    def today(day):
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECS)
+        try:
+            return conn.execute(TODAY_SQL, (f"{day}T00:00:00", f"{day}T23:59:59")).fetchone()[0]
+        finally:
+            conn.close()
+
+    def count():
+        with sqlite3.connect(path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM water_log").fetchone()[0]
+
+    return write, today, count, lambda: None
+
+
+def _bench_storage(folder: Path, batched: bool):
+    storage = Storage(folder / "apps.db", legacy_water_csv=None)
+    insert = "INSERT INTO water_log (timestamp, ml) VALUES (?, ?)"
+
+    def write_each(timestamp, ml):
+        # no group commit: every write is its own transaction on a pooled connection
+        with storage.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(insert, (timestamp, ml))
+            conn.execute("COMMIT")
+
+    def today(day):
+        return storage.scalar(TODAY_SQL, (f"{day}T00:00:00", f"{day}T23:59:59"))
+
+    write = (lambda timestamp, ml: storage.write(insert, (timestamp, ml))) if batched else write_each
+    return write, today, lambda: storage.scalar("SELECT COUNT(*) FROM water_log"), storage.close
+
+
+BENCH_MODES = [
+    ("CSV rewrite (old water tracker)", _bench_csv),
+    ("SQLite, connection per write", _bench_connect_per_write),
+    ("WAL pool, commit per write", lambda folder: _bench_storage(folder, batched=False)),
+    ("WAL pool, batched writes", lambda folder: _bench_storage(folder, batched=True)),
+]
+
+
+def run_bench(sessions: int, writes: int):
+    print(f"{sessions} sessions writing at once, {writes} writes each over the last year; every write "
+          f"is followed by a read of that day's total, as the app's rerun does\n")
+    print(f"{'storage':<34}{'writes/s':>9}{'p50 ms':>8}{'p95 ms':>8}{'errors':>8}{'stored':>8}{'lost':>6}")
+    now = datetime.now()
+    for label, setup in BENCH_MODES:
+        with tempfile.TemporaryDirectory() as folder:
+            write, today, count, close = setup(Path(folder))
+            latencies, errors = [], []
+            barrier = threading.Barrier(sessions)
+
+            def session(n):
+                barrier.wait()
+                for i in range(writes):
+                    day = (now - timedelta(days=(n * writes + i) % 365)).strftime("%Y-%m-%d")
+                    timestamp = f"{day}T{n % 24:02d}:{i % 60:02d}:{(n + i) % 60:02d}"
+                    start = time.perf_counter()
+                    try:
+                        write(timestamp, 250)
+                        today(day)
+                    except Exception as e:  # "database is locked", a half-written CSV, ...
+                        errors.append(e)
+                    latencies.append(time.perf_counter() - start)
+
+            threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            seconds = time.perf_counter() - start
+            stored = count()
+            close()
+        latencies.sort()
+        expected = sessions * writes
+        print(f"{label:<34}{expected / seconds:>9.0f}{latencies[len(latencies) // 2] * 1000:>8.1f}"
+              f"{latencies[int(len(latencies) * 0.95)] * 1000:>8.1f}{len(errors):>8}{stored:>8}"
+              f"{expected - stored:>6}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate or benchmark the shared app database")
+    parser.add_argument("--bench", action="store_true", help="concurrent writers against each storage")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--writes", type=int, default=40, help="writes per session")
+    args = parser.parse_args()
+
+    if args.bench:
+        run_bench(args.sessions, args.writes)
+        return
+    storage = Storage()
+    print(f"{storage.path}: schema version {storage.scalar('PRAGMA user_version')}")
+    for table in ("water_log", "workouts", "splits"):
+        print(f"  {table:<12}{storage.scalar(f'SELECT COUNT(*) FROM {table}'):>6} rows")
+    storage.close()
+
+
+if __name__ == "__main__":
+    main()
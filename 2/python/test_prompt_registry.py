@@ -0,0 +1,66 @@
+"""
+prompt_registry.py: checking templates, rendering, and skipping bad prompt files.
+
+    python -m pytest test_prompt_registry.py
+"""
+
+import pytest
+
+from prompt_registry import PromptError, PromptRegistry, compile_template
+
+
+def test_compile_and_render():
+    formatter, variables = compile_template("Hi {name}, {{literal}} {count:>3} {name!r}")
+    assert variables == {"name", "count"}
+    assert formatter({"name": "Ann", "count": 7}) == "Hi Ann, {literal}   7 'Ann'"
+
+
+@pytest.mark.parametrize("text", ["no fields, {{braces}}", "{name}", "Dear {name!s:>6}.", "{{{name}}}{count}{{",
+                                  "{name}{name} and {count:03d}"])
+def test_render_matches_format_map(text):
+    formatter, variables = compile_template(text)
+    assert formatter({"name": "Ann", "count": 7}) == text.format_map({"name": "Ann", "count": 7})
+    if variables:
+        with pytest.raises(KeyError):
+            formatter({})
+
+
+@pytest.mark.parametrize("text", ["{x!z}", "{0}", "{}", "{a.b}", "{x:{y}}", "{unclosed", 'JSON: {"x": 1}'])
+def test_bad_templates_raise_prompt_error(text):
+    with pytest.raises(PromptError):
+        compile_template(text)
+
+
+def test_missing_variables_are_named(tmp_path):
+    (tmp_path / "greet.txt").write_text("Hello {name} from {place}", encoding="utf-8")
+    registry = PromptRegistry(tmp_path, notebooks_dir=None)
+    with pytest.raises(PromptError, match=r"\['place'\]"):
+        registry.format("greet", name="Ann")
+
+
+def test_bad_prompt_file_is_skipped_and_reported(tmp_path):
+    (tmp_path / "good.txt").write_text("Summarize {text}", encoding="utf-8")
+    (tmp_path / "spec.txt").write_text('Reply with JSON like {"x": 1}', encoding="utf-8")
+    registry = PromptRegistry(tmp_path, notebooks_dir=None)
+    assert registry.names() == ["good"]
+    assert list(registry.errors) == [str(tmp_path / "spec.txt")]
+
+
+def test_half_edited_file_keeps_last_good_version(tmp_path):
+    path = tmp_path / "greet.txt"
+    path.write_text("Hello {name}", encoding="utf-8")
+    registry = PromptRegistry(tmp_path, notebooks_dir=None, check_every=0)
+    path.write_text("Hello {name", encoding="utf-8")
+    registry._mtimes[str(path)] = -1  # don't depend on the file system's mtime resolution
+    assert registry.format("greet", name="Ann") == "Hello Ann"
+    assert str(path) in registry.errors
+
+
+def test_json_chat_templates_load_and_bad_ones_are_reported(tmp_path):
+    (tmp_path / "rag.chat.json").write_text('{"messages": [["system", "Use {context}"], ["human", "{question}"]]}',
+                                            encoding="utf-8")
+    (tmp_path / "broken.json").write_text('{"messages": [["system"]]}', encoding="utf-8")
+    registry = PromptRegistry(tmp_path, notebooks_dir=None)
+    assert registry.names() == ["rag.chat"]
+    assert registry.get("rag.chat").format_messages(context="C", question="Q") == [("system", "Use C"), ("human", "Q")]
+    assert list(registry.errors) == [str(tmp_path / "broken.json")]
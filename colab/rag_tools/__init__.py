@@ -0,0 +1,9 @@
+"""
+Helper modules shared by the colab notebooks.
+
+The notebooks in `colab/` can import these directly (`from rag_tools... import ...`).
+Notebooks in `colab/RAG/` first add the parent folder to the path:
+
+    import sys
+    sys.path.append("..")
+"""
@@ -0,0 +1,203 @@
+"""
+Query-embedding cache and a batched query API for FAISS retrievers.
+
+`retriever.invoke(query)` embeds the query every time, even for repeats, and an
+evaluation run of hundreds of questions makes one embedding call and one FAISS
+search per question. Here:
+
+- `CachedQueryEmbeddings` keeps an LRU of query vectors and embeds all cache
+  misses of a batch in one `embed_documents` call
+- `BatchRetriever.batch_retrieve(queries)` embeds the whole batch at once and
+  runs a single `index.search` over all query vectors
+
+    from rag_tools.batched_retrieval import BatchRetriever
+    retriever = BatchRetriever.from_faiss(faiss_store, k=4)
+    retriever.invoke("France")                              # cached after the first call
+    results = retriever.batch_retrieve(["France", "Germany", "France"])
+
+Benchmark against looping `invoke`:
+
+    python -m rag_tools.batched_retrieval
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from rag_tools.hybrid_search import FaissRows
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Wrap an `Embeddings` with an LRU cache of query vectors."""
+
+    def __init__(self, embeddings, max_size=10000):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, text):
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+            return vector
+
+    def _put(self, text, vector):
+        with self._lock:
+            self._cache[text] = vector
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        vector = self._get(text)
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+            vector = list(self.embeddings.embed_query(text))
+            self._put(text, vector)
+        return vector
+
+    def embed_queries(self, texts):
+        """Embed many queries: cached ones are reused, the rest go out in one batch call."""
+        vectors = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            vector = self._get(text)
+            if vector is None:
+                missing.append(text)
+            else:
+                vectors[text] = vector
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            for text, vector in zip(missing, self.embeddings.embed_documents(missing)):
+                vectors[text] = list(vector)
+                self._put(text, vectors[text])
+        return [vectors[text] for text in texts]
+
+
+class BatchRetriever(BaseRetriever):
+    """FAISS retriever with a query-embedding cache and a batched `batch_retrieve`."""
+
+    index: object  # faiss index
+    documents: object  # row -> Document
+    embeddings: object  # CachedQueryEmbeddings
+    k: int = 4
+    normalize_L2: bool = False
+
+    @classmethod
+    def from_faiss(cls, vector_store, k=4, cache_size=10000):
+        embedding = vector_store.embedding_function
+        if not isinstance(embedding, Embeddings):
+            raise TypeError("BatchRetriever needs a FAISS store built with an Embeddings object")
+        return cls(
+            index=vector_store.index,
+            documents=FaissRows(vector_store),
+            embeddings=CachedQueryEmbeddings(embedding, cache_size),
+            k=k,
+            normalize_L2=getattr(vector_store, "_normalize_L2", False),
+        )
+
+    def _search(self, vectors):
+        import faiss
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if self.normalize_L2:
+            faiss.normalize_L2(matrix)
+        _, rows = self.index.search(matrix, self.k)
+        return [[self.documents[row] for row in row_ids if row != -1] for row_ids in rows]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self._search([self.embeddings.embed_query(query)])[0]
+
+    def batch_retrieve(self, queries):
+        """Documents for every query: one embedding call for the cache misses, one FAISS search."""
+        queries = list(queries)
+        if not queries:
+            return []
+        return self._search(self.embeddings.embed_queries(queries))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import faiss
+    from langchain_core.documents import Document
+
+    from rag_tools.embedding_pipeline import EmbeddingPipeline
+    from rag_tools.fakes import HashingBackend
+
+    parser = argparse.ArgumentParser(description="Looping invoke vs batch_retrieve")
+    parser.add_argument("--docs", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--unique", type=int, default=200, help="distinct questions among the queries")
+    args = parser.parse_args()
+
+    # the stand-in model pays a fixed cost per call, like a real model's per-batch overhead
+    class SlowCallEmbeddings(EmbeddingPipeline):
+        def embed_documents(self, texts):
+            time.sleep(0.005)
+            return super().embed_documents(texts)
+
+        def embed_query(self, text):
+            time.sleep(0.005)
+            return super().embed_query(text)
+
+    embeddings = SlowCallEmbeddings(HashingBackend(seconds_per_token=1e-5))
+    rng = np.random.default_rng(0)
+    words = [f"term{i}" for i in range(2000)]
+    texts = [" ".join(rng.choice(words, size=30)) for _ in range(args.docs)]
+    doc_vectors = np.asarray(HashingBackend().encode(HashingBackend().tokenize(texts)), dtype=np.float32)
+    index = faiss.IndexFlatL2(384)
+    index.add(doc_vectors)
+    documents = [Document(page_content=t) for t in texts]
+    questions = [" ".join(rng.choice(words, size=8)) for _ in range(args.unique)]
+    queries = [questions[i] for i in rng.integers(0, args.unique, size=args.queries)]
+
+    def plain_invoke(query):
+        _, rows = index.search(np.asarray([embeddings.embed_query(query)], dtype=np.float32), 4)
+        return [documents[r] for r in rows[0]]
+
+    start = time.perf_counter()
+    looped = [plain_invoke(q) for q in queries]
+    seconds = time.perf_counter() - start
+    print(f"loop invoke (no cache):  {args.queries / seconds:8.1f} queries/s")
+
+    retriever = BatchRetriever(index=index, documents=documents, embeddings=CachedQueryEmbeddings(embeddings), k=4)
+    start = time.perf_counter()
+    for q in queries:
+        retriever.invoke(q)
+    seconds = time.perf_counter() - start
+    print(f"loop invoke (LRU cache): {args.queries / seconds:8.1f} queries/s")
+
+    retriever = BatchRetriever(index=index, documents=documents, embeddings=CachedQueryEmbeddings(embeddings), k=4)
+    start = time.perf_counter()
+    batched = retriever.batch_retrieve(queries)
+    seconds = time.perf_counter() - start
+    print(f"batch_retrieve (cold):   {args.queries / seconds:8.1f} queries/s")
+    start = time.perf_counter()
+    retriever.batch_retrieve(queries)
+    seconds = time.perf_counter() - start
+    print(f"batch_retrieve (warm):   {args.queries / seconds:8.1f} queries/s")
+
+    # batched FAISS search may order documents at equal distance differently, so compare distances
+    row_of = {text: row for row, text in enumerate(texts)}
+
+    def distances(query, docs):
+        q = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        return np.sort([np.sum((doc_vectors[row_of[d.page_content]] - q) ** 2) for d in docs])
+
+    same = all(np.allclose(distances(q, a), distances(q, b), atol=1e-5) for q, a, b in zip(queries, looped, batched))
+    print(f"same results (up to ties): {same}")
@@ -0,0 +1,270 @@
+"""
+Compact on-disk vector store: 8-bit or float16 vectors plus a memory-mapped text blob.
+
+`faiss_store/` keeps float32 vectors, and `index.pkl` pickles the whole docstore
+(page text and metadata) as Python objects. Loading it unpickles every document
+up front. The compact format writes:
+
+- `codes.npy`: vectors as int8 scalar-quantized codes (per-dimension min/step,
+  like FAISS `QT_8bit`, 4x smaller) or float16 (2x smaller)
+- `quant.npy`: the per-dimension base and step for int8, and `norms.npy`: the
+  squared norms of the decoded vectors (for L2 search)
+- `texts.bin` and `metadata.bin`: UTF-8 page text and JSON metadata, one record
+  after another; `offsets.npy` holds the (n + 1, 2) start offsets into each
+
+Everything is memory-mapped on load, so opening a store is near-instant. Only
+the pages of codes and text that a query touches are read. Search is exact
+over the decoded vectors, done block by block so memory stays bounded.
+`CompactStore` has the same `search` / row-lookup interface as a FAISS index
+and `FaissRows`, so `BatchRetriever` and the retrieval service work on it
+unchanged.
+
+    from rag_tools.compact_store import CompactStore
+    CompactStore.from_faiss(faiss_store, "faiss_store_int8", dtype="int8")
+    store = CompactStore.load("faiss_store_int8")
+    retriever = store.as_retriever(embeddings, k=4)
+
+Recall vs float32, size and load time:
+
+    python -m rag_tools.compact_store --docs 200000
+"""
+
+import json
+import mmap
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag_tools.batched_retrieval import BatchRetriever, CachedQueryEmbeddings
+from rag_tools.hybrid_search import FaissRows
+
+DTYPES = ("int8", "float16")
+SEARCH_BLOCK = 65536  # rows decoded to float32 at a time
+
+
+def _map(path):
+    """Read-only mmap of a file (an empty file maps to b"")."""
+    with open(path, "rb") as f:
+        if not f.seek(0, 2):
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def quantize(vectors, dtype="int8"):
+    """Return (codes, base, step); a vector is decoded as base + step * code."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    dim = vectors.shape[1]
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.zeros(dim, np.float32), np.ones(dim, np.float32)
+    if dtype != "int8":
+        raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+    vmin = vectors.min(axis=0) if len(vectors) else np.zeros(dim, np.float32)
+    vmax = vectors.max(axis=0) if len(vectors) else np.zeros(dim, np.float32)
+    step = np.maximum(vmax - vmin, 1e-12) / 255
+    codes = np.clip(np.rint((vectors - vmin) / step) - 128, -128, 127).astype(np.int8)
+    return codes, (vmin + 128 * step).astype(np.float32), step.astype(np.float32)
+
+
+class CompactStore:
+    """Memory-mapped quantized vectors + documents. Rows are in the order they were written."""
+
+    def __init__(self, codes, base, step, norms, texts, metadata, offsets, metric="l2", normalize_L2=False):
+        self.codes = codes  # int8 or float16 [n, dim]
+        self.base = base  # float32[dim]
+        self.step = step  # float32[dim]
+        self.norms = norms  # float32[n], squared norms of the decoded vectors
+        self.texts = texts  # bytes-like blob
+        self.metadata = metadata  # bytes-like blob of JSON objects
+        self.offsets = offsets  # int64[n + 1, 2]: (text, metadata) start offsets
+        self.metric = metric  # "l2" (FAISS default) or "ip"
+        self.normalize_L2 = normalize_L2
+
+    @property
+    def ntotal(self):
+        return len(self.codes)
+
+    @property
+    def d(self):
+        return self.codes.shape[1]
+
+    @staticmethod
+    def write(folder, vectors, documents, dtype="int8", metric="l2", normalize_L2=False):
+        """Write vectors (float32 [n, dim]) and their documents in the compact format."""
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if normalize_L2:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if len(documents) != len(vectors):
+            raise ValueError(f"{len(vectors)} vectors but {len(documents)} documents")
+        codes, base, step = quantize(vectors, dtype)
+
+        norms = np.empty(len(codes), np.float32)
+        for start in range(0, len(codes), SEARCH_BLOCK):
+            decoded = base + step * codes[start : start + SEARCH_BLOCK].astype(np.float32)
+            norms[start : start + SEARCH_BLOCK] = np.einsum("ij,ij->i", decoded, decoded)
+
+        offsets = np.zeros((len(codes) + 1, 2), np.int64)
+        with open(folder / "texts.bin", "wb") as texts, open(folder / "metadata.bin", "wb") as metadata:
+            for row, doc in enumerate(documents):
+                text = doc.page_content.encode("utf-8")
+                meta = json.dumps(doc.metadata, ensure_ascii=False, default=str).encode("utf-8")
+                texts.write(text)
+                metadata.write(meta)
+                offsets[row + 1] = offsets[row] + (len(text), len(meta))
+
+        np.save(folder / "codes.npy", codes)
+        np.save(folder / "quant.npy", np.stack([base, step]))
+        np.save(folder / "norms.npy", norms)
+        np.save(folder / "offsets.npy", offsets)
+        (folder / "manifest.json").write_text(
+            json.dumps({"dtype": dtype, "metric": metric, "normalize_L2": normalize_L2, "count": len(codes)})
+        )
+
+    @classmethod
+    def from_faiss(cls, vector_store, folder, dtype="int8"):
+        """Convert a LangChain FAISS store (flat index) and return the loaded compact store."""
+        index = vector_store.index
+        vectors = index.reconstruct_n(0, index.ntotal)
+        strategy = getattr(vector_store, "distance_strategy", None)
+        metric = "l2" if getattr(strategy, "value", strategy) in ("EUCLIDEAN_DISTANCE", None) else "ip"
+        normalize_L2 = getattr(vector_store, "_normalize_L2", False)
+        cls.write(folder, vectors, FaissRows(vector_store), dtype, metric, normalize_L2)
+        return cls.load(folder)
+
+    @classmethod
+    def load(cls, folder):
+        folder = Path(folder)
+        manifest = json.loads((folder / "manifest.json").read_text())
+        base, step = np.load(folder / "quant.npy")
+        return cls(
+            np.load(folder / "codes.npy", mmap_mode="r"), base, step,
+            np.load(folder / "norms.npy", mmap_mode="r"),
+            _map(folder / "texts.bin"), _map(folder / "metadata.bin"),
+            np.load(folder / "offsets.npy", mmap_mode="r"),
+            manifest["metric"], manifest["normalize_L2"],
+        )
+
+    def __len__(self):
+        return self.ntotal
+
+    def __getitem__(self, row):
+        (t0, m0), (t1, m1) = self.offsets[int(row)], self.offsets[int(row) + 1]
+        return Document(
+            page_content=bytes(self.texts[t0:t1]).decode("utf-8"),
+            metadata=json.loads(bytes(self.metadata[m0:m1])),
+        )
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+    def search(self, queries, k):
+        """FAISS-style search: returns (distances or scores [nq, k], rows [nq, k]), -1 rows when n < k."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.normalize_L2:
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        nq = len(queries)
+        # q . (base + step * c) = q . base + (q * step) . c
+        scaled = queries * self.step
+        constant = queries @ self.base
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+
+        best_scores = np.empty((nq, 0), np.float32)  # higher is better
+        best_rows = np.empty((nq, 0), np.int64)
+        for start in range(0, self.ntotal, SEARCH_BLOCK):
+            codes = self.codes[start : start + SEARCH_BLOCK].astype(np.float32)
+            scores = scaled @ codes.T + constant[:, None]
+            if self.metric == "l2":
+                scores = -(query_norms[:, None] - 2 * scores + self.norms[start : start + len(codes)])
+            rows = np.broadcast_to(np.arange(start, start + len(codes)), scores.shape)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, rows], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        missing = k - best_rows.shape[1]
+        if missing > 0:
+            best_scores = np.pad(best_scores, ((0, 0), (0, missing)), constant_values=-np.inf)
+            best_rows = np.pad(best_rows, ((0, 0), (0, missing)), constant_values=-1)
+        distances = -best_scores if self.metric == "l2" else best_scores
+        return distances.astype(np.float32), best_rows
+
+    def as_retriever(self, embeddings, k=4, cache_size=10000):
+        return BatchRetriever(
+            index=self, documents=self, embeddings=CachedQueryEmbeddings(embeddings, cache_size), k=k
+        )
+
+
+def recall_at_k(exact_rows, approx_rows):
+    """Mean fraction of the exact top-k rows that the approximate search also returned."""
+    hits = [len(set(a) & set(b)) for a, b in zip(exact_rows.tolist(), approx_rows.tolist())]
+    return sum(hits) / exact_rows.size
+
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+    import shutil
+    import tempfile
+    import time
+
+    import faiss
+
+    parser = argparse.ArgumentParser(description="Recall, size and load time: float32 + pickle vs compact stores")
+    parser.add_argument("--docs", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    # clustered unit vectors, closer to sentence embeddings than isotropic noise
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((256, args.dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, 256, args.docs)] + 0.6 * rng.standard_normal((args.docs, args.dim))
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+    queries = vectors[rng.integers(0, args.docs, args.queries)] + 0.1 * rng.standard_normal((args.queries, args.dim))
+    queries = queries.astype(np.float32)
+    documents = [Document(page_content=f"chunk {i} " + "lorem ipsum " * 40, metadata={"page": i % 300})
+                 for i in range(args.docs)]
+
+    workdir = Path(tempfile.mkdtemp())
+    try:
+        index = faiss.IndexFlatL2(args.dim)
+        index.add(vectors)
+        faiss.write_index(index, str(workdir / "index.faiss"))
+        with open(workdir / "index.pkl", "wb") as f:
+            pickle.dump(({str(i): d for i, d in enumerate(documents)}, {i: str(i) for i in range(args.docs)}), f)
+        baseline_bytes = (workdir / "index.faiss").stat().st_size + (workdir / "index.pkl").stat().st_size
+
+        start = time.perf_counter()
+        index = faiss.read_index(str(workdir / "index.faiss"))
+        with open(workdir / "index.pkl", "rb") as f:
+            pickle.load(f)
+        baseline_load = time.perf_counter() - start
+        _, exact = index.search(queries, args.k)
+        print(f"{'format':<18} {'size MB':>8} {'load ms':>8} {'query ms':>9} {'recall@' + str(args.k):>10}")
+        print(f"{'float32 + pickle':<18} {baseline_bytes / 2**20:>8.1f} {baseline_load * 1000:>8.1f} "
+              f"{'':>9} {1.0:>10.4f}")
+
+        for dtype in DTYPES:
+            folder = workdir / dtype
+            CompactStore.write(folder, vectors, documents, dtype=dtype)
+            size = sum(p.stat().st_size for p in folder.iterdir())
+            start = time.perf_counter()
+            store = CompactStore.load(folder)
+            load = time.perf_counter() - start
+            start = time.perf_counter()
+            _, rows = store.search(queries, args.k)
+            query_ms = (time.perf_counter() - start) * 1000 / args.queries
+            assert store[int(rows[0, 0])].page_content == documents[int(rows[0, 0])].page_content
+            print(f"{dtype:<18} {size / 2**20:>8.1f} {load * 1000:>8.1f} {query_ms:>9.2f} "
+                  f"{recall_at_k(exact, rows):>10.4f}")
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,207 @@
+"""
+Context packing: dedupe, merge and budget retrieved chunks before prompt assembly.
+
+`format_docs` joins every retrieved chunk and `corrective_rag` passes the raw
+document list into `{context}`. Chunks cut with `chunk_overlap` repeat the
+same text, and the same passage often appears on several pages, so prompts
+carry many duplicate tokens. `ContextPacker`:
+
+1. merges chunks that overlap or touch (by `start_index`/`end_index` metadata
+   when present, otherwise by a shared suffix/prefix), until no two kept chunks join
+2. drops near-duplicates using MinHash signatures over word shingles, then
+   merges again, since the survivors can now be neighbours
+3. packs the remaining chunks greedily, best ranked first, into a token budget
+
+    from rag_tools.context_packing import ContextPacker
+    packer = ContextPacker(max_tokens=1500)
+    qa = {"context": retriever | packer.pack_text, "question": RunnablePassthrough()} | prompt | llm
+    print(packer.last_report)  # tokens saved for the last query
+"""
+
+import re
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+from langchain_core.documents import Document
+
+_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+_OFFSET_KEYS = frozenset({"start_index", "end_index", "start_token", "end_token"})
+
+
+def _tiktoken_counter(encoding_name="cl100k_base"):
+    from rag_tools.token_splitter import get_encoding
+
+    encoding = get_encoding(encoding_name)
+    return lambda text: len(encoding.encode_ordinary(text))
+
+
+class MinHasher:
+    """MinHash signatures over word n-gram shingles (estimates Jaccard similarity)."""
+
+    def __init__(self, num_perm=64, shingle_size=3, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, size=num_perm, dtype=np.int64)
+        self.b = rng.integers(0, _PRIME, size=num_perm, dtype=np.int64)
+        self.shingle_size = shingle_size
+
+    def signature(self, text):
+        words = _WORD_RE.findall(text.lower())
+        n = self.shingle_size
+        shingles = {" ".join(words[i : i + n]) for i in range(max(1, len(words) - n + 1))}
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.int64)
+        return ((np.outer(hashes, self.a) + self.b) % _PRIME).min(axis=0)
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        return float(np.mean(sig_a == sig_b))
+
+
+@dataclass
+class PackReport:
+    input_chunks: int = 0
+    merged: int = 0
+    duplicates: int = 0
+    over_budget: int = 0
+    output_chunks: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    @property
+    def tokens_saved(self):
+        return self.tokens_before - self.tokens_after
+
+    def __str__(self):
+        return (
+            f"{self.input_chunks} -> {self.output_chunks} chunks "
+            f"({self.merged} merged, {self.duplicates} near-duplicates, {self.over_budget} over budget), "
+            f"{self.tokens_before} -> {self.tokens_after} tokens (saved {self.tokens_saved})"
+        )
+
+
+def _suffix_prefix_overlap(a, b, min_overlap):
+    """Length of the longest suffix of `a` that is a prefix of `b` (0 if shorter than min_overlap)."""
+    head = b[:min_overlap]
+    if len(head) < min_overlap:
+        return 0
+    # only positions where b's first characters occur in `a` can start an overlap
+    pos = a.find(head)
+    while pos != -1:
+        if len(a) - pos <= len(b) and b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(head, pos + 1)
+    return 0
+
+
+class ContextPacker:
+    """
+    Args:
+        max_tokens: token budget for the packed context.
+        dedup_threshold: estimated Jaccard similarity above which a chunk is a near-duplicate.
+        min_overlap_chars: shortest shared suffix/prefix treated as chunk overlap.
+        count_tokens: text -> token count (defaults to tiktoken cl100k_base).
+        separator: joins chunks in `pack_text`.
+    """
+
+    def __init__(self, max_tokens=2000, dedup_threshold=0.8, min_overlap_chars=30, count_tokens=None,
+                 separator="\n\n", hasher=None):
+        self.max_tokens = max_tokens
+        self.dedup_threshold = dedup_threshold
+        self.min_overlap_chars = min_overlap_chars
+        self.count_tokens = count_tokens or _tiktoken_counter()
+        self.separator = separator
+        self.hasher = hasher or MinHasher()
+        self.last_report = PackReport()
+
+    def _join(self, a, b):
+        return self._try_merge(a, b) or self._try_merge(b, a)
+
+    def _merge_adjacent(self, docs, report):
+        """Merge overlapping/touching chunks into the better-ranked one. `docs` is in rank order."""
+        merged = []
+        for doc in docs:
+            i = next((i for i, kept in enumerate(merged) if self._join(kept, doc) is not None), None)
+            if i is None:
+                merged.append(doc)
+                continue
+            merged[i] = self._join(merged[i], doc)
+            report.merged += 1
+            # the grown chunk may now bridge the gap to another kept chunk (1 and 3, joined by 2)
+            while True:
+                j = next((j for j, kept in enumerate(merged) if j != i and self._join(merged[i], kept) is not None),
+                         None)
+                if j is None:
+                    break
+                first, second = min(i, j), max(i, j)
+                merged[first] = self._join(merged[first], merged[second])
+                del merged[second]
+                report.merged += 1
+                i = first
+        return merged
+
+    def _try_merge(self, first, second):
+        """Return `first` followed by `second` with the overlap removed, or None if they don't join."""
+        m1, m2 = first.metadata, second.metadata
+        if "start_index" in m1 and "end_index" in m1 and "start_index" in m2 and "end_index" in m2:
+            # offsets are per text (e.g. per PDF page), so everything else has to match: source, page, ...
+            if {k: v for k, v in m1.items() if k not in _OFFSET_KEYS} != \
+                    {k: v for k, v in m2.items() if k not in _OFFSET_KEYS}:
+                return None
+            if not m1["start_index"] <= m2["start_index"] <= m1["end_index"]:
+                return None
+            # take the part of `second` past `first`'s end, counted from the end of its real text:
+            # a stripped chunk is shorter than its offsets, and the cut must not move with that
+            beyond = m2["end_index"] - m1["end_index"]
+            tail = second.page_content[-beyond:] if beyond > 0 else ""  # <= 0: `second` lies inside `first`
+            metadata = {**m1, "end_index": max(m1["end_index"], m2["end_index"])}
+            if "end_token" in m1 and "end_token" in m2:
+                metadata["end_token"] = max(m1["end_token"], m2["end_token"])
+            return Document(page_content=first.page_content + tail, metadata=metadata)
+        overlap = _suffix_prefix_overlap(first.page_content, second.page_content, self.min_overlap_chars)
+        if not overlap:
+            return None
+        return Document(page_content=first.page_content + second.page_content[overlap:], metadata=dict(m1))
+
+    def _drop_near_duplicates(self, docs, report):
+        kept, signatures = [], []
+        for doc in docs:
+            sig = self.hasher.signature(doc.page_content)
+            if any(self.hasher.similarity(sig, other) >= self.dedup_threshold for other in signatures):
+                report.duplicates += 1
+                continue
+            kept.append(doc)
+            signatures.append(sig)
+        return kept
+
+    def pack(self, docs):
+        """Return the packed list of Documents (rank order kept); details in `last_report`."""
+        docs = list(docs)
+        report = PackReport(input_chunks=len(docs))
+        report.tokens_before = self.count_tokens(self.separator.join(d.page_content for d in docs))
+
+        docs = self._merge_adjacent(docs, report)
+        docs = self._drop_near_duplicates(docs, report)
+        docs = self._merge_adjacent(docs, report)
+
+        packed, used = [], 0
+        sep_tokens = self.count_tokens(self.separator)
+        for doc in docs:
+            cost = self.count_tokens(doc.page_content) + (sep_tokens if packed else 0)
+            if used + cost > self.max_tokens:
+                # a smaller, lower-ranked chunk may still fit
+                report.over_budget += 1
+                continue
+            packed.append(doc)
+            used += cost
+
+        report.output_chunks = len(packed)
+        report.tokens_after = self.count_tokens(self.separator.join(d.page_content for d in packed))
+        self.last_report = report
+        return packed
+
+    def pack_text(self, docs):
+        """Pack and join into one string, ready for a `{context}` prompt variable."""
+        return self.separator.join(doc.page_content for doc in self.pack(docs))
+
+    __call__ = pack_text
@@ -0,0 +1,373 @@
+"""
+Evaluation and latency benchmark for the RAG pipelines in the notebooks.
+
+Runs one labelled question set through the LCEL chain, `self_rag`,
+`corrective_rag` and fusion RAG, all built on the same corpus, retriever and
+LLM, and records for every query:
+
+- per-stage time: query embedding, retrieval, LLM, parsing (setup stages
+  load / split / embed / index are timed once for the corpus)
+- prompt and completion tokens, LLM calls
+- whether the retrieved chunks contain one of the labelled answers (recall)
+
+`BenchmarkReport` summarises this per pipeline (p50 / p95 / mean latency,
+mean stage times, tokens, recall), writes it as JSON and compares it with a
+previous report, so regressions show up run over run. By default everything
+is local and deterministic: a generated corpus, the hashing embedding
+stand-in and `FakeLLM` with a fixed latency.
+
+    python -m rag_tools.evaluation --out eval_report.json
+    python -m rag_tools.evaluation --baseline eval_report.json   # flag regressions
+
+With real data: `--corpus <folder of .txt files> --questions questions.json`,
+where the JSON is a list of {"question": ..., "answers": [...]}.
+
+Stage times inside fusion RAG overlap (its map calls run concurrently), so
+their sum can exceed the query latency.
+"""
+
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import numpy as np
+from langchain_core.messages import get_buffer_string
+from langchain_core.prompt_values import PromptValue
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableLambda
+
+from rag_tools.fakes import WORD_RE
+
+QUERY_STAGES = ("embed_query", "retrieve", "llm", "parse")
+
+_record = ContextVar("evaluation_record", default=None)  # QueryRecord of the query being run
+_answers = ContextVar("evaluation_answers", default=())  # its labelled answers
+
+
+def count_words(text):
+    """Default token count: words and punctuation (pass a tiktoken counter for real token counts)."""
+    return len(WORD_RE.findall(text))
+
+
+def _as_text(value):
+    if isinstance(value, PromptValue):
+        return value.to_string()
+    if isinstance(value, list):
+        return get_buffer_string(value)
+    return getattr(value, "content", value)
+
+
+@dataclass
+class EvalQuestion:
+    question: str
+    answers: list  # strings, any of which in a retrieved chunk counts as a hit
+
+
+@dataclass
+class QueryRecord:
+    pipeline: str
+    question: str
+    seconds: float = 0.0
+    stages: dict = field(default_factory=dict)
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retrieved: bool = False
+    hit: bool = False
+    answer: str = ""
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+class _Stage:
+    """Time a block against the query currently being evaluated (no-op outside a query)."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return _record.get()
+
+    def __exit__(self, *exc):
+        record = _record.get()
+        if record is not None:
+            record.add(self.name, time.perf_counter() - self.start)
+
+
+class TimedRetriever(BaseRetriever):
+    """Dense retriever over a FAISS index that books query embedding and search time separately."""
+
+    index: object
+    documents: list
+    embeddings: object
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        with _Stage("embed_query"):
+            vector = np.asarray([self.embeddings.embed_query(query)], dtype=np.float32)
+        with _Stage("retrieve") as record:
+            _, rows = self.index.search(vector, self.k)
+            documents = [self.documents[row] for row in rows[0] if row != -1]
+            if record is not None:
+                record.retrieved = True
+                record.hit = record.hit or any(
+                    answer in doc.page_content for doc in documents for answer in _answers.get()
+                )
+        return documents
+
+
+def timed_llm(llm, count_tokens=count_words):
+    """Wrap an LLM / chat model so calls, time and tokens are booked on the current query."""
+
+    def account(record, prompt, reply, seconds):
+        if record is not None:
+            record.add("llm", seconds)
+            record.llm_calls += 1
+            record.prompt_tokens += count_tokens(_as_text(prompt))
+            record.completion_tokens += count_tokens(_as_text(reply))
+
+    def call(prompt):
+        start = time.perf_counter()
+        reply = llm.invoke(prompt)
+        account(_record.get(), prompt, reply, time.perf_counter() - start)
+        return reply
+
+    async def acall(prompt):
+        start = time.perf_counter()
+        reply = await llm.ainvoke(prompt)
+        account(_record.get(), prompt, reply, time.perf_counter() - start)
+        return reply
+
+    return RunnableLambda(call, afunc=acall, name="llm")
+
+
+def timed_parser(parser):
+    def parse(value):
+        with _Stage("parse"):
+            return parser.invoke(value)
+
+    return RunnableLambda(parse, name="parser")
+
+
+def build_pipelines(retriever, llm, parser, marker="TNT", fusion_concurrency=4):
+    """
+    The four notebook pipelines over shared components. Each value is a
+    coroutine function question -> answer text.
+    """
+    from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+    from langchain_core.runnables import RunnablePassthrough
+
+    from rag_tools.map_reduce import FusionRAG
+
+    def format_docs(docs):
+        return "\n\n".join(doc.page_content for doc in docs)
+
+    prompt = PromptTemplate.from_template(
+        "Answer the question based only on the following context:\n{context}\n\nQuestion: {question}"
+    )
+    lcel = {"context": retriever | format_docs, "question": RunnablePassthrough()} | prompt | llm | parser
+    corrective = PromptTemplate.from_template(
+        "You previously answered the question:\n\nAnswer: {first_answer}\n\n"
+        "But here is additional retrieved context that may change or improve the response:\n\n"
+        "Context: {context}\n\nRewrite your answer using the retrieved context."
+    )
+    fusion = FusionRAG(
+        retriever,
+        llm,
+        ChatPromptTemplate.from_template("Extract what answers '{question}' from this document:\n{document}"),
+        ChatPromptTemplate.from_template("Fuse these notes into one answer:\n{summaries}"),
+        max_concurrency=fusion_concurrency,
+    )
+
+    async def lcel_chain(question):
+        return await lcel.ainvoke(question)
+
+    async def self_rag(question):
+        first_answer = await (llm | parser).ainvoke(question)
+        if marker not in first_answer:
+            return await lcel.ainvoke(question)
+        return first_answer
+
+    async def corrective_rag(question):
+        first_answer, context = await asyncio.gather((llm | parser).ainvoke(question), lcel.ainvoke(question))
+        return await (corrective | llm | parser).ainvoke({"first_answer": first_answer, "context": context})
+
+    async def fusion_rag(question):
+        return (await fusion.ainvoke(question)).answer
+
+    return {"lcel": lcel_chain, "self_rag": self_rag, "corrective_rag": corrective_rag, "fusion_rag": fusion_rag}
+
+
+@dataclass
+class BenchmarkReport:
+    setup: dict = field(default_factory=dict)  # setup stage -> seconds
+    records: list = field(default_factory=list)  # QueryRecord
+
+    def summary(self):
+        out = {}
+        for name in dict.fromkeys(r.pipeline for r in self.records):
+            records = [r for r in self.records if r.pipeline == name]
+            latencies = np.array([r.seconds for r in records]) * 1000
+            retrieved = [r for r in records if r.retrieved]
+            out[name] = {
+                "queries": len(records),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "mean_ms": float(latencies.mean()),
+                "stage_ms": {s: float(np.mean([r.stages.get(s, 0.0) for r in records]) * 1000) for s in QUERY_STAGES},
+                "llm_calls": float(np.mean([r.llm_calls for r in records])),
+                "prompt_tokens": float(np.mean([r.prompt_tokens for r in records])),
+                "completion_tokens": float(np.mean([r.completion_tokens for r in records])),
+                "retrieval_rate": len(retrieved) / len(records),
+                "recall": sum(r.hit for r in retrieved) / len(retrieved) if retrieved else None,
+            }
+        return out
+
+    def to_dict(self):
+        return {
+            "setup_ms": {stage: seconds * 1000 for stage, seconds in self.setup.items()},
+            "pipelines": self.summary(),
+            "records": [asdict(r) for r in self.records],
+        }
+
+    def save(self, path):
+        Path(path).write_text(json.dumps(self.to_dict(), indent=1))
+
+    def table(self):
+        lines = ["setup: " + ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in self.setup.items())]
+        header = f"{'pipeline':<16}{'p50 ms':>9}{'p95 ms':>9}" + "".join(f"{s:>12}" for s in QUERY_STAGES)
+        lines.append(header + f"{'calls':>7}{'tok in':>8}{'tok out':>8}{'recall':>8}")
+        for name, s in self.summary().items():
+            recall = "-" if s["recall"] is None else f"{s['recall']:.2f}"
+            lines.append(
+                f"{name:<16}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}"
+                + "".join(f"{s['stage_ms'][stage]:>12.2f}" for stage in QUERY_STAGES)
+                + f"{s['llm_calls']:>7.1f}{s['prompt_tokens']:>8.0f}{s['completion_tokens']:>8.0f}{recall:>8}"
+            )
+        return "\n".join(lines)
+
+
+def compare_reports(baseline, current, tolerance=0.10):
+    """
+    Regressions of `current` against `baseline` (report dicts as saved by
+    `BenchmarkReport.save`): latency up or recall/tokens moved by more than `tolerance`.
+    """
+    problems = []
+    for name, now in current["pipelines"].items():
+        before = baseline.get("pipelines", {}).get(name)
+        if before is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "prompt_tokens", "llm_calls"):
+            if before[key] and now[key] > before[key] * (1 + tolerance):
+                problems.append(f"{name}: {key} {before[key]:.1f} -> {now[key]:.1f}")
+        if before["recall"] is not None and now["recall"] is not None and now["recall"] < before["recall"] - tolerance:
+            problems.append(f"{name}: recall {before['recall']:.2f} -> {now['recall']:.2f}")
+    return problems
+
+
+async def arun_benchmark(pipelines, questions, setup=None):
+    """Run every question through every pipeline, one query at a time so latencies don't interfere."""
+    report = BenchmarkReport(setup=dict(setup or {}))
+    for name, pipeline in pipelines.items():
+        for item in questions:
+            record = QueryRecord(pipeline=name, question=item.question)
+            token, answers_token = _record.set(record), _answers.set(tuple(item.answers))
+            start = time.perf_counter()
+            try:
+                record.answer = str(await pipeline(item.question))
+            finally:
+                record.seconds = time.perf_counter() - start
+                _record.reset(token)
+                _answers.reset(answers_token)
+            report.records.append(record)
+    return report
+
+
+def build_corpus(texts, embeddings, k=4, chunk_size=500, chunk_overlap=50):
+    """Split, embed and index raw texts. Returns (TimedRetriever, setup stage timings minus load)."""
+    import faiss
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    setup = {}
+    start = time.perf_counter()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
+    documents = splitter.create_documents(texts)
+    setup["split"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents([d.page_content for d in documents]), dtype=np.float32)
+    setup["embed"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    setup["index"] = time.perf_counter() - start
+    return TimedRetriever(index=index, documents=documents, embeddings=embeddings, k=k), setup
+
+
+def synthetic_corpus(folder, n_files=20, facts_per_file=25, seed=0):
+    """Write text files with labelled facts; returns the EvalQuestions that ask for them."""
+    rng = np.random.default_rng(seed)
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    filler = "The platform team reviewed the rollout plan and the partner contracts in detail. "
+    questions = []
+    for f in range(n_files):
+        lines = []
+        for i in range(facts_per_file):
+            entity, code = f"module{f}x{i}", f"K{rng.integers(100000, 999999)}"
+            lines.append(f"{filler * int(rng.integers(0, 2))}The {entity} release key is {code}.")
+            if i % 5 == 0:
+                questions.append(EvalQuestion(f"What is the release key of {entity}?", [code]))
+        (folder / f"doc_{f}.txt").write_text("\n\n".join(lines))
+    return questions
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    from langchain_core.output_parsers import StrOutputParser
+
+    from rag_tools.embedding_pipeline import EmbeddingPipeline
+    from rag_tools.fakes import FakeLLM, HashingBackend
+
+    parser = argparse.ArgumentParser(description="Latency / recall benchmark of the notebook RAG pipelines")
+    parser.add_argument("--corpus", help="folder of .txt files (default: generated)")
+    parser.add_argument("--questions", help="JSON list of {question, answers} (required with --corpus)")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--out", default="eval_report.json")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            folder = Path(args.corpus)
+            questions = [EvalQuestion(**q) for q in json.loads(Path(args.questions).read_text())]
+        else:
+            folder = Path(tmp)
+            questions = synthetic_corpus(folder)
+
+        start = time.perf_counter()
+        texts = [path.read_text(encoding="utf-8") for path in sorted(folder.glob("*.txt"))]
+        load_seconds = time.perf_counter() - start
+
+    retriever, setup = build_corpus(texts, EmbeddingPipeline(HashingBackend()), k=args.k)
+    llm = timed_llm(FakeLLM(latency=args.llm_latency))
+    pipelines = build_pipelines(retriever, llm, timed_parser(StrOutputParser()))
+    report = asyncio.run(arun_benchmark(pipelines, questions, {"load": load_seconds, **setup}))
+
+    print(f"{len(questions)} questions, {len(retriever.documents)} chunks")
+    print(report.table())
+    if args.baseline and Path(args.baseline).exists():
+        problems = compare_reports(json.loads(Path(args.baseline).read_text()), report.to_dict(), args.tolerance)
+        print("regressions:\n  " + "\n  ".join(problems) if problems else "no regressions against the baseline")
+    report.save(args.out)
+    print(f"report written to {args.out}")
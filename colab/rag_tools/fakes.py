@@ -0,0 +1,113 @@
+"""
+Small local stand-ins for the models used in the notebooks.
+
+They are deterministic and need no downloads or API keys, so the helpers in
+`rag_tools` can be exercised and benchmarked offline.
+"""
+
+import asyncio
+import hashlib
+import re
+import time
+
+import numpy as np
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+WORD_RE = re.compile(r"\w+|[^\w\s]")
+STREAM_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+
+def _stable_hash(token):
+    # Python's hash() is salted per process, so use a real digest instead
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashingBackend:
+    """
+    Stand-in for `all-MiniLM-L6-v2`: same output size (384), hashed bag of words.
+
+    `seconds_per_token` adds artificial compute so batching/threading effects
+    are visible in benchmarks.
+    """
+
+    def __init__(self, dim=384, max_seq_length=256, seconds_per_token=0.0):
+        self.dim = dim
+        self.hidden_size = dim
+        self.max_seq_length = max_seq_length
+        self.seconds_per_token = seconds_per_token
+
+    def tokenize(self, texts):
+        """Return token ids for each text (no padding, truncated to max_seq_length)."""
+        return [
+            [_stable_hash(tok.lower()) % 30000 for tok in WORD_RE.findall(text)][: self.max_seq_length]
+            for text in texts
+        ]
+
+    def batch_memory_bytes(self, batch_size, seq_len):
+        return batch_size * seq_len * self.dim * 4
+
+    def encode(self, batch_ids):
+        """Embed a batch of token id lists. Returns an array of shape (len(batch_ids), dim)."""
+        padded_len = max((len(ids) for ids in batch_ids), default=0)
+        if self.seconds_per_token:
+            # cost is paid on padded tokens, just like a real transformer
+            time.sleep(self.seconds_per_token * padded_len * len(batch_ids))
+        out = np.zeros((len(batch_ids), self.dim), dtype=np.float32)
+        for row, ids in enumerate(batch_ids):
+            for token_id in ids:
+                sign = 1.0 if token_id & 1 else -1.0
+                out[row, token_id % self.dim] += sign
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class FakeLLM(LLM):
+    """
+    Deterministic LLM with injected latency, usable anywhere the notebooks use an LLM.
+
+    The reply is looked up in `responses` (first key found in the prompt wins),
+    otherwise it echoes the last line of the prompt. `calls` counts invocations.
+    `latency` is paid before the first token, `token_latency` per streamed token,
+    so `invoke` and `stream` take the same total time.
+    """
+
+    latency: float = 0.05
+    token_latency: float = 0.0
+    responses: dict = {}
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def _respond(self, prompt):
+        self.calls += 1
+        for key, reply in self.responses.items():
+            if key in prompt:
+                return reply
+        last_line = prompt.strip().splitlines()[-1] if prompt.strip() else ""
+        return f"Fake answer to: {last_line[:200]}"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        reply = self._respond(prompt)
+        time.sleep(self.latency + self.token_latency * len(STREAM_TOKEN_RE.findall(reply)))
+        return reply
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+        reply = self._respond(prompt)
+        await asyncio.sleep(self.latency + self.token_latency * len(STREAM_TOKEN_RE.findall(reply)))
+        return reply
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for token in STREAM_TOKEN_RE.findall(self._respond(prompt)):
+            time.sleep(self.token_latency)
+            yield GenerationChunk(text=token)
+
+    async def _astream(self, prompt, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for token in STREAM_TOKEN_RE.findall(self._respond(prompt)):
+            await asyncio.sleep(self.token_latency)
+            yield GenerationChunk(text=token)
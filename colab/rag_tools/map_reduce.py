@@ -0,0 +1,165 @@
+"""
+Async map-reduce engine for fusion RAG.
+
+The notebook version of `fusion_rag()` calls the LLM once per retrieved document,
+one after another, and appends to a module-level `mapped_answers` list (so every
+query also carries the summaries of all previous queries). Here:
+
+- map calls run concurrently, bounded by a semaphore created per request
+- every request keeps its own list of mapped answers
+- mapped answers are streamed out as they finish, then fused in retriever order
+
+Streaming shows progress, it doesn't make the answer arrive sooner: the fusion
+call still waits for every map, since removing duplicates and flagging
+contradictions needs all the mapped answers at once. The answer arrives one
+fusion call after the last map call finishes.
+
+Usage in a notebook (top-level `await` works in Jupyter):
+
+    from rag_tools.map_reduce import FusionRAG
+    fusion = FusionRAG(retriever, llm, map_template, fusion_template, max_concurrency=5)
+    result = await fusion.ainvoke("Why was the TVE authorization model chosen?")
+    print(result.answer)
+
+Benchmark with a fake LLM (no API key needed):
+
+    python -m rag_tools.map_reduce --docs 8 --latency 0.2
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+
+def _text(reply):
+    # chat models return a message, plain LLMs return a string
+    return getattr(reply, "content", reply)
+
+
+@dataclass
+class MappedAnswer:
+    index: int  # rank of the document in the retriever output
+    document: object
+    answer: str
+    seconds: float
+
+
+@dataclass
+class FusionResult:
+    question: str
+    answer: str
+    mapped: list = field(default_factory=list)  # MappedAnswer, in retriever order
+    seconds: float = 0.0
+
+
+class FusionRAG:
+    """
+    Retrieve -> map each document concurrently -> fuse the mapped answers.
+
+    Args:
+        retriever: any runnable returning documents for a question.
+        llm: chat model or LLM used for both the map and the fusion step.
+        map_prompt: prompt with `{question}` and `{document}` variables.
+        fusion_prompt: prompt with a `{summaries}` variable.
+        max_concurrency: map calls allowed in flight for one request.
+    """
+
+    def __init__(self, retriever, llm, map_prompt, fusion_prompt, max_concurrency=4, separator="\n\n---\n\n"):
+        self.retriever = retriever
+        self.llm = llm
+        self.map_prompt = map_prompt
+        self.fusion_prompt = fusion_prompt
+        self.max_concurrency = max_concurrency
+        self.separator = separator
+
+    async def _map_one(self, semaphore, question, index, document):
+        async with semaphore:
+            start = time.perf_counter()
+            reply = await self.llm.ainvoke(self.map_prompt.format_messages(question=question, document=document))
+            return MappedAnswer(index, document, _text(reply), time.perf_counter() - start)
+
+    async def astream_map(self, question, documents):
+        """Yield a MappedAnswer as soon as each map call finishes (completion order)."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [
+            asyncio.create_task(self._map_one(semaphore, question, i, doc)) for i, doc in enumerate(documents)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # the consumer stopped early or a call failed: don't leave calls running
+            for task in tasks:
+                task.cancel()
+
+    async def astream(self, question):
+        """
+        Yield `("map", MappedAnswer)` events while documents are summarised,
+        then a single `("fusion", FusionResult)` event once every map has
+        finished (the fusion prompt needs all of them).
+        """
+        start = time.perf_counter()
+        documents = await self.retriever.ainvoke(question)
+        mapped = []
+        async for item in self.astream_map(question, documents):
+            mapped.append(item)
+            yield "map", item
+
+        mapped.sort(key=lambda m: m.index)
+        summaries = self.separator.join(m.answer for m in mapped)
+        reply = await self.llm.ainvoke(self.fusion_prompt.format_messages(summaries=summaries))
+        yield "fusion", FusionResult(question, _text(reply), mapped, time.perf_counter() - start)
+
+    async def ainvoke(self, question):
+        result = None
+        async for kind, item in self.astream(question):
+            if kind == "fusion":
+                result = item
+        return result
+
+    def invoke(self, question):
+        """Blocking call for scripts. Inside a notebook use `await fusion.ainvoke(...)` instead."""
+        return asyncio.run(self.ainvoke(question))
+
+
+def sequential_fusion(retriever, llm, map_prompt, fusion_prompt, question, separator="\n\n---\n\n"):
+    """The original notebook loop (without the shared list), kept as a benchmark baseline."""
+    mapped_answers = []
+    for doc in retriever.invoke(question):
+        mapped_answers.append(_text(llm.invoke(map_prompt.format_messages(question=question, document=doc))))
+    return _text(llm.invoke(fusion_prompt.format_messages(summaries=separator.join(mapped_answers))))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from langchain_core.documents import Document
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.runnables import RunnableLambda
+
+    from rag_tools.fakes import FakeLLM
+
+    parser = argparse.ArgumentParser(description="Sequential vs concurrent map step with a fake LLM")
+    parser.add_argument("--docs", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake LLM call")
+    args = parser.parse_args()
+
+    docs = [Document(page_content=f"document {i} about TVE authorization") for i in range(args.docs)]
+    retriever = RunnableLambda(lambda q: docs)
+    map_prompt = ChatPromptTemplate.from_messages(
+        [("system", "Extract relevent info that matches the query {question} from doc {document}"), ("human", "{question}")]
+    )
+    fusion_prompt = ChatPromptTemplate.from_messages(
+        [("system", "Combine the following pieces of information."), ("human", "Information pieces: {summaries}")]
+    )
+    question = "Why was the TVE authorization model chosen over MVPD subscriptions?"
+
+    llm = FakeLLM(latency=args.latency)
+    start = time.perf_counter()
+    sequential_fusion(retriever, llm, map_prompt, fusion_prompt, question)
+    print(f"sequential:       {time.perf_counter() - start:.2f}s ({llm.calls} LLM calls)")
+
+    for concurrency in (2, 4, 8):
+        llm = FakeLLM(latency=args.latency)
+        result = FusionRAG(retriever, llm, map_prompt, fusion_prompt, max_concurrency=concurrency).invoke(question)
+        print(f"concurrency={concurrency}:    {result.seconds:.2f}s ({llm.calls} LLM calls)")
@@ -0,0 +1,341 @@
+"""
+Response cache for the LLM calls in the RAG notebooks.
+
+`corrective_rag()` makes two LLM calls per question and `self_rag()` always asks
+the LLM first, so every repeated or paraphrased question pays the full latency.
+`CachedRunnable` wraps a chat model (or a whole chain) and answers from cache:
+
+1. exact match: hash of the prompt text
+2. semantic match: cosine similarity of the query embedding >= `threshold`
+
+Entries are evicted least-recently-used beyond `max_entries` and expire after
+`ttl_seconds`. With a `path` they are persisted to SQLite and reloaded on start.
+
+    from rag_tools.response_cache import ResponseCache, CachedRunnable
+    cache = ResponseCache(path="llm_cache.sqlite", embedder=embedder, threshold=0.92)
+    cached_llm = CachedRunnable(llm, cache, namespace="gemini")
+    cached_llm.invoke("What is commerce SKU setup?")
+    print(cache.stats)
+
+Benchmark with a fake LLM and the hashing stand-in embedder:
+
+    python -m rag_tools.response_cache
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+from langchain_core.callbacks.manager import adispatch_custom_event, dispatch_custom_event
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, get_buffer_string
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable
+
+
+def prompt_text(value):
+    """Turn any runnable input (str, prompt value, messages, dict) into stable text."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, PromptValue):
+        return value.to_string()
+    if isinstance(value, (list, tuple)) and all(isinstance(m, BaseMessage) for m in value):
+        return get_buffer_string(list(value))
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    namespace: str
+    query: str
+    response: dict  # {"kind": "message" | "text", "content": ...}
+    embedding: np.ndarray = None
+    created: float = 0.0
+
+
+@dataclass
+class CacheStats:
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def lookups(self):
+        return self.exact_hits + self.semantic_hits + self.misses
+
+    @property
+    def hit_rate(self):
+        return (self.exact_hits + self.semantic_hits) / self.lookups if self.lookups else 0.0
+
+    def __str__(self):
+        return (
+            f"hit rate {self.hit_rate:.1%} ({self.exact_hits} exact, {self.semantic_hits} semantic, "
+            f"{self.misses} misses, {self.evictions} evictions)"
+        )
+
+
+class ResponseCache:
+    """
+    LRU/TTL cache with exact and semantic lookup, optionally persisted to SQLite.
+
+    Args:
+        embedder: LangChain `Embeddings` used for semantic lookup (None = exact only).
+        threshold: minimum cosine similarity for a semantic hit.
+        max_entries: LRU capacity.
+        ttl_seconds: entry lifetime (None = never expires).
+        path: SQLite file for persistence (None = memory only).
+    """
+
+    def __init__(self, embedder=None, threshold=0.92, max_entries=1000, ttl_seconds=None, path=None):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._entries = OrderedDict()  # key -> CacheEntry, least recently used first
+        self._matrix = {}  # namespace -> (keys, stacked embeddings), rebuilt lazily
+        self._lock = threading.RLock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, namespace TEXT, query TEXT, response TEXT, embedding BLOB, created REAL)"
+            )
+            self._load()
+
+    @staticmethod
+    def make_key(namespace, text):
+        return hashlib.sha256(f"{namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT key, namespace, query, response, embedding, created FROM entries ORDER BY created"
+        )
+        for key, namespace, query, response, blob, created in rows:
+            embedding = np.frombuffer(blob, dtype=np.float32) if blob else None
+            self._entries[key] = CacheEntry(key, namespace, query, json.loads(response), embedding, created)
+        self._evict()
+
+    def _expired(self, entry, now):
+        return self.ttl_seconds is not None and now - entry.created > self.ttl_seconds
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        self._matrix.clear()
+        if self._db:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self):
+        now = time.time()
+        for key in [k for k, e in self._entries.items() if self._expired(e, now)]:
+            self._remove(key)
+            self.stats.evictions += 1
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+        if self._db:
+            self._db.commit()
+
+    def _namespace_matrix(self, namespace):
+        if namespace not in self._matrix:
+            keys = [k for k, e in self._entries.items() if e.namespace == namespace and e.embedding is not None]
+            vectors = np.stack([self._entries[k].embedding for k in keys]) if keys else None
+            self._matrix[namespace] = (keys, vectors)
+        return self._matrix[namespace]
+
+    def get(self, namespace, text, semantic=True):
+        """Return `(response, query_embedding)`; response is None on a miss."""
+        with self._lock:
+            key = self.make_key(namespace, text)
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry, time.time()):
+                self._entries.move_to_end(key)
+                self.stats.exact_hits += 1
+                return entry.response, entry.embedding
+
+        embedding = None
+        if semantic and self.embedder is not None:
+            # embed outside the lock, it's the slow part
+            embedding = _normalize(self.embedder.embed_query(text))
+            with self._lock:
+                keys, vectors = self._namespace_matrix(namespace)
+                if keys:
+                    scores = vectors @ embedding
+                    best = int(np.argmax(scores))
+                    entry = self._entries.get(keys[best])
+                    if scores[best] >= self.threshold and entry and not self._expired(entry, time.time()):
+                        self._entries.move_to_end(entry.key)
+                        self.stats.semantic_hits += 1
+                        return entry.response, embedding
+
+        with self._lock:
+            self.stats.misses += 1
+        return None, embedding
+
+    def put(self, namespace, text, response, embedding=None):
+        with self._lock:
+            key = self.make_key(namespace, text)
+            entry = CacheEntry(key, namespace, text, response, embedding, time.time())
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._matrix.pop(namespace, None)
+            if self._db:
+                blob = embedding.astype(np.float32).tobytes() if embedding is not None else None
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, namespace, text, json.dumps(response), blob, entry.created),
+                )
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix.clear()
+            if self._db:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+
+def _encode_response(value):
+    if isinstance(value, BaseMessage):
+        return {"kind": "message", "content": value.content}
+    return {"kind": "text", "content": value}
+
+
+def _decode_response(response, chunk=False):
+    if response["kind"] == "message":
+        return (AIMessageChunk if chunk else AIMessage)(content=response["content"])
+    return response["content"]
+
+
+def _concat(total, chunk):
+    return chunk if total is None else total + chunk
+
+
+class CachedRunnable(Runnable):
+    """
+    Wrap a chat model, LLM or chain so repeated / paraphrased inputs are served from cache.
+
+    Use one `namespace` per wrapped runnable so their entries don't mix. Set
+    `semantic=False` for prompts that embed a previous answer or context
+    (e.g. the corrective prompt), where only an exact repeat is safe.
+
+    `stream` / `astream` replay a hit as a single chunk and stream a miss straight
+    through from the wrapped runnable, caching the joined chunks once it ends.
+    """
+
+    def __init__(self, runnable, cache, namespace="default", semantic=True):
+        self.runnable = runnable
+        self.cache = cache
+        self.namespace = namespace
+        self.semantic = semantic
+
+    def _lookup(self, input):
+        text = prompt_text(input)
+        cached, embedding = self.cache.get(self.namespace, text, semantic=self.semantic)
+        return text, cached, embedding
+
+    def _invoke(self, input, run_manager, config, **kwargs):
+        text, cached, embedding = self._lookup(input)
+        # reported to callback handlers (e.g. rag_tools.tracing.ChainTracer) as a "cache" event of this run
+        dispatch_custom_event("cache", {"namespace": self.namespace, "hit": cached is not None}, config=config)
+        if cached is not None:
+            return _decode_response(cached)
+        result = self.runnable.invoke(input, config, **kwargs)
+        self.cache.put(self.namespace, text, _encode_response(result), embedding)
+        return result
+
+    async def _ainvoke(self, input, run_manager, config, **kwargs):
+        text, cached, embedding = self._lookup(input)
+        await adispatch_custom_event("cache", {"namespace": self.namespace, "hit": cached is not None}, config=config)
+        if cached is not None:
+            return _decode_response(cached)
+        result = await self.runnable.ainvoke(input, config, **kwargs)
+        self.cache.put(self.namespace, text, _encode_response(result), embedding)
+        return result
+
+    def _transform(self, inputs, run_manager, config, **kwargs):
+        for input in inputs:
+            text, cached, embedding = self._lookup(input)
+            dispatch_custom_event("cache", {"namespace": self.namespace, "hit": cached is not None}, config=config)
+            if cached is not None:
+                yield _decode_response(cached, chunk=True)
+                continue
+            result = None
+            for chunk in self.runnable.stream(input, config, **kwargs):
+                result = _concat(result, chunk)
+                yield chunk
+            if result is not None:
+                self.cache.put(self.namespace, text, _encode_response(result), embedding)
+
+    async def _atransform(self, inputs, run_manager, config, **kwargs):
+        async for input in inputs:
+            text, cached, embedding = self._lookup(input)
+            await adispatch_custom_event("cache", {"namespace": self.namespace, "hit": cached is not None},
+                                         config=config)
+            if cached is not None:
+                yield _decode_response(cached, chunk=True)
+                continue
+            result = None
+            async for chunk in self.runnable.astream(input, config, **kwargs):
+                result = _concat(result, chunk)
+                yield chunk
+            if result is not None:
+                self.cache.put(self.namespace, text, _encode_response(result), embedding)
+
+    def invoke(self, input, config=None, **kwargs):
+        return self._call_with_config(self._invoke, input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self._acall_with_config(self._ainvoke, input, config, **kwargs)
+
+    def stream(self, input, config=None, **kwargs):
+        yield from self._transform_stream_with_config(iter([input]), self._transform, config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs):
+        async def inputs():
+            yield input
+
+        async for chunk in self._atransform_stream_with_config(inputs(), self._atransform, config, **kwargs):
+            yield chunk
+
+
+if __name__ == "__main__":
+    from rag_tools.embedding_pipeline import EmbeddingPipeline
+    from rag_tools.fakes import FakeLLM, HashingBackend
+
+    questions = [
+        "Explain commerce SKU setup",
+        "explain the commerce SKU setup",
+        "Why was the TVE authorization model chosen?",
+        "Explain commerce SKU setup",
+        "why was the TVE authorization model chosen",
+        "What contractual obligations drove the TVE choice?",
+    ] * 5
+
+    llm = FakeLLM(latency=0.1)
+    start = time.perf_counter()
+    for q in questions:
+        llm.invoke(q)
+    print(f"uncached: {time.perf_counter() - start:.2f}s, {llm.calls} LLM calls")
+
+    llm = FakeLLM(latency=0.1)
+    cache = ResponseCache(embedder=EmbeddingPipeline(HashingBackend()), threshold=0.85)
+    cached_llm = CachedRunnable(llm, cache, namespace="fake")
+    start = time.perf_counter()
+    for q in questions:
+        cached_llm.invoke(q)
+    print(f"cached:   {time.perf_counter() - start:.2f}s, {llm.calls} LLM calls, {cache.stats}")
@@ -0,0 +1,280 @@
+"""
+Long-running local retrieval service, so notebooks don't rebuild the store.
+
+Every notebook loads the embedding model, the PDF, splits, embeds and builds the
+index before it can answer one question. This service does that work once:
+
+- at startup it memory-maps `faiss_store/index.faiss` and reads the docstore
+  (`index.pkl`, written by `FAISS.save_local`; only load stores you created,
+  it is a pickle), or memory-maps a `CompactStore` folder
+- the embedding model is loaded lazily on the first query, so startup is fast
+- query vectors are cached (`CachedQueryEmbeddings`)
+- it serves JSON over HTTP on localhost:
+
+      POST /retrieve  {"query": "...", "k": 4}  -> {"documents": [...], "timings": {...}}
+      POST /retrieve  {"queries": [...], "k": 4} -> {"results": [[...], ...], "timings": {...}}
+      GET  /health                               -> {"model_loaded": ..., "startup_seconds": ...}
+
+Run it from `colab/`:
+
+    python -m rag_tools.retrieval_service serve --store faiss_store --port 8765
+
+In a notebook, `RetrievalClient` is a drop-in LangChain retriever:
+
+    from rag_tools.retrieval_service import RetrievalClient, wait_until_ready
+    wait_until_ready("http://127.0.0.1:8765")  # returns once the service answers /health
+    retriever = RetrievalClient(url="http://127.0.0.1:8765", k=4)
+
+`4-vector_store.ipynb` uses it this way. The notebooks in `RAG/` still build
+their retrievers in-process: the service serves one dense store, while they
+index their own PDFs and use hybrid (BM25 + dense) search or the store itself
+(routing), which the client doesn't cover.
+
+Cold-start and warm-query latency:
+
+    python -m rag_tools.retrieval_service bench --store faiss_store
+"""
+
+import json
+import pickle
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from rag_tools.batched_retrieval import CachedQueryEmbeddings
+from rag_tools.hybrid_search import FaissRows
+
+
+def read_index_mmap(path):
+    """Read a FAISS index memory-mapped where the index type supports it, otherwise normally."""
+    import faiss
+
+    try:
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(str(path))
+
+
+def default_embeddings(model_name):
+    from rag_tools.embedding_pipeline import EmbeddingPipeline
+
+    return EmbeddingPipeline(model_name)
+
+
+class RetrievalService:
+    """
+    Holds the index and docstore; the embedding model is created on first use.
+
+    Args:
+        store_dir: folder written by `FAISS.save_local` (index.faiss + index.pkl)
+            or by `CompactStore.write`.
+        model_name: embedding model used to build the store.
+        embeddings_factory: model_name -> `Embeddings` (called once, lazily).
+    """
+
+    def __init__(self, store_dir, model_name="all-MiniLM-L6-v2", embeddings_factory=default_embeddings):
+        start = time.perf_counter()
+        store_dir = Path(store_dir)
+        if (store_dir / "manifest.json").exists():
+            from rag_tools.compact_store import CompactStore
+
+            self.index = self.documents = CompactStore.load(store_dir)
+        else:
+            self.index = read_index_mmap(store_dir / "index.faiss")
+            with open(store_dir / "index.pkl", "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+            self.documents = FaissRows.from_docstore(docstore, index_to_docstore_id)
+        self.model_name = model_name
+        self.embeddings_factory = embeddings_factory
+        self._embeddings = None
+        self._lock = threading.Lock()
+        self.startup_seconds = time.perf_counter() - start
+        self.model_load_seconds = None
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    start = time.perf_counter()
+                    self._embeddings = CachedQueryEmbeddings(self.embeddings_factory(self.model_name))
+                    self.model_load_seconds = time.perf_counter() - start
+        return self._embeddings
+
+    def _document(self, row):
+        doc = self.documents[row]
+        return {"page_content": doc.page_content, "metadata": doc.metadata}
+
+    def retrieve(self, queries, k=4):
+        """Return (list of document lists, timings) for a batch of queries."""
+        timings = {}
+        start = time.perf_counter()
+        vectors = np.asarray(self.embeddings.embed_queries(queries), dtype=np.float32)
+        timings["embed_ms"] = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        _, rows = self.index.search(vectors, k)
+        results = [[self._document(row) for row in row_ids if row != -1] for row_ids in rows]
+        timings["search_ms"] = (time.perf_counter() - start) * 1000
+        return results, timings
+
+    def health(self):
+        return {
+            "model_loaded": self._embeddings is not None,
+            "documents": int(self.index.ntotal),
+            "startup_seconds": self.startup_seconds,
+            "model_load_seconds": self.model_load_seconds,
+        }
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, service.health())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/retrieve":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                k = int(request.get("k", 4))
+                if "queries" in request:
+                    results, timings = service.retrieve(list(request["queries"]), k)
+                    self._send(200, {"results": results, "timings": timings})
+                else:
+                    results, timings = service.retrieve([request["query"]], k)
+                    self._send(200, {"documents": results[0], "timings": timings})
+            except (KeyError, ValueError) as e:
+                self._send(400, {"error": str(e)})
+            except Exception as e:
+                # the client reads a JSON body either way; don't drop the connection on it
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def log_message(self, format, *args):
+            pass  # keep the console quiet, one line per request is noise here
+
+    return Handler
+
+
+def serve(service, host="127.0.0.1", port=8765):
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Retrieval service on http://{host}:{port} (startup {service.startup_seconds * 1000:.0f} ms)")
+    server.serve_forever()
+
+
+def wait_until_ready(url, process=None, timeout=120.0):
+    """Poll `url`/health until the service answers; returns the health payload."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1) as response:
+                return json.loads(response.read())
+        except OSError:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"service exited during startup (code {process.returncode})") from None
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"no answer from {url}/health after {timeout:.0f}s") from None
+            time.sleep(0.02)
+
+
+def _post(url, payload, timeout):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+class RetrievalClient(BaseRetriever):
+    """Thin client for the retrieval service; use it wherever a notebook used `vector_store.as_retriever()`."""
+
+    url: str = "http://127.0.0.1:8765"
+    k: int = 4
+    timeout: float = 60.0
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        response = _post(f"{self.url}/retrieve", {"query": query, "k": self.k}, self.timeout)
+        return [Document(**doc) for doc in response["documents"]]
+
+    def batch_retrieve(self, queries):
+        response = _post(f"{self.url}/retrieve", {"queries": list(queries), "k": self.k}, self.timeout)
+        return [[Document(**doc) for doc in docs] for docs in response["results"]]
+
+
+def _bench(args):
+    import subprocess
+    import sys
+
+    url = f"http://127.0.0.1:{args.port}"
+    command = [sys.executable, "-m", "rag_tools.retrieval_service", "serve", "--store", args.store,
+               "--port", str(args.port), "--model", args.model]
+    if args.fake:
+        command.append("--fake")
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    try:
+        try:
+            wait_until_ready(url, process)
+        except RuntimeError as e:
+            raise SystemExit(str(e)) from None
+        print(f"cold start (process + index):   {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        client = RetrievalClient(url=url, k=args.k)
+        start = time.perf_counter()
+        client.invoke("warm up the model")
+        print(f"first query (loads the model):  {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        latencies = []
+        for i in range(args.queries):
+            start = time.perf_counter()
+            client.invoke(f"question number {i % 20}")
+            latencies.append((time.perf_counter() - start) * 1000)
+        print(f"warm query: p50 {np.percentile(latencies, 50):.2f} ms, p95 {np.percentile(latencies, 95):.2f} ms")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local retrieval service over a saved FAISS store")
+    parser.add_argument("command", choices=["serve", "bench"])
+    parser.add_argument("--store", default="faiss_store")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fake", action="store_true", help="use the local hashing stand-in model")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        _bench(args)
+    else:
+        factory = default_embeddings
+        if args.fake:
+            from rag_tools.embedding_pipeline import EmbeddingPipeline
+            from rag_tools.fakes import HashingBackend
+
+            def factory(model_name):
+                return EmbeddingPipeline(HashingBackend())
+
+        serve(RetrievalService(args.store, args.model, factory), port=args.port)
@@ -0,0 +1,247 @@
+"""
+Sharded retrieval: embed the query once, search N shards concurrently.
+
+The LCEL notebook runs `RunnableParallel({"context1": store_a.as_retriever(),
+"context2": store_b.as_retriever(), ...})`, which embeds the question once per
+store and waits for the slowest store with no timeout. `ShardedRetriever`:
+
+- embeds the question once and hands the vector to every shard
+- searches all shards at the same time on a thread pool
+- gives every shard a deadline; late or failing shards are skipped and
+  reported in `last_report` instead of failing the whole query
+- merges the per-shard rankings with a k-way heap merge for the global top k,
+  keeping only the best-scoring copy of a chunk that more than one shard holds
+
+    from rag_tools.sharded_retrieval import ShardedRetriever, VectorStoreShard
+    retriever = ShardedRetriever(
+        shards=[VectorStoreShard(vector_store_a, "a"), VectorStoreShard(vector_store_b, "b")],
+        embeddings=embeddings, k=4, deadline_s=0.5,
+    )
+    ...
+    retriever.close()  # or use it as a context manager; stops the shard threads
+
+Benchmark over 1-64 local shards:
+
+    python -m rag_tools.sharded_retrieval
+"""
+
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+class VectorStoreShard:
+    """
+    A LangChain vector store used as a shard. Scores are converted so higher is better.
+
+    Args:
+        store: FAISS, DocArrayInMemorySearch, or any store with `similarity_search_by_vector`.
+        name: shard name, copied into each document's metadata.
+        deadline_s: overrides the retriever deadline for this shard.
+    """
+
+    def __init__(self, store, name, deadline_s=None):
+        self.store = store
+        self.name = name
+        self.deadline_s = deadline_s
+
+    def search_by_vector(self, vector, k):
+        store = self.store
+        if hasattr(store, "similarity_search_with_score_by_vector"):  # FAISS
+            pairs = store.similarity_search_with_score_by_vector(vector, k=k)
+            strategy = getattr(store, "distance_strategy", None)
+            if getattr(strategy, "value", strategy) in ("EUCLIDEAN_DISTANCE", None):
+                # FAISS returns L2 distances by default: smaller is closer
+                pairs = [(doc, -float(score)) for doc, score in pairs]
+            return pairs
+        if hasattr(store, "doc_index"):  # DocArrayInMemorySearch (cosine similarity)
+            docs, scores = store.doc_index.find(store.doc_cls(embedding=vector), search_field="embedding", limit=k)
+            return [
+                (Document(page_content=doc.text, metadata=doc.metadata), float(score))
+                for doc, score in zip(docs, scores)
+            ]
+        # no scores available: fall back to rank order
+        docs = store.similarity_search_by_vector(vector, k=k)
+        return [(doc, -float(rank)) for rank, doc in enumerate(docs)]
+
+
+class NumpyShard:
+    """In-memory shard over a normalised (n, dim) matrix; `latency` simulates a remote shard."""
+
+    def __init__(self, vectors, documents, name, latency=0.0, deadline_s=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self.documents = documents
+        self.name = name
+        self.latency = latency
+        self.deadline_s = deadline_s
+
+    def search_by_vector(self, vector, k):
+        if self.latency:
+            time.sleep(self.latency)
+        scores = self.vectors @ np.asarray(vector, dtype=np.float32)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.documents[i], float(scores[i])) for i in top]
+
+
+@dataclass
+class ShardReport:
+    embed_seconds: float = 0.0
+    seconds: float = 0.0
+    ok: list = field(default_factory=list)
+    timed_out: list = field(default_factory=list)
+    failed: dict = field(default_factory=dict)  # shard name -> error message
+
+    @property
+    def partial(self):
+        return bool(self.timed_out or self.failed)
+
+
+def document_key(doc):
+    """What makes two shards' documents the same chunk: its id if it has one, else its text."""
+    return doc.id or doc.page_content
+
+
+def merge_top_k(rankings, k, key=None):
+    """
+    k-way heap merge of per-shard rankings (each sorted best first).
+
+    Only the heads of the lists are compared, so the cost is O(k log n_shards)
+    plus one step per duplicate skipped. With `key`, a document whose key was
+    already taken (from a better-scoring shard) is skipped.
+    """
+    merged = heapq.merge(*rankings, key=lambda pair: -pair[1])
+    if key is None:
+        return list(itertools.islice(merged, k))
+    seen, top = set(), []
+    for doc, score in merged:
+        doc_key = key(doc)
+        if doc_key not in seen:
+            seen.add(doc_key)
+            top.append((doc, score))
+            if len(top) == k:
+                break
+    return top
+
+
+class ShardedRetriever(BaseRetriever):
+    """Embed once, fan out to every shard with deadlines, merge the top k."""
+
+    shards: list
+    embeddings: object
+    k: int = 4
+    per_shard_k: int = None  # candidates per shard, defaults to k
+    deadline_s: float = 1.0
+    max_workers: int = 16
+    dedup: bool = True  # drop copies of a chunk held by more than one shard
+    last_report: object = None
+
+    _pool: object = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="shard")
+        return self._pool
+
+    def close(self):
+        """Stop the shard threads; searches still running on a straggler are abandoned."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def search_by_vector(self, vector):
+        """Search every shard with an already-embedded query. Returns ([(doc, score)], ShardReport)."""
+        report = ShardReport()
+        start = time.perf_counter()
+        per_shard_k = self.per_shard_k or self.k
+        pool = self._executor()
+        futures = [(shard, pool.submit(shard.search_by_vector, vector, per_shard_k)) for shard in self.shards]
+
+        rankings = []
+        for shard, future in sorted(futures, key=lambda pair: self._deadline(pair[0])):
+            remaining = start + self._deadline(shard) - time.perf_counter()
+            try:
+                pairs = future.result(timeout=max(remaining, 0))
+            except FutureTimeout:
+                # the thread can't be interrupted; its result is simply ignored
+                report.timed_out.append(shard.name)
+                continue
+            except Exception as e:
+                report.failed[shard.name] = str(e)
+                continue
+            report.ok.append(shard.name)
+            rankings.append(
+                [
+                    (Document(page_content=doc.page_content, metadata={**doc.metadata, "shard": shard.name}), score)
+                    for doc, score in pairs
+                ]
+            )
+        report.seconds = time.perf_counter() - start
+        return merge_top_k(rankings, self.k, document_key if self.dedup else None), report
+
+    def _deadline(self, shard):
+        return shard.deadline_s if getattr(shard, "deadline_s", None) is not None else self.deadline_s
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        start = time.perf_counter()
+        vector = self.embeddings.embed_query(query)
+        embed_seconds = time.perf_counter() - start
+        pairs, report = self.search_by_vector(vector)
+        report.embed_seconds = embed_seconds
+        self.last_report = report
+        return [doc for doc, _ in pairs]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sequential vs concurrent fan-out over 1-64 local shards")
+    parser.add_argument("--docs-per-shard", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated network latency per shard (s)")
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    base = rng.standard_normal((args.docs_per_shard, args.dim)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    documents = [Document(page_content=f"chunk {i}") for i in range(args.docs_per_shard)]
+
+    print(f"{'shards':>6} {'sequential':>12} {'concurrent':>12}")
+    for n_shards in (1, 2, 4, 8, 16, 32, 64):
+        # shards share one matrix to keep memory flat; the work per shard is the same
+        shards = [NumpyShard(base, documents, f"s{i}", latency=args.latency) for i in range(n_shards)]
+        start = time.perf_counter()
+        for q in queries:
+            merge_top_k([shard.search_by_vector(q, 10) for shard in shards], 10, document_key)
+        sequential = (time.perf_counter() - start) / len(queries)
+
+        with ShardedRetriever(shards=shards, embeddings=None, k=10, deadline_s=5.0, max_workers=64) as retriever:
+            start = time.perf_counter()
+            for q in queries:
+                retriever.search_by_vector(q)
+            concurrent = (time.perf_counter() - start) / len(queries)
+        print(f"{n_shards:>6} {sequential * 1000:>10.1f}ms {concurrent * 1000:>10.1f}ms")
+
+    # one straggler: the query returns at the deadline with the other shards' results
+    shards = [NumpyShard(base, documents, f"s{i}", latency=args.latency) for i in range(7)]
+    shards.append(NumpyShard(base, documents, "slow", latency=1.0))
+    with ShardedRetriever(shards=shards, embeddings=None, k=10, deadline_s=0.2) as retriever:
+        top, report = retriever.search_by_vector(queries[0])
+    print(f"straggler: {report.seconds * 1000:.0f}ms, ok={len(report.ok)}, timed out={report.timed_out}, "
+          f"{len(top)} distinct chunks (every shard holds the same ones)")
@@ -0,0 +1,246 @@
+"""
+Streaming output through the RAG chains.
+
+`chain.invoke(...)` blocks until the full completion exists and only then is it
+rendered. With `chain.stream(...)` every stage has to pass chunks through, but
+`RunnableLambda(extract_fact)` and `RunnableLambda(replace_word)` need the whole
+string, so the chain falls back to blocking at that point. This module has
+incremental versions of those post-processors plus streaming variants of the
+corrective / self-RAG wrappers:
+
+    from rag_tools.streaming import extract_fact_stream, replace_words_stream, display_stream
+    chain = (prompt | llm | output_parser | extract_fact_stream()
+             | replace_words_stream([(old_word_1, new_word), (old_word_2, new_word)]))
+    display_stream(chain.stream("retrieval augmented generation"))
+
+Time-to-first-token with a fake streaming LLM:
+
+    python -m rag_tools.streaming
+"""
+
+import asyncio
+import time
+
+from langchain_core.runnables import RunnableGenerator
+
+
+class ExtractFact:
+    """
+    Streaming `extract_fact`: drop everything up to the first blank line, then
+    turn every remaining "\\n\\n" into "\\n". Text without a blank line is
+    passed through unchanged (only known once the stream ends).
+    """
+
+    def __init__(self):
+        self._head = ""  # text before the first blank line has been found
+        self._found = False
+        self._pending_newline = False
+
+    def _collapse(self, text):
+        # same result as "\\n".join(text.split("\\n\\n")): pairs of newlines become one
+        out = []
+        for char in text:
+            if char == "\n":
+                if self._pending_newline:
+                    out.append("\n")
+                self._pending_newline = not self._pending_newline
+                continue
+            if self._pending_newline:
+                out.append("\n")
+                self._pending_newline = False
+            out.append(char)
+        return "".join(out)
+
+    def feed(self, chunk):
+        if self._found:
+            return self._collapse(chunk)
+        self._head += chunk
+        cut = self._head.find("\n\n")
+        if cut == -1:
+            return ""
+        self._found = True
+        rest, self._head = self._head[cut + 2 :], ""
+        return self._collapse(rest)
+
+    def flush(self):
+        if not self._found:
+            return self._head
+        return "\n" if self._pending_newline else ""
+
+
+class ReplaceWords:
+    """Streaming `str.replace` for a sequence of (old, new) pairs, applied in order like chained `.replace`."""
+
+    def __init__(self, replacements):
+        self.replacements = list(replacements)
+        self._pending = [""] * len(self.replacements)
+
+    @staticmethod
+    def _step(buffer, old, new):
+        out = []
+        while True:
+            at = buffer.find(old)
+            if at == -1:
+                break
+            out.append(buffer[:at] + new)
+            buffer = buffer[at + len(old) :]
+        # hold back a tail that could still become `old` with the next chunk
+        keep = 0
+        for size in range(min(len(old) - 1, len(buffer)), 0, -1):
+            if old.startswith(buffer[-size:]):
+                keep = size
+                break
+        out.append(buffer[: len(buffer) - keep])
+        return "".join(out), buffer[len(buffer) - keep :]
+
+    def feed(self, chunk):
+        for i, (old, new) in enumerate(self.replacements):
+            chunk, self._pending[i] = self._step(self._pending[i] + chunk, old, new)
+        return chunk
+
+    def flush(self):
+        out = ""
+        for i, (old, new) in enumerate(self.replacements):
+            out = (self._pending[i] + out).replace(old, new)
+            self._pending[i] = ""
+        return out
+
+
+def streaming_transform(make_state):
+    """
+    Build a `RunnableGenerator` from a state factory with `feed(chunk)` / `flush()`.
+
+    A fresh state is created for every stream, so one chain can serve many calls.
+    `invoke` still works: it is a stream with a single chunk.
+    """
+
+    def transform(chunks):
+        state = make_state()
+        for chunk in chunks:
+            out = state.feed(chunk)
+            if out:
+                yield out
+        tail = state.flush()
+        if tail:
+            yield tail
+
+    async def atransform(chunks):
+        state = make_state()
+        async for chunk in chunks:
+            out = state.feed(chunk)
+            if out:
+                yield out
+        tail = state.flush()
+        if tail:
+            yield tail
+
+    return RunnableGenerator(transform, atransform)
+
+
+def extract_fact_stream():
+    return streaming_transform(ExtractFact)
+
+
+def replace_words_stream(replacements):
+    return streaming_transform(lambda: ReplaceWords(replacements))
+
+
+def _text(chunk):
+    return getattr(chunk, "content", chunk)
+
+
+async def astream_corrective_rag(llm, chain, question, corrective_template, rewrite_llm=None):
+    """
+    Streaming `corrective_rag`: the ungrounded answer and the grounded chain are
+    independent, so they run at the same time; the final rewrite is streamed.
+
+    `corrective_template` is a format string with `{first_answer}` and `{context}` (or anything with a
+    matching .format, such as a prompt_registry template).
+    `rewrite_llm` (default: `llm`) streams the rewrite. When `llm` is a semantic
+    `CachedRunnable`, pass the plain LLM or a `semantic=False` one so a rewrite is
+    never answered with a cached first answer.
+    """
+    first_answer, context = await asyncio.gather(llm.ainvoke(question), chain.ainvoke(question))
+    prompt = corrective_template.format(first_answer=_text(first_answer), context=_text(context))
+    async for chunk in (rewrite_llm or llm).astream(prompt):
+        yield _text(chunk)
+
+
+def stream_self_rag(llm, chain, question, marker="TNT"):
+    """
+    Streaming `self_rag`: the first answer is buffered until `marker` shows up.
+    From then on it is known to be kept and streams straight through; if the
+    answer ends without the marker, the grounded chain is streamed instead.
+    """
+    buffered = []
+    keep = False
+    for chunk in llm.stream(question):
+        text = _text(chunk)
+        if keep:
+            yield text
+            continue
+        buffered.append(text)
+        if marker in "".join(buffered):
+            keep = True
+            yield "".join(buffered)
+    if not keep:
+        print("llm could not predict on its own. Hence generating from context provided")
+        for chunk in chain.stream(question):
+            yield _text(chunk)
+
+
+def display_stream(chunks):
+    """Render a text stream in Jupyter as it arrives; returns the full text."""
+    from IPython.display import Markdown, display
+
+    handle = display(Markdown(""), display_id=True)
+    text = ""
+    for chunk in chunks:
+        text += _text(chunk)
+        handle.update(Markdown(text))
+    return text
+
+
+def time_to_first_token(chunks):
+    """Consume a stream; return (seconds to first non-empty chunk, total seconds, full text)."""
+    start = time.perf_counter()
+    first = None
+    parts = []
+    for chunk in chunks:
+        text = _text(chunk)
+        if text and first is None:
+            first = time.perf_counter() - start
+        parts.append(text)
+    return first, time.perf_counter() - start, "".join(parts)
+
+
+if __name__ == "__main__":
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.runnables import RunnableLambda
+
+    from rag_tools.fakes import FakeLLM
+
+    reply = "Here is a small report.\n\n" + " ".join(["RAG combines Retrieval with generation."] * 40)
+    llm = FakeLLM(latency=0.3, token_latency=0.01, responses={"report": reply})
+    prompt = PromptTemplate.from_template("Give me a small report on {topic}")
+    replacements = [("RAG", "Traditional RAG"), ("Retrieval", "Traditional RAG")]
+
+    def extract_fact(x):
+        if "\n\n" in x:
+            return "\n".join(x.split("\n\n")[1:])
+        return x
+
+    def replace_word(x):
+        return x.replace("RAG", "Traditional RAG").replace("Retrieval", "Traditional RAG")
+
+    blocking = prompt | llm | StrOutputParser() | RunnableLambda(extract_fact) | RunnableLambda(replace_word)
+    streaming = prompt | llm | StrOutputParser() | extract_fact_stream() | replace_words_stream(replacements)
+
+    start = time.perf_counter()
+    expected = blocking.invoke({"topic": "RAG"})
+    print(f"invoke:          first token after {time.perf_counter() - start:.2f}s (whole answer)")
+    ttft, total, text = time_to_first_token(streaming.stream({"topic": "RAG"}))
+    print(f"stream:          first token after {ttft:.2f}s, done after {total:.2f}s, same output: {text == expected}")
+    ttft, total, _ = time_to_first_token(blocking.stream({"topic": "RAG"}))
+    print(f"stream (lambda): first token after {ttft:.2f}s, done after {total:.2f}s")
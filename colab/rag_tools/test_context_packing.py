@@ -0,0 +1,64 @@
+"""
+ContextPacker (user-032): merging by offsets, near-duplicates and the token budget.
+
+    cd colab && python -m pytest rag_tools/test_context_packing.py
+"""
+
+from langchain_core.documents import Document
+
+from rag_tools.context_packing import ContextPacker
+
+TEXT = " ".join(f"word{i}" for i in range(200))
+
+
+def chunk(start, end, text=TEXT, **metadata):
+    return Document(page_content=text[start:end], metadata={"source": "x.pdf", "start_index": start,
+                                                            "end_index": end, **metadata})
+
+
+def packer(**kwargs):
+    return ContextPacker(count_tokens=lambda text: len(text.split()), **kwargs)
+
+
+def test_overlapping_chunks_of_one_page_are_merged():
+    p = packer()
+    [merged] = p.pack([chunk(0, 300, page=0), chunk(250, 600, page=0)])
+    assert merged.page_content == TEXT[0:600]
+    assert merged.metadata["end_index"] == 600
+    assert p.last_report.merged == 1
+
+
+def test_a_chunk_bridging_two_kept_chunks_joins_all_three():
+    [merged] = packer().pack([chunk(0, 300), chunk(500, 800), chunk(250, 550)])
+    assert merged.page_content == TEXT[0:800]
+
+
+def test_chunks_of_different_pages_are_not_merged():
+    # per-page offsets: both pages have a chunk at 0-30 of the same source file
+    page0 = Document(page_content="Alpha beta gamma delta epsilon", metadata={
+        "source": "x.pdf", "page": 0, "start_index": 0, "end_index": 30})
+    page1 = Document(page_content="Other page entirely, zeta eta.", metadata={
+        "source": "x.pdf", "page": 1, "start_index": 0, "end_index": 30})
+    p = packer()
+    assert p.pack([page0, page1]) == [page0, page1]
+    assert p.last_report.merged == 0
+
+
+def test_stripped_chunks_merge_without_losing_text():
+    text = "  first sentence here.   second sentence there.   third one ends it.  "
+    first = Document(page_content=text[0:40].strip(), metadata={"source": "s", "start_index": 0, "end_index": 40})
+    second = Document(page_content=text[22:len(text)].strip(),
+                      metadata={"source": "s", "start_index": 22, "end_index": len(text)})
+    [merged] = packer(dedup_threshold=1.1).pack([first, second])
+    assert "third one ends it." in merged.page_content
+    assert merged.page_content.startswith("first sentence here.")
+
+
+def test_near_duplicates_are_dropped_and_the_budget_is_kept():
+    a = Document(page_content=TEXT[:400])
+    copy = Document(page_content=TEXT[:400].replace("word40 ", "changed "))
+    other = Document(page_content="completely different text " * 5)
+    p = packer(max_tokens=60)
+    packed = p.pack([a, copy, other])
+    assert p.last_report.duplicates == 1
+    assert sum(len(d.page_content.split()) for d in packed) <= 60
@@ -0,0 +1,122 @@
+"""
+IngestionScheduler (user-040) against local file fixtures and a local HTTP stand-in.
+
+    cd colab && python -m pytest rag_tools/test_ingestion.py
+"""
+
+import hashlib
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from rag_tools.ingestion import FileSource, IngestionScheduler, UrlSource
+
+SAMPLE_PDF = Path(__file__).resolve().parent.parent / "sample_pdf.pdf"
+LATENCY = 0.2
+
+
+class Site(BaseHTTPRequestHandler):
+    """Pages with ETags, a 304 on a matching If-None-Match, and a fixed latency."""
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        body = f"<html><head><title>{self.path}</title></head><body><p>Article {self.path}</p></body></html>"
+        body = body.encode()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        with self.server.lock:
+            self.server.requests.append((self.path, self.headers.get("If-None-Match") == etag))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Site)
+    server.lock, server.requests = threading.Lock(), []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def notes(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"note_{i}.txt"
+        path.write_text(f"note {i}\n" + "plain text line\n" * 50)
+        paths.append(path)
+    return paths
+
+
+def sources(notes, site, pages=6):
+    return [FileSource(path) for path in notes] + [UrlSource(f"{site.base_url}/article/{i}") for i in range(pages)]
+
+
+def test_cold_then_warm_cache(tmp_path, notes, site):
+    scheduler = IngestionScheduler(cache_dir=tmp_path / "cache")
+    cold = scheduler.load(sources(notes, site))
+    assert {r.status for r in scheduler.last_report.sources} == {"loaded"}
+
+    warm = scheduler.load(sources(notes, site))
+    assert {r.status for r in scheduler.last_report.sources} == {"cached"}
+    # pages were revalidated, not downloaded again
+    assert sum(not_modified for _, not_modified in site.requests) == 6
+    assert {sid: [d.page_content for d in docs] for sid, docs in warm.items()} == \
+           {sid: [d.page_content for d in docs] for sid, docs in cold.items()}
+
+
+def test_pages_are_fetched_concurrently(tmp_path, notes, site):
+    scheduler = IngestionScheduler(cache_dir=None, max_io_concurrency=8)
+    scheduler.load(sources(notes, site, pages=8))
+    assert scheduler.last_report.seconds < 8 * LATENCY / 2
+
+
+def test_only_the_edited_file_is_reloaded(tmp_path, notes, site):
+    scheduler = IngestionScheduler(cache_dir=tmp_path / "cache")
+    scheduler.load(sources(notes, site))
+    notes[0].write_text("edited\n")
+    docs = scheduler.load(sources(notes, site))
+    loaded = [r.id for r in scheduler.last_report.sources if r.status == "loaded"]
+    assert loaded == [FileSource(notes[0]).id]
+    assert docs[FileSource(notes[0]).id][0].page_content == "edited\n"
+
+
+def test_a_failing_source_is_reported_without_stopping_the_rest(tmp_path, notes, site):
+    scheduler = IngestionScheduler(cache_dir=tmp_path / "cache")
+    docs = scheduler.load(sources(notes, site) + [FileSource(tmp_path / "missing.txt")])
+    statuses = {r.id: r.status for r in scheduler.last_report.sources}
+    assert statuses[FileSource(tmp_path / "missing.txt").id] == "failed"
+    assert list(statuses.values()).count("loaded") == len(notes) + 6
+    assert docs[FileSource(tmp_path / "missing.txt").id] == []
+
+
+def test_pdfs_are_parsed_in_worker_processes(tmp_path):
+    pytest.importorskip("pypdf")
+    copies = []
+    for i in range(2):
+        copies.append(tmp_path / f"doc_{i}.pdf")
+        shutil.copy(SAMPLE_PDF, copies[-1])
+    scheduler = IngestionScheduler(cache_dir=tmp_path / "cache", pdf_workers=2)
+    docs = scheduler.load([FileSource(path) for path in copies])
+    pages = [len(docs[FileSource(path).id]) for path in copies]
+    assert pages[0] == pages[1] > 0
+    scheduler.load([FileSource(path) for path in copies])
+    assert {r.status for r in scheduler.last_report.sources} == {"cached"}
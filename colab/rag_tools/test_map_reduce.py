@@ -0,0 +1,67 @@
+"""
+Fusion RAG map-reduce (user-027) over FakeLLM.
+
+    cd colab && python -m pytest rag_tools/test_map_reduce.py
+"""
+
+import asyncio
+import time
+
+from langchain_core.documents import Document
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from rag_tools.fakes import FakeLLM
+from rag_tools.map_reduce import FusionRAG, sequential_fusion
+
+DOCS = [Document(page_content=f"document {i}") for i in range(6)]
+MAP_PROMPT = ChatPromptTemplate.from_messages([("system", "Extract info for {question} from {document}")])
+FUSION_PROMPT = ChatPromptTemplate.from_messages([("human", "Combine: {summaries}")])
+RETRIEVER = RunnableLambda(lambda question: DOCS)
+
+
+def fusion(llm, max_concurrency=3):
+    return FusionRAG(RETRIEVER, llm, MAP_PROMPT, FUSION_PROMPT, max_concurrency=max_concurrency)
+
+
+def test_map_calls_run_concurrently_up_to_the_limit():
+    llm = FakeLLM(latency=0.1)
+    start = time.perf_counter()
+    result = fusion(llm, max_concurrency=3).invoke("why TVE?")
+    seconds = time.perf_counter() - start
+    assert len(result.mapped) == len(DOCS) and llm.calls == len(DOCS) + 1
+    # 6 map calls at 3 at a time is two rounds, then the fusion call; sequential would be 7 rounds
+    assert 0.3 <= seconds < 0.6
+
+
+def test_mapped_answers_are_fused_in_retriever_order():
+    replies = {f"document {i}": f"summary {i}" for i in range(len(DOCS))}
+    replies["Combine"] = "fused"
+    result = fusion(FakeLLM(latency=0.0, responses=replies)).invoke("why TVE?")
+    assert result.answer == "fused"
+    assert [m.answer for m in result.mapped] == [f"summary {i}" for i in range(len(DOCS))]
+
+
+def test_requests_keep_their_own_mapped_answers():
+    engine = fusion(FakeLLM(latency=0.01))
+
+    async def both():
+        return await asyncio.gather(engine.ainvoke("first?"), engine.ainvoke("second?"))
+
+    first, second = asyncio.run(both())
+    assert len(first.mapped) == len(second.mapped) == len(DOCS)
+
+
+def test_same_answer_as_the_sequential_loop():
+    llm = FakeLLM(latency=0.0)
+    expected = sequential_fusion(RETRIEVER, llm, MAP_PROMPT, FUSION_PROMPT, "why TVE?")
+    assert fusion(llm).invoke("why TVE?").answer == expected
+
+
+def test_stream_yields_each_mapped_answer_then_the_fusion():
+    engine = fusion(FakeLLM(latency=0.0))
+
+    async def kinds():
+        return [kind async for kind, _ in engine.astream("why TVE?")]
+
+    assert asyncio.run(kinds()) == ["map"] * len(DOCS) + ["fusion"]
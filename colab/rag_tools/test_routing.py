@@ -0,0 +1,83 @@
+"""
+Retrieval-gated self-RAG / corrective RAG (user-037) over FakeLLM.
+
+    cd colab && python -m pytest rag_tools/test_routing.py
+"""
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from rag_tools.fakes import FakeLLM
+from rag_tools.routing import RetrievalRouter, routed_corrective_rag, routed_self_rag
+
+DOCS = [Document(page_content="TVE authorization replaced MVPD subscriptions"), Document(page_content="SKU setup")]
+CORRECTIVE = "Answer: {first_answer}\nContext: {context}\nRewrite your answer."
+
+
+class FixedShard:
+    """Every query finds DOCS with the same scores."""
+
+    def __init__(self, score):
+        self.score = score
+        self.searches = 0
+
+    def search_by_vector(self, vector, k):
+        self.searches += 1
+        return [(doc, self.score) for doc in DOCS[:k]]
+
+
+class OneVector:
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def router(score):
+    # before fit, routes on the top-1 score alone
+    return RetrievalRouter(FixedShard(score), OneVector(), k=2, min_score=0.5)
+
+
+def no_chain(question):
+    raise AssertionError("the chain retrieves again; the router's documents should be used")
+
+
+@pytest.fixture
+def llm():
+    return FakeLLM(latency=0, responses={"Search in": "Grounded answer.", "Rewrite": "Rewritten answer."})
+
+
+@pytest.fixture
+def grounded(llm):
+    return PromptTemplate.from_template("Search in {context}\n{question}") | llm
+
+
+def test_retrieve_route_answers_from_the_routers_documents(llm, grounded):
+    prompts = []
+    spy = RunnableLambda(lambda values: prompts.append(values) or values) | grounded
+    gate = router(0.9)
+    answer = routed_self_rag(gate, llm, RunnableLambda(no_chain), "Why TVE?", grounded=spy)
+    assert answer == "Grounded answer."
+    assert prompts == [{"context": DOCS, "question": "Why TVE?"}]
+    assert gate.shard.searches == 1 and llm.calls == 1
+
+
+def test_without_grounded_the_chain_is_used(llm):
+    chain = RunnableLambda(lambda question: f"chain: {question}")
+    assert routed_self_rag(router(0.9), llm, chain, "Why TVE?") == "chain: Why TVE?"
+
+
+@pytest.mark.parametrize("score, route", [(0.9, "retrieve"), (0.1, "answer")])
+def test_corrective_rag_returns_text_on_every_route(llm, grounded, score, route):
+    gate = router(score)
+    answer = routed_corrective_rag(gate, llm, RunnableLambda(no_chain), "Why TVE?", CORRECTIVE, grounded=grounded)
+    assert gate.last_decision.route == route
+    assert isinstance(answer, str)
+
+
+def test_uncertain_corrective_rag_grounds_the_rewrite_on_the_routers_documents(llm, grounded):
+    gate = RetrievalRouter(FixedShard(0.9), OneVector(), k=2)  # no classifier, no min_score: uncertain
+    answer = routed_corrective_rag(gate, llm, RunnableLambda(no_chain), "Why TVE?", CORRECTIVE, grounded=grounded)
+    assert gate.last_decision.route == "uncertain"
+    assert answer == "Rewritten answer."
+    assert llm.calls == 3
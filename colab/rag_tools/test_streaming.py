@@ -0,0 +1,65 @@
+"""
+Streaming (user-033): time to first token with a fake streaming LLM, and CachedRunnable streams.
+
+    cd colab && python -m pytest rag_tools/test_streaming.py
+"""
+
+import asyncio
+
+from langchain_core.runnables import RunnableLambda
+
+from rag_tools.fakes import FakeLLM
+from rag_tools.response_cache import CachedRunnable, ResponseCache
+from rag_tools.streaming import astream_corrective_rag, time_to_first_token
+
+REPLY = " ".join(["RAG combines retrieval with generation."] * 5)
+
+
+def test_first_token_arrives_before_the_full_answer():
+    llm = FakeLLM(latency=0.05, token_latency=0.005, responses={"report": REPLY})
+    first, total, text = time_to_first_token(llm.stream("a small report"))
+    assert text == REPLY
+    assert first < 0.05 + 0.05  # the start-up latency plus about one token
+    assert total > first + 0.1  # ~30 more tokens followed
+
+
+def test_cached_runnable_streams_a_miss_and_replays_a_hit():
+    llm = FakeLLM(latency=0.0, responses={"report": REPLY})
+    cached = CachedRunnable(llm, ResponseCache(), namespace="answers")
+
+    chunks = list(cached.stream("a small report"))
+    assert len(chunks) > 1  # streamed through, not buffered into one chunk
+    assert "".join(chunks) == REPLY
+
+    replay = list(cached.stream("a small report"))
+    assert replay == [REPLY]
+    assert llm.calls == 1
+
+
+def test_cached_runnable_astream():
+    llm = FakeLLM(latency=0.0, responses={"report": REPLY})
+    cached = CachedRunnable(llm, ResponseCache(), namespace="answers")
+
+    async def collect():
+        return [chunk async for chunk in cached.astream("a small report")]
+
+    assert len(asyncio.run(collect())) > 1
+    assert asyncio.run(collect()) == [REPLY]
+    assert llm.calls == 1
+
+
+def test_corrective_rewrite_goes_through_its_own_cache_namespace():
+    cache = ResponseCache()
+    llm = FakeLLM(latency=0.0, responses={"Rewrite": "grounded rewrite", "question": "first answer"})
+    first_llm = CachedRunnable(llm, cache, namespace="first_answer")
+    rewrite_llm = CachedRunnable(llm, cache, namespace="corrective", semantic=False)
+    chain = RunnableLambda(lambda q: "retrieved context")
+    template = "Answer: {first_answer}\nContext: {context}\nRewrite your answer."
+
+    async def run():
+        return "".join([chunk async for chunk in astream_corrective_rag(
+            first_llm, chain, "the question", template, rewrite_llm=rewrite_llm)])
+
+    assert asyncio.run(run()) == "grounded rewrite"
+    namespaces = sorted(entry.namespace for entry in cache._entries.values())
+    assert namespaces == ["corrective", "first_answer"]